@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from .images import variant_url
 from .models import Category, Author, Book, Review
 
 
@@ -63,7 +64,7 @@ class AuthorAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px;" />',
-                obj.photo.url
+                variant_url(obj.photo, 64)
             )
         return "Không có ảnh"
     photo_preview.short_description = 'Ảnh'
@@ -90,7 +91,10 @@ class BookAdmin(admin.ModelAdmin):
     ]
     search_fields = ['title', 'isbn', 'author__name', 'category__name', 'description']
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ['created_at', 'updated_at', 'cover_preview', 'is_available']
+    readonly_fields = [
+        'created_at', 'updated_at', 'cover_preview', 'is_available',
+        'rating_sum', 'rating_count', 'average_rating'
+    ]
     list_editable = ['status', 'stock_quantity']
     inlines = [ReviewInline]
     
@@ -107,6 +111,10 @@ class BookAdmin(admin.ModelAdmin):
         ('Ảnh bìa', {
             'fields': ('cover_image', 'cover_preview')
         }),
+        ('Đánh giá', {
+            'fields': ('average_rating', 'rating_count', 'rating_sum'),
+            'classes': ('collapse',)
+        }),
         ('Thời gian', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -129,7 +137,7 @@ class BookAdmin(admin.ModelAdmin):
         if obj.cover_image:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px;" />',
-                obj.cover_image.url
+                variant_url(obj.cover_image, 64)
             )
         return "Không có ảnh"
     cover_preview.short_description = 'Ảnh bìa'
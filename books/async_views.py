@@ -0,0 +1,108 @@
+"""Phiên bản async (ASGI) cho các endpoint đọc nhiều, chạy các query độc lập song song"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils import timezone
+
+from bookstore.middleware import record_queries
+
+from .renderers import ORJSONRenderer
+from .serializers import BookListSerializer
+from .statistics import get_snapshot, render_snapshot
+from .views import BookSearchView, BookViewSet, get_top_rated_books
+
+
+def _in_thread(func):
+    """Chạy hàm truy cập DB trên thread riêng (không tuần tự hóa với các query khác)"""
+    def run():
+        try:
+            with record_queries():
+                return func()
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+def _json(data, status=200):
+    return HttpResponse(ORJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _read_only(view):
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        try:
+            return await view(request, *args, **kwargs)
+        except Http404:
+            return _json({'detail': 'Không tìm thấy.'}, status=404)
+    return wrapper
+
+
+def _run_view(view, request, **kwargs):
+    """
+    Chạy view DRF (sync) trên thread riêng và render luôn response ở đó, nên
+    filter, validate (400), ?search=, facet, ?fields=, phân trang và
+    conditional GET giống hệt endpoint sync.
+    """
+    def run():
+        response = view(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    return _in_thread(run)
+
+
+_book_list_view = BookViewSet.as_view({'get': 'list'})
+_book_detail_view = BookViewSet.as_view({'get': 'retrieve'}, detail=True)
+_book_available_view = BookViewSet.as_view({'get': 'available'}, detail=False)
+_book_new_releases_view = BookViewSet.as_view({'get': 'new_releases'}, detail=False)
+_book_search_view = BookSearchView.as_view()
+
+
+@_read_only
+async def book_list(request):
+    """Danh sách sách (async), cùng xử lý với BookViewSet.list"""
+    return await _run_view(_book_list_view, request)
+
+
+@_read_only
+async def book_detail(request, slug):
+    """Chi tiết sách (async), cùng xử lý với BookViewSet.retrieve"""
+    return await _run_view(_book_detail_view, request, slug=slug)
+
+
+@_read_only
+async def book_available(request):
+    """Sách có sẵn (async), cùng xử lý với BookViewSet.available"""
+    return await _run_view(_book_available_view, request)
+
+
+@_read_only
+async def book_new_releases(request):
+    """Sách mới xuất bản trong 30 ngày (async), cùng xử lý với BookViewSet.new_releases"""
+    return await _run_view(_book_new_releases_view, request)
+
+
+@_read_only
+async def book_search(request):
+    """Tìm kiếm sách (async), cùng xử lý với BookSearchView"""
+    return await _run_view(_book_search_view, request)
+
+
+@_read_only
+async def book_statistics(request):
+    """Thống kê sách (async): snapshot và top sách được đọc song song"""
+    snapshot, top_rated = await asyncio.gather(
+        _in_thread(get_snapshot),
+        _in_thread(lambda: list(get_top_rated_books())),
+    )
+    data = render_snapshot(snapshot)
+    data['top_rated_books'] = BookListSerializer(
+        top_rated, many=True, context={'request': request}
+    ).data
+    data['snapshot_computed_at'] = snapshot.computed_at
+    data['snapshot_updated_at'] = snapshot.updated_at
+    data['snapshot_age'] = (timezone.now() - snapshot.computed_at).total_seconds()
+    return _json(data)
@@ -0,0 +1,227 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import statistics, suggest
+from .models import Author, Book, Category
+from .search import get_search_backend
+from .serializers import BookBulkItemSerializer
+
+
+def get_batch_size():
+    return getattr(settings, 'BOOK_BULK_BATCH_SIZE', 500)
+
+
+def _int_values(items, key):
+    values = set()
+    for item in items:
+        value = item.get(key) if isinstance(item, dict) else None
+        try:
+            values.add(int(value))
+        except (TypeError, ValueError):
+            pass
+    return values
+
+
+def slug_candidates(title, isbn):
+    """Slug theo tên sách, và slug dự phòng có ISBN khi slug đầu đã bị dùng"""
+    base = slugify(title)[:200] or isbn
+    return base, f'{base[:200 - len(isbn) - 1]}-{isbn}'
+
+
+def generate_unique_slug(title, isbn, taken):
+    """
+    Sinh slug không trùng với các slug trong `taken` (đã có trong DB hoặc trong
+    cùng lô). `taken` cần chứa cả hai slug của slug_candidates(); chỉ khi cả hai
+    đều đã bị dùng mới query thêm các slug có hậu tố số.
+    """
+    base, with_isbn = slug_candidates(title, isbn)
+    for slug in (base, with_isbn):
+        if slug not in taken:
+            taken.add(slug)
+            return slug
+    # Chừa chỗ cho hậu tố "-<số>" trong giới hạn 200 ký tự
+    prefix = f'{base[:200 - len(isbn) - 7]}-{isbn}-'
+    taken.update(Book.objects.filter(slug__startswith=prefix).values_list('slug', flat=True))
+    counter = 2
+    while f'{prefix}{counter}' in taken:
+        counter += 1
+    slug = f'{prefix}{counter}'
+    taken.add(slug)
+    return slug
+
+
+def _insert(books, batch_size):
+    """bulk_create trong một savepoint; False (và không ghi gì) nếu trùng ISBN/slug"""
+    try:
+        with transaction.atomic():
+            Book.objects.bulk_create(books, batch_size=batch_size)
+    except IntegrityError:
+        # Các batch trước batch lỗi đã nhận pk trước khi savepoint bị rollback
+        for book in books:
+            book.pk = None
+            book._state.adding = True
+        return False
+    return True
+
+
+def _create_each(to_create, to_update, upsert, now):
+    """
+    Ghi lại từng sách sau khi bulk_create bị trùng: request khác vừa tạo sách
+    cùng ISBN hoặc slug giữa lúc kiểm tra xung đột và lúc ghi. Sách trùng ISBN
+    được cập nhật (upsert) hoặc báo lỗi, sách trùng slug được sinh lại slug.
+    """
+    created = []
+    for result, book in to_create:
+        if _insert([book], 1):
+            created.append((result, book))
+            continue
+        pk = Book.objects.filter(isbn=book.isbn).values_list('pk', flat=True).first()
+        if pk is None:
+            base = slug_candidates(book.title, book.isbn)[0]
+            taken = set(Book.objects.filter(slug__startswith=base).values_list('slug', flat=True))
+            book.slug = generate_unique_slug(book.title, book.isbn, taken)
+            if _insert([book], 1):
+                created.append((result, book))
+            else:
+                result.update(status='error', errors={'slug': ['Slug bị trùng, hãy thử lại']})
+        elif upsert:
+            book.pk = pk
+            book.updated_at = now
+            to_update.append((result, book))
+        else:
+            result.update(status='error', errors={'isbn': ['Sách với ISBN này đã tồn tại']})
+    return created
+
+
+def bulk_write_books(items, upsert=False):
+    """
+    Validate và ghi một lô sách bằng bulk_create/bulk_update trong một transaction.
+
+    Với `upsert=True`, sách có ISBN đã tồn tại sẽ được cập nhật thay vì báo lỗi.
+    Trả về danh sách kết quả theo thứ tự đầu vào: status là created, updated
+    hoặc error (kèm errors).
+    """
+    context = {
+        'authors': Author.objects.in_bulk(_int_values(items, 'author')),
+        'categories': Category.objects.in_bulk(_int_values(items, 'category')),
+    }
+    results = []
+    valid = []
+    seen_isbns = set()
+    for index, item in enumerate(items):
+        serializer = BookBulkItemSerializer(data=item, context=context)
+        if not serializer.is_valid():
+            results.append({'index': index, 'status': 'error', 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        if data['isbn'] in seen_isbns:
+            results.append({
+                'index': index, 'status': 'error',
+                'errors': {'isbn': ['ISBN bị trùng trong cùng lô']},
+            })
+            continue
+        seen_isbns.add(data['isbn'])
+        results.append({'index': index, 'isbn': data['isbn']})
+        valid.append((results[-1], data))
+
+    # Một query duy nhất cho xung đột ISBN/slug (cả slug dự phòng có ISBN)
+    slugs = {
+        slug for _, data in valid for slug in slug_candidates(data['title'], data['isbn'])
+    }
+    conflicts = Book.objects.filter(Q(isbn__in=seen_isbns) | Q(slug__in=slugs)).values_list(
+        'pk', 'isbn', 'slug'
+    )
+    existing = {}
+    taken_slugs = set()
+    for pk, isbn, slug in conflicts:
+        taken_slugs.add(slug)
+        if isbn in seen_isbns:
+            existing[isbn] = pk
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for result, data in valid:
+        pk = existing.get(data['isbn'])
+        if pk is None:
+            book = Book(**data)
+            book.slug = generate_unique_slug(data['title'], data['isbn'], taken_slugs)
+            to_create.append((result, book))
+        elif upsert:
+            book = Book(pk=pk, updated_at=now, **data)
+            to_update.append((result, book))
+        else:
+            result.update(status='error', errors={'isbn': ['Sách với ISBN này đã tồn tại']})
+
+    batch_size = get_batch_size()
+    update_fields = list(BookBulkItemSerializer.Meta.fields) + ['updated_at']
+    with transaction.atomic():
+        if not _insert([book for _, book in to_create], batch_size):
+            to_create = _create_each(to_create, to_update, upsert, now)
+        old_values = current_values(to_update) if to_update else {}
+        Book.objects.bulk_update(
+            [book for _, book in to_update], update_fields, batch_size=batch_size
+        )
+        written = to_create + to_update
+        if written:
+            get_search_backend().index_books(book.pk for _, book in written)
+            apply_side_effects(to_create, to_update, old_values)
+            transaction.on_commit(lambda: update_suggest_index(to_create, to_update))
+
+    for result, book in to_create:
+        result.update(status='created', id=book.pk, slug=book.slug)
+    for result, book in to_update:
+        result.update(status='updated', id=book.pk)
+    return results
+
+
+def current_values(to_update):
+    """Tác giả, danh mục và khóa thống kê hiện tại trong DB của các sách sắp được cập nhật"""
+    rows = Book.objects.filter(pk__in=[book.pk for _, book in to_update]).values_list(
+        'pk', 'author_id', 'category_id', 'language', 'status', 'stock_quantity'
+    )
+    return {
+        pk: (author_id, category_id, (
+            category_id, language, status == 'available' and stock_quantity > 0
+        ))
+        for pk, author_id, category_id, language, status, stock_quantity in rows
+    }
+
+
+def apply_side_effects(to_create, to_update, old_values):
+    """
+    bulk_create/bulk_update không phát signal: cộng delta thống kê và cập nhật
+    tác giả/danh mục có số sách đổi (sách mới hoặc chuyển tác giả/danh mục)
+    """
+    deltas = Counter()
+    author_ids = {book.author_id for _, book in to_create}
+    category_ids = {book.category_id for _, book in to_create}
+    for _, book in to_create:
+        deltas.update(statistics.book_deltas(None, book.get_stats_key()))
+    for _, book in to_update:
+        old_author, old_category, old_key = old_values.get(book.pk, (None, None, None))
+        deltas.update(statistics.book_deltas(old_key, book.get_stats_key()))
+        if old_author != book.author_id:
+            author_ids.update((old_author, book.author_id))
+        if old_category != book.category_id:
+            category_ids.update((old_category, book.category_id))
+    statistics.add_deltas(deltas)
+    Book.touch_owners(author_ids, category_ids)
+
+
+def update_suggest_index(to_create, to_update):
+    """bulk_create/bulk_update không phát signal nên cập nhật index gợi ý trực tiếp"""
+    suggest.books_saved([book for _, book in to_create], created=True)
+    suggest.books_saved([book for _, book in to_update], created=False)
+
+
+def bulk_delete_books(isbns):
+    """Xóa các sách theo ISBN, trả về số sách đã xóa"""
+    with transaction.atomic():
+        deleted, per_model = Book.objects.filter(isbn__in=isbns).delete()
+    return per_model.get(Book._meta.label, 0)
@@ -0,0 +1,104 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def is_multivalued(model, path):
+    """Đường quan hệ `path` (ví dụ `author__books`) có đi qua quan hệ một-nhiều/nhiều-nhiều"""
+    for name in path.split(LOOKUP_SEP):
+        field = model._meta.get_field(name)
+        if field.one_to_many or field.many_to_many:
+            return True
+        model = field.related_model
+    return False
+
+
+class ConditionalGetMixin:
+    """
+    Hỗ trợ conditional GET (ETag / Last-Modified / 304) cho list và retrieve.
+
+    Validator được tính bằng aggregate: max(updated_at) và số dòng của
+    queryset đã lọc, cùng với updated_at/số dòng của các quan hệ trong
+    `conditional_related` (thường chỉ một câu query). Nếu client còn bản mới nhất, view trả 304 mà không
+    query dữ liệu hay serialize gì cả.
+    """
+    conditional_related = []
+
+    def get_conditional_related(self):
+        return self.conditional_related
+
+    def get_validator_queryset(self):
+        """Queryset đã lọc nhưng không annotate/sắp xếp, chỉ dùng để tính validator"""
+        model = self.get_queryset().model
+        return self.filter_queryset(model._default_manager.all()).order_by()
+
+    def get_validators(self, queryset):
+        """Trả về (etag, last_modified) hoặc (None, None) nếu queryset rỗng"""
+        aggregates = {'modified': Max('updated_at'), 'count': Count('pk', distinct=True)}
+        separate = []
+        joined_multivalued = False
+        for relation in self.get_conditional_related():
+            relation_aggregates = {
+                f'{relation}_modified': Max(f'{relation}__updated_at'),
+                f'{relation}_count': Count(relation, distinct=True),
+            }
+            # Hai quan hệ nhiều-giá-trị trong cùng một câu sẽ join thành tích
+            # Descartes (ví dụ author__books x category__books), nên chỉ giữ
+            # một quan hệ như vậy trong câu chính, các quan hệ còn lại query riêng.
+            multivalued = is_multivalued(queryset.model, relation)
+            if multivalued and joined_multivalued:
+                separate.append(relation_aggregates)
+            else:
+                aggregates.update(relation_aggregates)
+                joined_multivalued = joined_multivalued or multivalued
+        values = queryset.aggregate(**aggregates)
+        if not values['count']:
+            return None, None
+        for relation_aggregates in separate:
+            values.update(queryset.aggregate(**relation_aggregates))
+
+        modified = [
+            value for key, value in values.items()
+            if key.endswith('modified') and value is not None
+        ]
+        last_modified = timegm(max(modified).utctimetuple()) if modified else None
+        fingerprint = repr((
+            self.request.accepted_media_type,
+            sorted((key, str(value)) for key, value in values.items()),
+        ))
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+        return etag, last_modified
+
+    def conditional_response(self, request, queryset, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators(queryset)
+        if etag is not None:
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if not_modified is not None:
+                return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if etag is not None and response.status_code == 200:
+            response.headers.setdefault('ETag', etag)
+            if last_modified is not None:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.get_validator_queryset(), super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_validator_queryset().filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional_response(
+            request, queryset, super().retrieve, *args, **kwargs
+        )
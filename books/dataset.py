@@ -0,0 +1,314 @@
+"""
+Sinh dữ liệu giả lập quy mô lớn (tác giả, người dùng, sách, đánh giá).
+
+Mỗi chunk được sinh bằng một `random.Random` riêng, seed suy ra từ seed gốc,
+loại dữ liệu và số thứ tự chunk. Vì vậy cùng tham số (và cùng id bắt đầu)
+luôn cho cùng dữ liệu, không phụ thuộc số process hay thứ tự chạy các chunk.
+"""
+import bisect
+import itertools
+import math
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Author, Book, Review
+
+DEFAULT_LANGUAGES = {'vi': 50, 'en': 30, 'fr': 5, 'de': 4, 'ja': 4, 'ko': 3, 'zh': 4}
+STATUSES = [('available', 85), ('borrowed', 8), ('reserved', 5), ('maintenance', 2)]
+
+WORDS = {
+    'vi': (
+        'mùa hè tuổi thơ ngày xưa thành phố ánh sáng con đường ký ức gia đình '
+        'tình yêu bầu trời biển cả giấc mơ hành trình người lính mẹ cha quê hương '
+        'dòng sông ngọn núi cánh đồng bí mật lịch sử khoa học kinh tế tâm lý'
+    ).split(),
+    'en': (
+        'summer light city road memory family love sky ocean dream journey soldier '
+        'home river mountain field secret history science economy mind garden '
+        'winter shadow story kingdom silence machine code design habit'
+    ).split(),
+    'fr': 'été lumière ville route mémoire famille amour ciel océan rêve voyage maison'.split(),
+    'de': 'sommer licht stadt straße erinnerung familie liebe himmel meer traum reise haus'.split(),
+    'ja': '夏 光 都市 道 記憶 家族 愛 空 海 夢 旅 家'.split(),
+    'ko': '여름 빛 도시 길 기억 가족 사랑 하늘 바다 꿈 여행 집'.split(),
+    'zh': '夏天 光 城市 道路 记忆 家庭 爱 天空 海洋 梦 旅行 家'.split(),
+}
+SURNAMES = 'Nguyễn Trần Lê Phạm Hoàng Huỳnh Phan Vũ Võ Đặng Bùi Đỗ Smith Brown Martin Müller Tanaka Kim Wang'.split()
+GIVEN_NAMES = 'An Bình Châu Dũng Giang Hà Hải Khoa Lan Linh Minh Nam Ngọc Phúc Quân Thảo Trang Tú Anna John Marie Hans Yuki Min Wei'.split()
+PUBLISHERS = [
+    'NXB Trẻ', 'NXB Kim Đồng', 'NXB Văn học', 'NXB Tổng hợp TP.HCM', 'NXB Lao động',
+    'Penguin', 'HarperCollins', 'Gallimard', 'Suhrkamp', 'Kodansha',
+]
+
+
+def parse_weights(value, allowed):
+    """`vi=50,en=30` -> {'vi': 50.0, 'en': 30.0}"""
+    weights = {}
+    for item in value.split(','):
+        code, _, weight = item.partition('=')
+        code = code.strip()
+        if code not in allowed:
+            raise ValueError(f'Giá trị không hợp lệ: {code!r}')
+        weights[code] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError('Cần ít nhất một trọng số dương')
+    return weights
+
+
+def chunk_rng(config, kind, index):
+    """Random riêng cho từng chunk, chỉ phụ thuộc seed, loại dữ liệu và số thứ tự chunk"""
+    return random.Random(f"{config['seed']}:{kind}:{index}")
+
+
+def chunks(start, total, size):
+    """[(index, first_id, last_id_exclusive), ...] chia [start, start + total) theo size"""
+    return [
+        (index, first, min(first + size, start + total))
+        for index, first in enumerate(range(start, start + total, size))
+    ]
+
+
+@lru_cache(maxsize=4)
+def zipf_cumulative(n, s):
+    """Phân phối tích lũy Zipf trên các hạng 1..n"""
+    return list(itertools.accumulate(rank ** -s for rank in range(1, n + 1)))
+
+
+def zipf_choice(rng, n, s):
+    """Chọn hạng 0..n-1 theo phân phối Zipf"""
+    cumulative = zipf_cumulative(n, s)
+    return bisect.bisect_left(cumulative, rng.random() * cumulative[-1])
+
+
+def harmonic(n, s):
+    """Tổng r^-s với r = 1..n (xấp xỉ bằng tích phân khi n lớn)"""
+    if n <= 100000:
+        return sum(rank ** -s for rank in range(1, n + 1))
+    head = sum(rank ** -s for rank in range(1, 1001))
+    if s == 1:
+        return head + math.log(n / 1000.5)
+    return head + ((n + 0.5) ** (1 - s) - 1000.5 ** (1 - s)) / (1 - s)
+
+
+def coprime_step(n, rng):
+    """Bước nhảy nguyên tố cùng nhau với n, dùng để duyệt hoán vị của 0..n-1"""
+    step = rng.randrange(n // 2, n) if n > 2 else 1
+    while math.gcd(step, n) != 1:
+        step += 1
+    return step
+
+
+def sentence(rng, words, count):
+    return ' '.join(rng.choice(words) for _ in range(count))
+
+
+def generate_authors(config, index, first, last):
+    rng = chunk_rng(config, 'authors', index)
+    rows = []
+    for pk in range(first, last):
+        name = f'{rng.choice(SURNAMES)} {rng.choice(GIVEN_NAMES)} {rng.choice(GIVEN_NAMES)}'
+        rows.append((
+            pk, name, sentence(rng, WORDS['vi'], rng.randint(10, 40)), '', '', '',
+            f'{slugify(name)}-{pk}', config['now'], config['now'],
+        ))
+    return Author, ['id', 'name', 'bio', 'email', 'website', 'photo', 'slug',
+                    'created_at', 'updated_at'], rows
+
+
+def generate_users(config, index, first, last):
+    rng = chunk_rng(config, 'users', index)
+    start = config['now'] - timedelta(days=3 * 365)
+    rows = []
+    for pk in range(first, last):
+        joined = start + timedelta(seconds=rng.randrange(3 * 365 * 86400))
+        rows.append((
+            pk, f'user{pk}', f'user{pk}@example.com', config['password'],
+            rng.choice(GIVEN_NAMES), rng.choice(SURNAMES), joined, joined, joined,
+        ))
+    return get_user_model(), ['id', 'username', 'email', 'password', 'first_name', 'last_name',
+                              'date_joined', 'created_at', 'updated_at'], rows
+
+
+def generate_books(config, index, first, last):
+    """
+    Sinh sách trong [first, last) cùng toàn bộ đánh giá của chúng.
+
+    Số đánh giá của mỗi sách theo Zipf trên một hoán vị của các sách, người
+    đánh giá là các user khác nhau (duyệt hoán vị 0..n_users-1 với bước nhảy
+    nguyên tố cùng nhau). Trường tổng hợp rating được tính luôn từ đánh giá.
+    """
+    rng = chunk_rng(config, 'books', index)
+    languages, language_weights = zip(*config['languages'].items())
+    statuses, status_weights = zip(*STATUSES)
+    n_books, n_users = config['books'], config['users']
+    first_book, first_user = config['first_book'], config['first_user']
+    span = (config['now'] - config['start']).total_seconds()
+    today = config['now'].date()
+
+    book_rows, review_rows = [], []
+    for pk in range(first, last):
+        position = pk - first_book
+        language = rng.choices(languages, language_weights)[0]
+        words = WORDS[language]
+        title = sentence(rng, words, rng.randint(2, 6)).capitalize()
+        created = config['start'] + timedelta(seconds=span * position / n_books + rng.random())
+        if rng.random() < 0.02:
+            published = today - timedelta(days=rng.randrange(60))
+        else:
+            published = date(rng.randint(1950, today.year - 1), rng.randint(1, 12), rng.randint(1, 28))
+        book_status = rng.choices(statuses, status_weights)[0]
+        stock = 0 if rng.random() < 0.1 else rng.randint(1, 20)
+
+        # Số đánh giá: hạng Zipf lấy từ hoán vị của các sách
+        count = 0
+        if config['reviews'] and n_users:
+            rank = (position * config['rank_step']) % n_books + 1
+            expected = config['reviews'] * rank ** -config['zipf'] / config['harmonic']
+            count = int(expected) + (rng.random() < expected - int(expected))
+            count = min(count, n_users, config['max_reviews_per_book'])
+        quality = min(max(rng.gauss(3.8, 0.6), 1), 5)
+        offset, step = rng.randrange(n_users or 1), config['user_step']
+        rating_sum = 0
+        for k in range(count):
+            rating = min(max(round(rng.gauss(quality, 1)), 1), 5)
+            rating_sum += rating
+            reviewed = created + timedelta(seconds=rng.random() * (config['now'] - created).total_seconds())
+            review_rows.append((
+                pk, first_user + (offset + k * step) % n_users, rating,
+                sentence(rng, words, rng.randint(5, 25)), reviewed, reviewed,
+            ))
+
+        book_rows.append((
+            pk, title[:200], f'{slugify(title)[:180]}-{pk}',
+            config['first_author'] + zipf_choice(rng, config['authors'], config['zipf']),
+            rng.choice(config['category_ids']),
+            sentence(rng, words, rng.randint(30, 120)), f'978{pk:010d}', published,
+            rng.choice(PUBLISHERS), language, rng.randint(48, 900),
+            Decimal(rng.randrange(20, 500) * 1000), '', book_status, stock,
+            rating_sum, count, rating_sum / count if count else 0, created, created,
+        ))
+    return [
+        (Book, ['id', 'title', 'slug', 'author_id', 'category_id', 'description', 'isbn',
+                'publication_date', 'publisher', 'language', 'pages', 'price', 'cover_image',
+                'status', 'stock_quantity', 'rating_sum', 'rating_count', 'average_rating',
+                'created_at', 'updated_at'], book_rows),
+        (Review, ['book_id', 'user_id', 'rating', 'comment', 'created_at', 'updated_at'],
+         review_rows),
+    ]
+
+
+GENERATORS = {
+    'authors': generate_authors,
+    'users': generate_users,
+    'books': generate_books,
+}
+
+
+def generate(task):
+    """Sinh một chunk: task = (kind, config, index, first, last) -> [(model, columns, rows)]"""
+    kind, config, index, first, last = task
+    result = GENERATORS[kind](config, index, first, last)
+    return result if isinstance(result, list) else [result]
+
+
+def insert_rows(model, columns, rows, batch_size=5000):
+    """
+    INSERT thô bằng executemany, bỏ qua save()/signal/auto_now để giữ nguyên
+    id và thời gian đã sinh. Các cột không được sinh lấy giá trị mặc định.
+    """
+    if not rows:
+        return 0
+    opts = model._meta
+    fields = [opts.get_field(name) for name in columns]
+    defaults = [
+        field for field in opts.concrete_fields
+        if field.attname not in columns and field.name not in columns and not field.primary_key
+    ]
+    default_values = [field.get_db_prep_save(field.get_default(), connection) for field in defaults]
+    quote = connection.ops.quote_name
+    names = [field.column for field in fields + defaults]
+    sql = (
+        f'INSERT INTO {quote(opts.db_table)} ({", ".join(quote(name) for name in names)}) '
+        f'VALUES ({", ".join(["%s"] * len(names))})'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+                + default_values
+                for row in rows[start:start + batch_size]
+            ])
+    return len(rows)
+
+
+def generate_and_insert(task):
+    """Sinh và ghi một chunk ngay trong worker (database cho phép nhiều writer)"""
+    return [(model.__name__, insert_rows(model, columns, rows)) for model, columns, rows in generate(task)]
+
+
+def build_config(seed, books, authors, users, reviews, zipf, languages, category_ids,
+                 first_ids, password, max_reviews_per_book, years=5):
+    """Tham số dùng chung cho mọi chunk (phải pickle được để gửi sang worker)"""
+    rng = random.Random(f'{seed}:config')
+    # Mốc thời gian là 0h hôm nay để dữ liệu giống hệt nhau giữa các lần chạy trong ngày
+    now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'seed': seed,
+        'books': books,
+        'authors': authors,
+        'users': users,
+        'reviews': reviews,
+        'zipf': zipf,
+        'languages': languages,
+        'category_ids': category_ids,
+        'first_author': first_ids['authors'],
+        'first_user': first_ids['users'],
+        'first_book': first_ids['books'],
+        'password': password,
+        'max_reviews_per_book': max_reviews_per_book,
+        'harmonic': harmonic(books, zipf) if books else 1,
+        'rank_step': coprime_step(books, rng) if books else 1,
+        'user_step': coprime_step(users, rng) if users else 1,
+        'now': now,
+        'start': now - timedelta(days=365 * years),
+    }
+
+
+def next_ids():
+    """Id bắt đầu cho dữ liệu mới của từng loại (sau id lớn nhất hiện có)"""
+    def next_id(model):
+        last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+        return (last or 0) + 1
+    return {
+        'authors': next_id(Author),
+        'users': next_id(get_user_model()),
+        'books': next_id(Book),
+    }
+
+
+def analyze_tables():
+    """
+    Cập nhật thống kê cho query planner sau khi nạp nhiều dữ liệu. Thiếu thống
+    kê, SQLite đoán filter theo index (vd. language) rất chọn lọc và chạy MATCH
+    của FTS5 cho từng dòng thay vì bắt đầu từ bảng FTS.
+    """
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+
+def reset_sequences(models):
+    """Đồng bộ sequence sau khi insert với id tường minh (PostgreSQL/Oracle)"""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,81 @@
+import csv
+import json
+
+from .models import Book
+
+EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('title', 'title'),
+    ('slug', 'slug'),
+    ('isbn', 'isbn'),
+    ('author_name', 'author__name'),
+    ('category_name', 'category__name'),
+    ('publisher', 'publisher'),
+    ('publication_date', 'publication_date'),
+    ('language', 'language'),
+    ('pages', 'pages'),
+    ('price', 'price'),
+    ('status', 'status'),
+    ('stock_quantity', 'stock_quantity'),
+    ('average_rating', 'average_rating'),
+    ('rating_count', 'rating_count'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def iter_book_rows(queryset=None, chunk_size=2000):
+    """
+    Duyệt sách theo từng lô (keyset theo id) dưới dạng tuple đã định dạng sẵn.
+
+    Mỗi lô là một query độc lập nên bộ nhớ không phụ thuộc kích thước catalog
+    và không cần giữ cursor mở trong suốt quá trình export.
+    """
+    if queryset is None:
+        queryset = Book.objects.all()
+    lookups = [lookup for _, lookup in EXPORT_FIELDS]
+    queryset = queryset.order_by('pk').values_list(*lookups)
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not rows:
+            return
+        for row in rows:
+            yield tuple(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in row
+            )
+        last_pk = rows[-1][0]
+
+
+class _Echo:
+    """File giả để csv.writer trả về dòng vừa ghi thay vì ghi ra đâu đó"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_FIELDS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    names = [name for name, _ in EXPORT_FIELDS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), ensure_ascii=False, default=str) + '\n'
+
+
+def stream_export(export_format, queryset=None, chunk_size=2000):
+    """Trả về generator các chunk text của file export"""
+    rows = iter_book_rows(queryset, chunk_size=chunk_size)
+    if export_format == 'ndjson':
+        return stream_ndjson(rows)
+    return stream_csv(rows)
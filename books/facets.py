@@ -0,0 +1,197 @@
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models import BooleanField, Case, Count, F, IntegerField, Q, Value, When
+from rest_framework.exceptions import ValidationError
+
+from .fieldsets import parse_list_param
+from .models import Book
+
+
+class FieldFacet:
+    """Facet theo giá trị của một cột (language, status, category)"""
+
+    def __init__(self, name, field, param=None, labels=None, label_field=None):
+        self.name = name
+        self.field = field
+        self.params = (param or name,)
+        self.labels = labels or {}
+        self.label_field = label_field
+
+    def columns(self):
+        columns = {f'facet_{self.name}': F(self.field)}
+        if self.label_field:
+            columns[f'facet_{self.name}_label'] = F(self.label_field)
+        return columns
+
+    def get_filter(self, params):
+        value = params.get(self.params[0])
+        if value in (None, ''):
+            return None
+        return Q(**{self.field: value})
+
+    def render(self, rows):
+        """rows: [(row, count)] của các dòng GROUP BY thỏa filter của facet khác"""
+        counts = Counter()
+        labels = {}
+        for row, count in rows:
+            value = row[f'facet_{self.name}']
+            counts[value] += count
+            labels[value] = row.get(f'facet_{self.name}_label') or self.labels.get(value, value)
+        return [
+            {'value': value, 'label': labels[value], 'count': count}
+            for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+        ]
+
+
+class PriceFacet:
+    """Facet theo khoảng giá, biên lấy từ BOOK_PRICE_FACET_BOUNDARIES; filter min_price/max_price"""
+    name = 'price'
+    params = ('min_price', 'max_price')
+
+    def get_boundaries(self):
+        return getattr(settings, 'BOOK_PRICE_FACET_BOUNDARIES', [100000, 200000, 300000, 500000])
+
+    def columns(self):
+        boundaries = self.get_boundaries()
+        return {'facet_price': Case(
+            *[When(price__lt=bound, then=Value(index)) for index, bound in enumerate(boundaries)],
+            default=Value(len(boundaries)),
+            output_field=IntegerField(),
+        )}
+
+    def get_filter(self, params):
+        condition = Q()
+        if params.get('min_price'):
+            condition &= Q(price__gte=params['min_price'])
+        if params.get('max_price'):
+            condition &= Q(price__lte=params['max_price'])
+        return condition or None
+
+    def render(self, rows):
+        counts = Counter()
+        for row, count in rows:
+            counts[row['facet_price']] += count
+        bounds = [0, *self.get_boundaries(), None]
+        # Mọi khoảng đều được trả về, kể cả khi bằng 0, theo thứ tự giá tăng dần
+        return [
+            {
+                'value': f"{low}-{high or ''}",
+                'min': low,
+                'max': high,
+                'count': counts[index],
+            }
+            for index, (low, high) in enumerate(zip(bounds, bounds[1:]))
+        ]
+
+
+FACETS = {
+    facet.name: facet for facet in (
+        FieldFacet('language', 'language', labels=dict(Book.LANGUAGE_CHOICES)),
+        FieldFacet('category', 'category_id', label_field='category__name'),
+        FieldFacet('status', 'status', labels=dict(Book.STATUS_CHOICES)),
+        PriceFacet(),
+    )
+}
+
+
+def count_facets(queryset, names, params, filtered):
+    """
+    Đếm các facet `names` trong một câu GROUP BY.
+
+    `queryset` đã áp mọi filter của view trừ filter của các facet trong
+    `filtered`. Mỗi filter facet đang bật thành một cột match_<facet> (đúng/sai)
+    trong câu GROUP BY, nên số đếm của một facet chỉ cộng các dòng thỏa filter
+    của các facet khác, bỏ qua filter của chính nó.
+    """
+    facets = [FACETS[name] for name in names]
+    active = {}
+    for name in filtered:
+        condition = FACETS[name].get_filter(params)
+        if condition is not None:
+            active[name] = condition
+
+    columns = {}
+    for facet in facets:
+        columns.update(facet.columns())
+    for name, condition in active.items():
+        columns[f'match_{name}'] = Case(
+            When(condition, then=Value(True)), default=Value(False), output_field=BooleanField()
+        )
+    rows = list(queryset.order_by().values(**columns).annotate(facet_count=Count('pk')))
+
+    result = {}
+    for facet in facets:
+        others = [f'match_{name}' for name in active if name != facet.name]
+        result[facet.name] = facet.render(
+            (row, row['facet_count']) for row in rows if all(row[column] for column in others)
+        )
+    return result
+
+
+class _FacetRequest:
+    """Request với query params đã bỏ filter của các facet (các thuộc tính khác giữ nguyên)"""
+
+    def __init__(self, request, query_params):
+        self._wrapped = request
+        self.query_params = query_params
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+
+class FacetMixin:
+    """
+    `?facets=language,category,status,price` cho view danh sách sách: trả thêm
+    `facets` bên cạnh kết quả phân trang. `facet_filtered` là các facet mà view
+    có filter tương ứng; số đếm của mỗi facet tôn trọng mọi filter khác.
+    """
+    facets_query_param = 'facets'
+    facet_filtered = ()
+
+    def get_facet_names(self):
+        names = parse_list_param(self.request, self.facets_query_param)
+        if not names:
+            return []
+        unknown = [name for name in names if name not in FACETS]
+        if unknown:
+            raise ValidationError({
+                self.facets_query_param: f"Facet không hợp lệ: {', '.join(unknown)}. "
+                                         f"Chọn trong: {', '.join(FACETS)}"
+            })
+        return list(dict.fromkeys(names))
+
+    @contextmanager
+    def without_facet_filters(self):
+        """Tạm bỏ filter của các facet khỏi request để dựng queryset nền cho việc đếm"""
+        params = self.request.query_params.copy()
+        for name in self.facet_filtered:
+            for param in FACETS[name].params:
+                params.pop(param, None)
+        request = self.request
+        self.request = _FacetRequest(request, params)
+        try:
+            yield
+        finally:
+            self.request = request
+
+    def get_facet_queryset(self):
+        with self.without_facet_filters():
+            return self.filter_queryset(self.get_queryset())
+
+    def get_validator_queryset(self):
+        # Số đếm facet phụ thuộc cả những sách bị filter của facet loại ra
+        if self.get_facet_names():
+            with self.without_facet_filters():
+                return super().get_validator_queryset()
+        return super().get_validator_queryset()
+
+    def list(self, request, *args, **kwargs):
+        names = self.get_facet_names()
+        response = super().list(request, *args, **kwargs)
+        if names and response.status_code == 200 and isinstance(response.data, dict):
+            response.data['facets'] = count_facets(
+                self.get_facet_queryset(), names, request.query_params, self.facet_filtered
+            )
+        return response
@@ -0,0 +1,162 @@
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+
+from .images import get_formats, get_sizes, requested_variant, variant_or_original, variants_ready
+from .models import Book
+from .serializers import BookListSerializer
+
+# Field trả về nguyên giá trị đọc từ database (str/int), không cần to_representation
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.ChoiceField)
+
+
+def url_builder(storage, request):
+    """
+    Hàm name -> URL tuyệt đối của file.
+
+    Với FileSystemStorage, prefix (`http://host/media/`) chỉ tính một lần cho
+    cả trang thay vì gọi storage.url() và build_absolute_uri() cho từng ảnh.
+    """
+    if getattr(storage.url, '__func__', None) is FileSystemStorage.url:
+        prefix = storage.base_url
+        if request is not None:
+            prefix = request.build_absolute_uri(prefix)
+        return lambda name: prefix + filepath_to_uri(name).lstrip('/')
+    if request is not None:
+        return lambda name: request.build_absolute_uri(storage.url(name))
+    return storage.url
+
+
+def nullable(convert, index):
+    def converter(row):
+        value = row[index]
+        return None if value is None else convert(value)
+    return converter
+
+
+class FastBookListSerializer:
+    """
+    Đường tắt chỉ-đọc cho BookListSerializer trên các trang danh sách.
+
+    Đọc tuple thô bằng `values_list()` (kèm join cần thiết) thay vì dựng model
+    instance, rồi format bằng các converter biên dịch sẵn cho từng field.
+    Kết quả giống hệt BookListSerializer với cùng `fields` và request.
+    """
+    serializer_class = BookListSerializer
+
+    def __init__(self, request=None, fields=None):
+        self.request = request
+        # Cột ảnh bìa và các ảnh đã có biến thể của trang đang render
+        self.cover_index = None
+        self.ready_covers = set()
+        serializer = self.serializer_class(context={'request': request}, fields=fields)
+        self.columns = []
+        self.names = []
+        self.converters = []
+        for name, field in serializer.fields.items():
+            paths = serializer.get_field_paths(name, field)
+            indexes = [self.column(path) for path in paths]
+            builder = getattr(self, f'build_{name}', None)
+            if builder is not None:
+                converter = builder(*indexes)
+            elif isinstance(field, IDENTITY_FIELDS):
+                converter = itemgetter(indexes[0])
+            else:
+                converter = nullable(field.to_representation, indexes[0])
+            self.names.append(name)
+            self.converters.append(converter)
+
+    def column(self, path):
+        if path not in self.columns:
+            self.columns.append(path)
+        return self.columns.index(path)
+
+    def get_storage(self):
+        return Book._meta.get_field('cover_image').storage
+
+    def get_url(self):
+        return url_builder(self.get_storage(), self.request)
+
+    def build_cover_url(self, index):
+        storage = self.get_storage()
+        url = self.get_url()
+        variant = requested_variant(self.request)
+        if variant:
+            self.cover_index = index
+
+        def converter(row):
+            name = row[index]
+            if not name:
+                return None
+            if not variant:
+                return url(name)
+            return url(variant_or_original(storage, name, *variant, name in self.ready_covers))
+        return converter
+
+    def build_cover_urls(self, index):
+        storage = self.get_storage()
+        url = self.get_url()
+        self.cover_index = index
+        variants = [
+            (str(size), [(image_format, size) for image_format in get_formats()])
+            for size in get_sizes()
+        ]
+
+        def converter(row):
+            name = row[index]
+            if not name:
+                return None
+            ready = name in self.ready_covers
+            return {
+                size_key: {
+                    image_format: url(variant_or_original(storage, name, size, image_format, ready))
+                    for image_format, size in formats
+                }
+                for size_key, formats in variants
+            }
+        return converter
+
+    def build_is_available(self, status_index, stock_index):
+        # Giống Book.is_available
+        return lambda row: row[status_index] == 'available' and row[stock_index] > 0
+
+    def prepare(self, queryset):
+        """
+        Chuyển queryset Book thành values_list (named tuple) với các cột cần dùng.
+
+        Giữ thêm khóa chính, cột sắp xếp và cột extra (điểm liên quan khi tìm kiếm)
+        để phân trang theo số trang lẫn keyset vẫn hoạt động như trước.
+        """
+        opts = queryset.model._meta
+        columns = list(self.columns)
+        ordering = list(queryset.query.order_by) or list(opts.ordering)
+        for term in [opts.pk.attname, *ordering]:
+            if not isinstance(term, str):
+                continue
+            name = term.lstrip('-')
+            if name in queryset.query.extra_select:
+                column = name
+            else:
+                try:
+                    column = opts.get_field(name).attname
+                except FieldDoesNotExist:
+                    continue
+            if column not in columns:
+                columns.append(column)
+        return queryset.values_list(*columns, named=True)
+
+    def render(self, rows):
+        names, converters = self.names, self.converters
+        if self.cover_index is not None:
+            # Trạng thái biến thể của cả trang đọc một lần từ cache, không hỏi storage từng dòng
+            rows = list(rows)
+            self.ready_covers = variants_ready(
+                self.get_storage(), {row[self.cover_index] for row in rows}
+            )
+        return [
+            dict(zip(names, [convert(row) for convert in converters]))
+            for row in rows
+        ]
@@ -0,0 +1,150 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_list_param(request, name):
+    """Tách query param dạng `a,b,c` thành danh sách, None nếu client không gửi"""
+    if request is None or name not in request.query_params:
+        return None
+    value = request.query_params.get(name, '')
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    Mixin cho ModelSerializer hỗ trợ sparse fieldsets và mở rộng quan hệ.
+
+    `fields` giới hạn các field cấp trên cùng được xuất ra, `expand` thêm dữ liệu
+    lồng nhau khai báo trong `expandable_fields`. `optimize_queryset()` suy ra
+    các cột, join và prefetch cần thiết từ những field còn lại.
+    """
+    # Tên field -> (serializer lồng nhau, kwargs)
+    expandable_fields = {}
+    # Quan hệ ngược -> queryset dùng khi prefetch
+    prefetch_querysets = {}
+    # Field không suy ra được cột từ `source` (SerializerMethodField, property) -> các cột cần nạp
+    field_sources = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expanded = [name for name in expand or [] if name in self.expandable_fields]
+        for name in expanded:
+            serializer_class, options = self.expandable_fields[name]
+            self.fields[name] = serializer_class(read_only=True, **options)
+        if fields is not None:
+            allowed = set(fields) | set(expanded)
+            for name in list(self.fields):
+                if name not in allowed:
+                    self.fields.pop(name)
+
+    def nested_fields(self):
+        """Tên các field được serialize lồng nhau (object hoặc danh sách object)"""
+        return [
+            name for name, field in self.fields.items()
+            if isinstance(field, serializers.BaseSerializer)
+        ]
+
+    def get_field_paths(self, name, field):
+        paths = self.field_sources.get(name)
+        if paths is not None:
+            return paths
+        if field.source == '*':
+            return None
+        return ['__'.join(field.source_attrs)]
+
+    def optimize_queryset(self, queryset, extra_columns=()):
+        """
+        Chỉ nạp các cột, join và prefetch mà các field còn lại cần đến.
+
+        Trả về queryset ban đầu nếu có field không suy ra được cột cần nạp.
+        """
+        opts = queryset.model._meta
+        columns, related, prefetch = set(), set(), {}
+        for name, field in self.fields.items():
+            paths = self.get_field_paths(name, field)
+            if paths is None:
+                return queryset
+            for path in paths:
+                relation_name = path.partition('__')[0]
+                try:
+                    model_field = opts.get_field(relation_name)
+                except FieldDoesNotExist:
+                    return queryset
+                if model_field.is_relation and not model_field.concrete:
+                    prefetch[relation_name] = Prefetch(
+                        relation_name, queryset=self.prefetch_querysets.get(relation_name)
+                    )
+                elif model_field.is_relation:
+                    related.add(relation_name)
+                    columns.add(path)
+                else:
+                    columns.add(path)
+
+        # Cột dùng để sắp xếp (cursor pagination đọc lại giá trị của chúng)
+        ordering = list(queryset.query.order_by) or list(opts.ordering)
+        for term in [*ordering, *extra_columns]:
+            if not isinstance(term, str):
+                continue
+            try:
+                model_field = opts.get_field(term.lstrip('-'))
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.is_relation:
+                columns.add(model_field.name)
+
+        # Quan hệ cần cả object thì không giới hạn cột của bảng liên kết
+        columns = {
+            path for path in columns
+            if path.partition('__')[0] not in columns or '__' not in path
+        }
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*sorted(related))
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch.values())
+        return queryset.only(*sorted(columns))
+
+
+class SparseFieldsetMixin:
+    """
+    Mixin cho view: đọc `?fields=` và `?expand=` từ query string, truyền cho
+    serializer và cắt bớt cột/join của queryset tương ứng (chỉ với request đọc).
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_fieldset_kwargs(self):
+        if not issubclass(self.get_serializer_class(), DynamicFieldsMixin):
+            return {}
+        return {
+            'fields': parse_list_param(self.request, self.fields_query_param),
+            'expand': parse_list_param(self.request, self.expand_query_param),
+        }
+
+    def get_serializer(self, *args, **kwargs):
+        for key, value in self.get_fieldset_kwargs().items():
+            kwargs.setdefault(key, value)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_sparse_extra_columns(self):
+        """Các cột client có thể dùng trong `?ordering=` luôn được nạp"""
+        ordering_fields = getattr(self, 'ordering_fields', None) or []
+        return [] if isinstance(ordering_fields, str) else ordering_fields
+
+    def optimize_queryset(self, queryset, serializer):
+        """Hook cho view thêm annotate theo các field lồng nhau"""
+        return serializer.optimize_queryset(queryset, self.get_sparse_extra_columns())
+
+    def sparse_queryset(self, queryset):
+        """Áp dụng optimize_queryset cho request đọc dùng serializer hỗ trợ sparse fieldsets"""
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, DynamicFieldsMixin):
+            return queryset
+        return self.optimize_queryset(queryset, serializer)
+
+    def get_queryset(self):
+        return self.sparse_queryset(super().get_queryset())
@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp'}
+
+_executor = None
+
+
+def get_sizes():
+    """Các kích thước (cạnh dài nhất, px) cần tạo, cấu hình bằng IMAGE_VARIANT_SIZES"""
+    return getattr(settings, 'IMAGE_VARIANT_SIZES', [64, 256, 800])
+
+
+def get_formats():
+    return getattr(settings, 'IMAGE_VARIANT_FORMATS', ['webp', 'jpeg'])
+
+
+def variant_name(name, size, image_format):
+    """
+    Đường dẫn của biến thể, suy ra trực tiếp từ tên file gốc.
+
+    Django đổi tên file khi upload trùng nên mỗi ảnh gốc có một bộ biến thể
+    riêng, và serializer tính được URL mà không cần truy vấn storage.
+    """
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}_{size}.{FORMAT_EXTENSIONS[image_format]}')
+
+
+def get_missing_ttl():
+    """Số giây nhớ rằng ảnh chưa có biến thể, cấu hình bằng IMAGE_VARIANT_MISSING_TTL"""
+    return getattr(settings, 'IMAGE_VARIANT_MISSING_TTL', 60)
+
+
+def _ready_key(name):
+    return 'images:variants:' + hashlib.md5(name.encode()).hexdigest()
+
+
+def mark_variants(name, ready):
+    """
+    Ghi vào cache chung ảnh gốc `name` đã có đủ biến thể chưa. Job tạo biến thể
+    gọi khi xong nên URL biến thể dùng được ngay; kết quả "chưa có" chỉ được nhớ
+    IMAGE_VARIANT_MISSING_TTL giây.
+    """
+    cache.set(_ready_key(name), ready, None if ready else get_missing_ttl())
+
+
+def variants_ready(storage, names):
+    """
+    Tập các ảnh trong `names` đã có đủ biến thể, đọc bằng một lần get_many từ
+    cache chung. Chỉ ảnh chưa có trong cache mới được kiểm tra trên storage.
+    """
+    keys = {_ready_key(name): name for name in names if name}
+    known = cache.get_many(keys)
+    ready = {keys[key] for key, value in known.items() if value}
+    for key, name in keys.items():
+        if key not in known:
+            exists = all(
+                storage.exists(variant_name(name, size, image_format))
+                for size in get_sizes()
+                for image_format in get_formats()
+            )
+            mark_variants(name, exists)
+            if exists:
+                ready.add(name)
+    return ready
+
+
+def variant_or_original(storage, name, size, image_format, ready=None):
+    """
+    Đường dẫn biến thể nếu ảnh đã có đủ biến thể, ngược lại là ảnh gốc.
+    `ready` là kết quả variants_ready() đã tính sẵn cho ảnh này (nếu có).
+    """
+    if ready is None:
+        ready = name in variants_ready(storage, [name])
+    return variant_name(name, size, image_format) if ready else name
+
+
+def variant_url(field_file, size, image_format='jpeg'):
+    """URL một biến thể của ảnh (ví dụ preview trong admin), ảnh gốc nếu biến thể chưa được tạo"""
+    storage = field_file.storage
+    return storage.url(variant_or_original(storage, field_file.name, size, image_format))
+
+
+def generate_variants(storage, name, force=False):
+    """Tạo toàn bộ biến thể cho một ảnh gốc, trả về số file đã ghi"""
+    targets = [
+        (size, image_format, variant_name(name, size, image_format))
+        for size in get_sizes()
+        for image_format in get_formats()
+    ]
+    if not force and all(storage.exists(path) for _, _, path in targets):
+        mark_variants(name, True)
+        return 0
+
+    with storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    written = 0
+    for size, image_format, path in targets:
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+        if image_format == 'jpeg' or variant.mode not in ('RGB', 'RGBA'):
+            variant = variant.convert('RGB' if image_format == 'jpeg' else 'RGBA')
+        buffer = BytesIO()
+        variant.save(buffer, format=image_format.upper(), quality=82, optimize=True)
+        if storage.exists(path):
+            storage.delete(path)
+        storage.save(path, ContentFile(buffer.getvalue()))
+        written += 1
+    mark_variants(name, True)
+    return written
+
+
+def _run(storage, name):
+    try:
+        generate_variants(storage, name)
+    except Exception:
+        logger.exception('Không tạo được biến thể cho ảnh %s', name)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+            thread_name_prefix='image-variants',
+        )
+    return _executor
+
+
+def schedule_variants(field_file):
+    """Tạo biến thể trong worker pool sau khi transaction hiện tại commit"""
+    if not field_file:
+        return
+    storage, name = field_file.storage, field_file.name
+    if getattr(settings, 'IMAGE_VARIANTS_SYNC', False):
+        transaction.on_commit(lambda: _run(storage, name))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run, storage, name))
+
+
+def remember_images(instance, *field_names):
+    """Ghi nhớ tên file ảnh vừa load từ DB (gọi trong from_db) để biết ảnh có đổi khi save"""
+    loaded = instance.__dict__.setdefault('_loaded_images', {})
+    for name in field_names:
+        # Field bị defer thì không có trong __dict__: không biết giá trị cũ
+        if name in instance.__dict__:
+            value = instance.__dict__[name]
+            loaded[name] = getattr(value, 'name', value)
+
+
+def schedule_changed_variants(instance, field_name, created=False, update_fields=None):
+    """
+    schedule_variants khi ảnh vừa được thêm hoặc đổi: bỏ qua các lần save không
+    ghi field ảnh (ví dụ `update_fields=['last_login']`) hoặc vẫn giữ file đã load.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return
+    field_file = getattr(instance, field_name)
+    loaded = instance.__dict__.setdefault('_loaded_images', {})
+    if not created and field_name in loaded and loaded[field_name] == field_file.name:
+        return
+    loaded[field_name] = field_file.name
+    schedule_variants(field_file)
+
+
+def variant_urls(field_file, request=None):
+    """
+    Map {size: {format: url}} cho các biến thể của ảnh (ảnh gốc cho biến thể
+    chưa được tạo), None nếu không có ảnh
+    """
+    if not field_file:
+        return None
+    storage, name = field_file.storage, field_file.name
+    ready = name in variants_ready(storage, [name])
+    urls = {}
+    for size in get_sizes():
+        urls[str(size)] = {}
+        for image_format in get_formats():
+            url = storage.url(variant_or_original(storage, name, size, image_format, ready))
+            urls[str(size)][image_format] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def requested_variant(request, param='cover'):
+    """(size, format) client yêu cầu qua `?<param>_size=`/`?<param>_format=`, None nếu không hợp lệ"""
+    if request is None:
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    size = params.get(f'{param}_size', '')
+    image_format = params.get(f'{param}_format', 'jpeg')
+    if size.isdigit() and int(size) in get_sizes() and image_format in get_formats():
+        return int(size), image_format
+    return None
+
+
+def image_url(field_file, request=None, param='cover'):
+    """
+    URL ảnh cho serializer: biến thể theo `?<param>_size=` (và `?<param>_format=`)
+    nếu client yêu cầu và biến thể đã được tạo, ngược lại là ảnh gốc
+    """
+    if not field_file:
+        return None
+    name = field_file.name
+    variant = requested_variant(request, param)
+    if variant is not None:
+        name = variant_or_original(field_file.storage, name, *variant)
+    url = field_file.storage.url(name)
+    return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,133 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import statistics
+from .models import Book
+
+# Loại checkout -> trạng thái của sách khi tồn kho về 0
+CHECKOUT_STATUSES = {'borrow': 'borrowed', 'reserve': 'reserved'}
+
+
+class StockError(Exception):
+    """Một số sách trong lô không tồn tại hoặc không đủ tồn kho để checkout"""
+
+    def __init__(self, failures):
+        super().__init__(failures)
+        self.failures = failures
+
+
+def _merge(items):
+    """Gộp (book_id, số lượng) trùng sách, sắp theo id để các lô luôn khóa dòng theo cùng thứ tự"""
+    quantities = {}
+    for book_id, quantity in items:
+        quantities[book_id] = quantities.get(book_id, 0) + quantity
+    return sorted(quantities.items())
+
+
+def _describe_failures(failures):
+    books = Book.objects.in_bulk([book_id for book_id, _ in failures])
+    described = []
+    for book_id, quantity in failures:
+        book = books.get(book_id)
+        if book is None:
+            described.append({'id': book_id, 'error': 'Sách không tồn tại'})
+        else:
+            described.append({
+                'id': book_id,
+                'requested': quantity,
+                'stock_quantity': book.stock_quantity,
+                'status': book.status,
+                'error': 'Không đủ tồn kho' if book.status == 'available' else 'Sách không cho mượn',
+            })
+    return described
+
+
+def _finish(quantities, became_available):
+    """
+    Đọc lại các sách vừa cập nhật và cập nhật bộ đếm sách còn hàng của thống
+    kê (UPDATE trực tiếp không chạy signal của model).
+    `became_available(stock, status, quantity)` trả về True/False khi sách vừa
+    có hàng/hết hàng, None nếu không đổi.
+    """
+    rows = Book.objects.filter(pk__in=quantities).values('id', 'slug', 'stock_quantity', 'status')
+    results = []
+    changed = 0
+    for row in rows:
+        available = row['status'] == 'available' and row['stock_quantity'] > 0
+        became = became_available(row['stock_quantity'], row['status'], quantities[row['id']])
+        if became is not None:
+            changed += 1 if became else -1
+        results.append({
+            'id': row['id'],
+            'slug': row['slug'],
+            'stock_quantity': row['stock_quantity'],
+            'status': row['status'],
+            'is_available': available,
+        })
+    statistics.add_deltas({'available_books': changed})
+    return sorted(results, key=lambda result: result['id'])
+
+
+def checkout_books(items, kind='borrow'):
+    """
+    Trừ tồn kho cho các cặp (book_id, số lượng) trong một transaction.
+
+    Mỗi sách chỉ một câu `UPDATE ... SET stock_quantity = stock_quantity - n
+    WHERE status = 'available' AND stock_quantity >= n`, nên các request đồng
+    thời không thể làm tồn kho âm hay ghi đè lên nhau. Sách về 0 chuyển sang
+    borrowed/reserved. Nếu có sách không checkout được, cả lô bị hủy (StockError).
+    """
+    status = CHECKOUT_STATUSES[kind]
+    now = timezone.now()
+    quantities = dict(_merge(items))
+    with transaction.atomic():
+        failures = []
+        for book_id, quantity in quantities.items():
+            updated = Book.objects.filter(
+                pk=book_id, status='available', stock_quantity__gte=quantity
+            ).update(
+                stock_quantity=F('stock_quantity') - quantity,
+                # Vế phải của SET dùng giá trị cũ: tồn kho cũ = n nghĩa là về 0
+                status=Case(When(stock_quantity=quantity, then=Value(status)), default=F('status')),
+                updated_at=now,
+            )
+            if not updated:
+                failures.append((book_id, quantity))
+        if failures:
+            raise StockError(_describe_failures(failures))
+        return _finish(quantities, lambda stock, status, quantity: False if stock == 0 else None)
+
+
+def return_books(items):
+    """
+    Cộng lại tồn kho cho các cặp (book_id, số lượng) trong một transaction.
+
+    Sách đang borrowed/reserved với tồn kho 0 quay về available. Sách không
+    tồn tại làm cả lô bị hủy (StockError).
+    """
+    now = timezone.now()
+    quantities = dict(_merge(items))
+    with transaction.atomic():
+        failures = []
+        for book_id, quantity in quantities.items():
+            updated = Book.objects.filter(pk=book_id).update(
+                stock_quantity=F('stock_quantity') + quantity,
+                status=Case(
+                    When(
+                        stock_quantity=0, status__in=CHECKOUT_STATUSES.values(),
+                        then=Value('available'),
+                    ),
+                    default=F('status'),
+                ),
+                updated_at=now,
+            )
+            if not updated:
+                failures.append((book_id, quantity))
+        if failures:
+            raise StockError(_describe_failures(failures))
+        # Tồn kho mới = n nghĩa là trước đó bằng 0 (hết hàng)
+        return _finish(
+            quantities,
+            lambda stock, status, quantity: True if status == 'available' and stock == quantity else None,
+        )
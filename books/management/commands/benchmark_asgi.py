@@ -0,0 +1,115 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+# (endpoint sync, endpoint async tương ứng)
+ENDPOINTS = [
+    ('/api/books/', '/api/async/books/'),
+    ('/api/books/available/', '/api/async/books/available/'),
+    ('/api/books/new_releases/', '/api/async/books/new_releases/'),
+    ('/api/search/?q=sach', '/api/async/search/?q=sach'),
+    ('/api/statistics/', '/api/async/statistics/'),
+]
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': quantiles[49] * 1000,
+        'p95': quantiles[94] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    """So sánh throughput của các endpoint đọc qua WSGI (sync) và ASGI (async)"""
+    help = (
+        'Benchmark in-process: gọi trực tiếp WSGIHandler/ASGIHandler của Django với '
+        'cùng dataset và cùng mức concurrency, in ra req/s và latency p50/p95.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Số request cho mỗi endpoint')
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        self.wsgi = WSGIHandler()
+        self.asgi = ASGIHandler()
+        total, concurrency = options['requests'], options['concurrency']
+        self.stdout.write(f'{total} request/endpoint, concurrency {concurrency}')
+        self.stdout.write(f"{'endpoint':<28}{'WSGI req/s':>12}{'p50':>9}{'p95':>9}"
+                          f"{'ASGI req/s':>12}{'p50':>9}{'p95':>9}")
+        for sync_url, async_url in ENDPOINTS:
+            wsgi = self.run_wsgi(sync_url, total, concurrency)
+            asgi = asyncio.run(self.run_asgi(async_url, total, concurrency))
+            self.stdout.write(
+                f"{sync_url:<28}{wsgi['rps']:>12.1f}{wsgi['p50']:>8.1f}ms{wsgi['p95']:>7.1f}ms"
+                f"{asgi['rps']:>12.1f}{asgi['p50']:>8.1f}ms{asgi['p95']:>7.1f}ms"
+            )
+
+    def wsgi_request(self, url):
+        parts = urlsplit(url)
+        environ = {
+            'PATH_INFO': parts.path, 'QUERY_STRING': parts.query,
+            'REQUEST_METHOD': 'GET', 'HTTP_HOST': 'localhost', 'wsgi.input': BytesIO(),
+        }
+        setup_testing_defaults(environ)
+        started = time.perf_counter()
+        statuses = []
+        body = self.wsgi(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        b''.join(body)
+        if hasattr(body, 'close'):
+            body.close()
+        assert statuses[0].startswith('200'), (url, statuses[0])
+        return time.perf_counter() - started
+
+    def run_wsgi(self, url, total, concurrency):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(self.wsgi_request, [url] * total))
+        return summarize(latencies, time.perf_counter() - started)
+
+    async def asgi_request(self, url):
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': parts.path,
+            'query_string': parts.query.encode(), 'headers': [(b'host', b'localhost')],
+            'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+        }
+        messages = []
+        requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            # Client không ngắt kết nối: chờ đến khi Django hủy task lắng nghe
+            await asyncio.Future()
+
+        async def send(message):
+            messages.append(message)
+
+        started = time.perf_counter()
+        await self.asgi(scope, receive, send)
+        assert messages[0]['status'] == 200, (url, messages[0]['status'])
+        return time.perf_counter() - started
+
+    async def run_asgi(self, url, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                return await self.asgi_request(url)
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(total)))
+        return summarize(latencies, time.perf_counter() - started)
@@ -0,0 +1,132 @@
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.models import F
+
+from books.models import Book
+
+
+class Command(BaseCommand):
+    """So sánh throughput database giữa cấu hình mặc định của Django và cấu hình trong settings"""
+    help = (
+        'Nhiều thread giả lập request (vài lần đọc theo khóa chính, thỉnh thoảng một '
+        'UPDATE) trên từng profile kết nối: mở connection mới mỗi request như mặc định '
+        'của Django, giữ connection (CONN_MAX_AGE), và cấu hình hiện tại trong settings '
+        '(SQLite: WAL, synchronous=NORMAL, mmap, busy_timeout). Với SQLite mỗi profile '
+        'chạy trên một bản sao database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10, help='Số giây cho mỗi profile')
+        parser.add_argument('--reads', type=int, default=5, help='Số query đọc mỗi request')
+        parser.add_argument('--write-ratio', type=float, default=0.1, help='Tỉ lệ request có ghi')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.ids = list(Book.objects.values_list('pk', flat=True)[:10000])
+        if not self.ids:
+            raise CommandError('Chưa có sách nào, hãy chạy generate_dataset trước')
+
+        default = connections.settings[DEFAULT_DB_ALIAS]
+        profiles = [
+            ('per-request', {**default, 'CONN_MAX_AGE': 0, 'OPTIONS': {}}),
+            ('persistent', {**default, 'CONN_MAX_AGE': None, 'OPTIONS': {}}),
+            ('settings', dict(default)),
+        ]
+        self.tmpdir = None
+        if connections[DEFAULT_DB_ALIAS].vendor == 'sqlite':
+            self.tmpdir = tempfile.mkdtemp(prefix='benchmark_db')
+        try:
+            self.stdout.write(
+                f"{'profile':<14}{'requests':>10}{'errors':>8}{'req/s':>10}"
+                f"{'p50':>10}{'p95':>10}{'p99':>10}"
+            )
+            for name, settings_dict in profiles:
+                alias = f'benchmark_{name}'
+                if self.tmpdir:
+                    settings_dict['NAME'] = self.copy_database(name, settings_dict)
+                connections.settings[alias] = settings_dict
+                self.run_profile(name, alias)
+                if self.tmpdir:
+                    for suffix in ('', '-wal', '-shm', '-journal'):
+                        if os.path.exists(settings_dict['NAME'] + suffix):
+                            os.remove(settings_dict['NAME'] + suffix)
+        finally:
+            if self.tmpdir:
+                shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def copy_database(self, name, settings_dict):
+        """Bản sao SQLite; profile không có PRAGMA dùng journal mặc định (rollback journal)"""
+        path = os.path.join(self.tmpdir, f'{name}.sqlite3')
+        source = connections[DEFAULT_DB_ALIAS]
+        source.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            source.connection.backup(target)
+            if 'init_command' not in settings_dict['OPTIONS']:
+                target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+        return path
+
+    def run_profile(self, name, alias):
+        options = self.options
+        deadline = time.monotonic() + options['duration']
+        results = []
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(alias, random.Random(f"{options['seed']}:{index}"), deadline, results),
+            )
+            for index in range(options['threads'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        latencies = [value for thread_latencies, _ in results for value in thread_latencies]
+        errors = sum(thread_errors for _, thread_errors in results)
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+        self.stdout.write(
+            f'{name:<14}{len(latencies):>10}{errors:>8}{len(latencies) / elapsed:>10.1f}'
+            f'{quantiles[49] * 1000:>8.2f}ms{quantiles[94] * 1000:>8.2f}ms'
+            f'{quantiles[98] * 1000:>8.2f}ms'
+        )
+
+    def worker(self, alias, rng, deadline, results):
+        options = self.options
+        connection = connections[alias]
+        books = Book.objects.using(alias)
+        latencies = []
+        errors = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                for _ in range(options['reads']):
+                    list(books.filter(pk=rng.choice(self.ids)).values_list('title', 'price'))
+                if rng.random() < options['write_ratio']:
+                    with transaction.atomic(using=alias):
+                        books.filter(pk=rng.choice(self.ids)).update(
+                            stock_quantity=F('stock_quantity')
+                        )
+            except OperationalError:
+                errors += 1
+            finally:
+                # Giống request_finished: đóng connection nếu hết CONN_MAX_AGE (0 = đóng ngay)
+                connection.close_if_unusable_or_obsolete()
+            latencies.append(time.perf_counter() - started)
+        connection.close()
+        results.append((latencies, errors))
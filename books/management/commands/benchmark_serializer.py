@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from books.fastpath import FastBookListSerializer
+from books.models import Book
+from books.serializers import BookListSerializer
+
+
+class Command(BaseCommand):
+    """Đo tốc độ FastBookListSerializer so với BookListSerializer"""
+    help = (
+        'Đo thời gian serialize một trang sách bằng FastBookListSerializer và '
+        'BookListSerializer trên dữ liệu hiện có. Kết quả giống hệt nhau được kiểm '
+        'tra trong books.tests.FastListSerializerParityTests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Số sách mỗi lần serialize')
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if not Book.objects.exists():
+            raise CommandError('Chưa có sách nào để đo')
+        rows, iterations = options['rows'], options['iterations']
+        queryset = Book.objects.select_related('author', 'category').order_by('-created_at', '-id')
+        request = self.make_request({})
+
+        def slow():
+            return BookListSerializer(
+                queryset[:rows], many=True, context={'request': request}
+            ).data
+
+        def fast():
+            serializer = FastBookListSerializer(request)
+            return serializer.render(serializer.prepare(queryset)[:rows])
+
+        slow_time = self.measure(slow, iterations)
+        fast_time = self.measure(fast, iterations)
+        self.stdout.write(f'{rows} sách x {iterations} lần (gồm cả query):')
+        self.stdout.write(f'  BookListSerializer      {slow_time * 1000:8.2f} ms/lần')
+        self.stdout.write(f'  FastBookListSerializer  {fast_time * 1000:8.2f} ms/lần')
+        self.stdout.write(self.style.SUCCESS(f'  nhanh hơn {slow_time / fast_time:.1f} lần'))
+
+    def make_request(self, params):
+        return Request(APIRequestFactory().get('/api/books/', params, HTTP_HOST='localhost'))
+
+    def measure(self, func, iterations):
+        func()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - started) / iterations
@@ -0,0 +1,64 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.suggest import build_index, fold
+
+
+class Command(BaseCommand):
+    """Dựng index gợi ý, in kích thước bộ nhớ và đo thời gian tra cứu"""
+    help = (
+        'Dựng index gợi ý (/api/books/suggest/) từ database, in số entry, số khóa, '
+        'bộ nhớ và thời gian dựng, rồi đo p50/p99 của các lần tra cứu với prefix '
+        'dài 1..--max-length ký tự lấy từ tên sách, tác giả, danh mục.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=5000)
+        parser.add_argument('--max-length', type=int, default=8)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--show', help='In kết quả cho một prefix')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = build_index()
+        elapsed = time.perf_counter() - started
+        stats = index.stats()
+        if not stats['entries']:
+            raise CommandError('Index trống, hãy chạy generate_dataset trước')
+        self.stdout.write(
+            f"{stats['entries']} entry, {stats['keys']} khóa, "
+            f"{stats['memory_bytes'] / 2 ** 20:.1f} MB, dựng trong {elapsed:.2f}s"
+        )
+
+        if options['show']:
+            for kind, pk, slug, label, popularity in index.suggest(options['show'], options['limit']):
+                self.stdout.write(f'{kind:<9}{pk:>8}  {popularity:>6}  {label}  ({slug})')
+            return
+
+        rng = random.Random(options['seed'])
+        labels = index.base.labels
+        prefixes = []
+        while len(prefixes) < options['queries']:
+            words = fold(rng.choice(labels)).split(' ')
+            start = rng.randrange(len(words))
+            text = ' '.join(words[start:])
+            if text:
+                prefixes.append(text[:rng.randint(1, options['max_length'])])
+
+        timings = []
+        empty = 0
+        for prefix in prefixes:
+            started = time.perf_counter()
+            results = index.suggest(prefix, options['limit'])
+            timings.append(time.perf_counter() - started)
+            empty += not results
+        quantiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{len(prefixes)} lần tra cứu: p50 {quantiles[49] * 1000:.3f}ms, '
+            f'p99 {quantiles[98] * 1000:.3f}ms, max {max(timings) * 1000:.3f}ms, '
+            f'{empty} không có kết quả'
+        )
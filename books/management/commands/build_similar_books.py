@@ -0,0 +1,42 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from books.recommendations import build_similarities
+
+
+class Command(BaseCommand):
+    """Dựng bảng sách tương tự (/api/books/<slug>/similar/) từ đánh giá"""
+    help = (
+        'Tính độ tương đồng cosine giữa các sách theo đánh giá của cùng người dùng '
+        '(ma trận thưa sách × user, numpy/scipy) và lưu top-N sách tương tự cho mỗi sách. '
+        'Với --incremental chỉ tính lại các sách bị ảnh hưởng bởi đánh giá mới từ lần chạy trước.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Chỉ tính lại sách có đánh giá mới/sửa và các sách khác của người đánh giá đó'
+        )
+        parser.add_argument('--top', type=int, help='Số sách tương tự lưu cho mỗi sách (BOOK_SIMILAR_TOP)')
+        parser.add_argument(
+            '--min-common', type=int,
+            help='Số người đánh giá chung tối thiểu (BOOK_SIMILAR_MIN_COMMON)'
+        )
+        parser.add_argument('--block-size', type=int, help='Số sách mỗi lần nhân ma trận (BOOK_SIMILAR_BLOCK_SIZE)')
+
+    def handle(self, *args, **options):
+        try:
+            result = build_similarities(
+                incremental=options['incremental'],
+                top=options['top'],
+                min_common=options['min_common'],
+                block_size=options['block_size'],
+                log=self.stdout.write if options['verbosity'] > 1 else None,
+            )
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+        mode = 'tăng dần' if result['incremental'] else 'toàn bộ'
+        self.stdout.write(self.style.SUCCESS(
+            f"Dựng {mode}: {result['books']} sách, {result['pairs']} cặp tương tự "
+            f"từ {result['reviews']} đánh giá trong {result['seconds']}s"
+        ))
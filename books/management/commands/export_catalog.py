@@ -0,0 +1,24 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from books.export import EXPORT_FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    """Export toàn bộ catalog sách ra CSV hoặc NDJSON"""
+    help = 'Export catalog sách (kèm tên tác giả và danh mục) ra CSV hoặc NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='File đích (mặc định: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunks = stream_export(options['format'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+            self.stderr.write(self.style.SUCCESS(f"Đã export ra {options['output']}"))
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,141 @@
+import multiprocessing
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils.text import slugify
+
+from books import dataset
+from books.models import Author, Book, Category
+from books.search import get_search_backend
+from books.statistics import invalidate_snapshot
+
+CATEGORY_NAMES = [
+    'Tiểu thuyết', 'Khoa học', 'Kinh doanh', 'Lập trình', 'Tâm lý học', 'Lịch sử',
+    'Thiếu nhi', 'Trinh thám', 'Khoa học viễn tưởng', 'Kỹ năng sống', 'Du lịch',
+    'Nấu ăn', 'Nghệ thuật', 'Triết học', 'Kinh tế', 'Y học', 'Thơ', 'Truyện tranh',
+]
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    """Sinh dữ liệu giả lập quy mô lớn, tất định theo seed"""
+    help = (
+        'Sinh tác giả, người dùng, sách và đánh giá giả lập bằng bulk INSERT và nhiều '
+        'process. Cùng seed và tham số luôn cho cùng dữ liệu. Số đánh giá mỗi sách và '
+        'số sách mỗi tác giả theo phân phối Zipf; mọi user dùng chung mật khẩu --password.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=len(CATEGORY_NAMES))
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--reviews', type=int, default=100000, help='Tổng số đánh giá (xấp xỉ)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--zipf', type=float, default=1.1, help='Số mũ Zipf (càng lớn càng lệch)')
+        parser.add_argument(
+            '--languages', default=','.join(f'{k}={v}' for k, v in dataset.DEFAULT_LANGUAGES.items()),
+            help='Tỉ lệ ngôn ngữ của sách, ví dụ vi=50,en=30,fr=5'
+        )
+        parser.add_argument('--max-reviews-per-book', type=int, default=100000)
+        parser.add_argument('--password', default='password123', help='Mật khẩu chung của user sinh ra')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Số bản ghi mỗi chunk')
+
+    def handle(self, *args, **options):
+        try:
+            languages = dataset.parse_weights(
+                options['languages'], {code for code, _ in Book.LANGUAGE_CHOICES}
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options['books'] and not options['authors']:
+            raise CommandError('Cần ít nhất một tác giả để sinh sách')
+        if options['reviews'] and not options['users']:
+            raise CommandError('Cần ít nhất một user để sinh đánh giá')
+
+        started = time.monotonic()
+        category_ids = self.create_categories(options['categories'])
+        if options['books'] and not category_ids:
+            raise CommandError('Cần ít nhất một danh mục để sinh sách')
+        first_ids = dataset.next_ids()
+        config = dataset.build_config(
+            seed=options['seed'], books=options['books'], authors=options['authors'],
+            users=options['users'], reviews=options['reviews'], zipf=options['zipf'],
+            languages=languages, category_ids=category_ids, first_ids=first_ids,
+            password=make_password(options['password']),
+            max_reviews_per_book=options['max_reviews_per_book'],
+        )
+
+        # SQLite chỉ cho một writer: worker chỉ sinh dữ liệu, process chính ghi.
+        # Database khác: mỗi worker tự ghi chunk của mình song song.
+        self.parallel_writes = connection.vendor != 'sqlite'
+        self.chunk_size = options['chunk_size']
+        self.workers = max(options['workers'], 1)
+        self.totals = {}
+        # Tác giả và user phải có trước khi sinh sách/đánh giá tham chiếu tới chúng
+        self.run('authors', config, first_ids['authors'], options['authors'])
+        self.run('users', config, first_ids['users'], options['users'])
+        self.run('books', config, first_ids['books'], options['books'])
+        dataset.reset_sequences([Author, get_user_model(), Book])
+
+        self.stdout.write('Đang xây dựng lại search index...')
+        get_search_backend().rebuild()
+        invalidate_snapshot()
+        dataset.analyze_tables()
+
+        elapsed = time.monotonic() - started
+        summary = ', '.join(f'{count} {name}' for name, count in self.totals.items())
+        self.stdout.write(self.style.SUCCESS(f'Hoàn tất trong {elapsed:.1f}s: {summary}'))
+
+    def create_categories(self, count):
+        """Danh mục ít nên tạo trực tiếp; dùng lại danh mục đã có cùng tên"""
+        names = []
+        for i in range(count):
+            cycle, name = divmod(i, len(CATEGORY_NAMES))
+            names.append(CATEGORY_NAMES[name] + (f' {cycle + 1}' if cycle else ''))
+        existing = dict(Category.objects.filter(name__in=names).values_list('name', 'pk'))
+        Category.objects.bulk_create([
+            Category(name=name, slug=slugify(name)) for name in names if name not in existing
+        ], ignore_conflicts=True)
+        return sorted(Category.objects.filter(name__in=names).values_list('pk', flat=True))
+
+    def run(self, kind, config, first, total):
+        if not total:
+            return
+        tasks = [(kind, config, *chunk) for chunk in dataset.chunks(first, total, self.chunk_size)]
+        started = time.monotonic()
+        if self.workers == 1:
+            results = (dataset.generate_and_insert(task) for task in tasks)
+            self.consume(kind, results, total, started)
+            return
+
+        # Đóng kết nối trước khi fork để worker không dùng chung socket/file của process chính
+        connections.close_all()
+        with multiprocessing.Pool(self.workers, initializer=init_worker) as pool:
+            if self.parallel_writes:
+                results = pool.imap_unordered(dataset.generate_and_insert, tasks)
+            else:
+                results = (
+                    [(model.__name__, dataset.insert_rows(model, columns, rows))
+                     for model, columns, rows in generated]
+                    for generated in pool.imap(dataset.generate, tasks)
+                )
+            self.consume(kind, results, total, started)
+
+    def consume(self, kind, results, total, started):
+        done = 0
+        for index, inserted in enumerate(results, start=1):
+            for name, count in inserted:
+                self.totals[name] = self.totals.get(name, 0) + count
+            done = min(done + self.chunk_size, total)
+            elapsed = max(time.monotonic() - started, 1e-9)
+            if index % 10 == 0 or done == total:
+                self.stdout.write(f'{kind}: {done}/{total} ({done / elapsed:.0f} {kind}/giây)')
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from books.images import generate_variants
+from books.models import Author, Book
+
+
+class Command(BaseCommand):
+    """Tạo (hoặc tạo lại) biến thể cho ảnh bìa sách, ảnh tác giả và avatar"""
+    help = 'Tạo các biến thể đã resize (WebP/JPEG) cho toàn bộ ảnh đã upload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--force', action='store_true', help='Tạo lại cả biến thể đã có')
+
+    def handle(self, *args, **options):
+        sources = [
+            (Book, 'cover_image'),
+            (Author, 'photo'),
+            (get_user_model(), 'avatar'),
+        ]
+        jobs = []
+        for model, field_name in sources:
+            storage = model._meta.get_field(field_name).storage
+            names = model.objects.exclude(**{field_name: ''}).values_list(field_name, flat=True)
+            jobs.extend((storage, name) for name in names.iterator())
+
+        written = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [
+                (name, executor.submit(generate_variants, storage, name, options['force']))
+                for storage, name in jobs
+            ]
+            for name, future in futures:
+                try:
+                    written += future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'{name}: {exc}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(jobs)} ảnh, {written} biến thể đã tạo, {failed} lỗi'
+        ))
@@ -0,0 +1,271 @@
+import csv
+import json
+import os
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from books.bulk import generate_unique_slug, slug_candidates
+from books.dataset import analyze_tables
+from books.models import Author, Book, Category, Review
+from books.search import get_search_backend
+from books.statistics import invalidate_snapshot
+
+LANGUAGES = {code for code, _ in Book.LANGUAGE_CHOICES}
+STATUSES = {code for code, _ in Book.STATUS_CHOICES}
+
+
+class RowError(ValueError):
+    """Dòng dữ liệu không hợp lệ"""
+
+
+def read_rows(path, file_format):
+    """Đọc file CSV hoặc JSONL dưới dạng stream các dict"""
+    with open(path, encoding='utf-8', newline='') as source:
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class NameResolver:
+    """
+    Map tên -> id cho Author/Category, nạp một lần vào bộ nhớ.
+
+    Các tên chưa có được tạo theo lô bằng bulk_create, slug được sinh từ tập
+    slug đã nạp sẵn nên không cần query cho từng dòng.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.ids = {}
+        self.slugs = set()
+        for pk, name, slug in model.objects.order_by('-pk').values_list('pk', 'name', 'slug'):
+            self.ids[name] = pk
+            self.slugs.add(slug)
+
+    def _slug(self, name):
+        base = slugify(name)[:190] or 'item'
+        slug = base
+        counter = 2
+        while slug in self.slugs:
+            slug = f'{base}-{counter}'
+            counter += 1
+        self.slugs.add(slug)
+        return slug
+
+    def resolve(self, names):
+        missing = sorted({name for name in names if name not in self.ids})
+        if missing:
+            created = self.model.objects.bulk_create([
+                self.model(name=name, slug=self._slug(name)) for name in missing
+            ])
+            for obj in created:
+                self.ids[obj.name] = obj.pk
+        return self.ids
+
+
+class Command(BaseCommand):
+    """Import catalog (sách hoặc đánh giá) từ CSV/JSONL với bulk_create theo lô"""
+    help = (
+        'Import sách hoặc đánh giá từ file CSV/JSONL. Tác giả và danh mục được '
+        'tra theo tên (tự tạo nếu chưa có); hỗ trợ tiếp tục sau lỗi bằng --resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File CSV hoặc JSONL')
+        parser.add_argument('--type', choices=['books', 'reviews'], default='books')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Mặc định theo đuôi file')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help='File lưu số dòng đã import (mặc định: <path>.checkpoint)'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Bỏ qua các dòng đã import theo checkpoint'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Không tìm thấy file {path}')
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        batch_size = options['batch_size']
+
+        skip = 0
+        if options['resume'] and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                skip = int(f.read().strip() or 0)
+            self.stdout.write(f'Tiếp tục từ dòng {skip}')
+
+        if options['type'] == 'books':
+            self.authors = NameResolver(Author)
+            self.categories = NameResolver(Category)
+            import_batch = self.import_books
+        else:
+            import_batch = self.import_reviews
+
+        rows = islice(read_rows(path, file_format), skip, None)
+        processed = skip
+        self.inserted = self.skipped = self.failed = 0
+        started = time.monotonic()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                import_batch(batch, processed)
+            processed += len(batch)
+            with open(checkpoint, 'w') as f:
+                f.write(str(processed))
+            self.report(processed - skip, started)
+
+        # bulk_create không phát signal: tính lại toàn bộ thống kê ở lần đọc sau
+        invalidate_snapshot()
+        analyze_tables()
+        self.stdout.write(self.style.SUCCESS(
+            f'Hoàn tất: {self.inserted} thêm mới, {self.skipped} bỏ qua (đã có), '
+            f'{self.failed} lỗi'
+        ))
+        self.report(processed - skip, started)
+
+    def report(self, count, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(f'{count} dòng trong {elapsed:.1f}s ({count / elapsed:.0f} dòng/giây)')
+
+    def error(self, line, message):
+        self.failed += 1
+        self.stderr.write(f'Dòng {line}: {message}')
+
+    def parse_book(self, row):
+        try:
+            title = row['title'].strip()
+            isbn = str(row['isbn']).strip()
+            author = row['author_name'].strip()
+            category = row['category_name'].strip()
+            price = Decimal(str(row['price']))
+            publication_date = date.fromisoformat(str(row['publication_date']))
+            pages = int(row.get('pages') or 0)
+            stock_quantity = int(row.get('stock_quantity') or 1)
+        except (KeyError, AttributeError, TypeError, ValueError, InvalidOperation) as exc:
+            raise RowError(f'dữ liệu không hợp lệ ({exc!r})')
+        language = row.get('language') or 'vi'
+        book_status = row.get('status') or 'available'
+        if not (title and author and category):
+            raise RowError('thiếu title/author_name/category_name')
+        if len(isbn) != 13 or not isbn.isdigit():
+            raise RowError('ISBN phải có 13 chữ số')
+        if price <= 0 or pages < 0 or stock_quantity < 0:
+            raise RowError('giá, số trang hoặc tồn kho không hợp lệ')
+        if language not in LANGUAGES or book_status not in STATUSES:
+            raise RowError('language hoặc status không hợp lệ')
+        return {
+            'title': title[:200],
+            'isbn': isbn,
+            'author': author[:200],
+            'category': category[:100],
+            'description': row.get('description') or '',
+            'publisher': (row.get('publisher') or '')[:200],
+            'publication_date': publication_date,
+            'language': language,
+            'pages': pages,
+            'price': price,
+            'status': book_status,
+            'stock_quantity': stock_quantity,
+        }
+
+    def import_books(self, batch, offset):
+        parsed = {}
+        for line, row in enumerate(batch, start=offset + 1):
+            try:
+                data = self.parse_book(row)
+            except RowError as exc:
+                self.error(line, exc)
+                continue
+            if data['isbn'] in parsed:
+                self.skipped += 1
+            else:
+                parsed[data['isbn']] = data
+
+        # Cả slug dự phòng có ISBN, để generate_unique_slug không phải query thêm
+        slugs = {
+            slug for data in parsed.values()
+            for slug in slug_candidates(data['title'], data['isbn'])
+        }
+        existing_isbns = set()
+        taken_slugs = set()
+        for isbn, slug in Book.objects.filter(
+            Q(isbn__in=parsed) | Q(slug__in=slugs)
+        ).values_list('isbn', 'slug'):
+            existing_isbns.add(isbn)
+            taken_slugs.add(slug)
+
+        new_rows = [data for isbn, data in parsed.items() if isbn not in existing_isbns]
+        self.skipped += len(parsed) - len(new_rows)
+        author_ids = self.authors.resolve(data['author'] for data in new_rows)
+        category_ids = self.categories.resolve(data['category'] for data in new_rows)
+
+        books = []
+        for data in new_rows:
+            author = data.pop('author')
+            category = data.pop('category')
+            books.append(Book(
+                author_id=author_ids[author],
+                category_id=category_ids[category],
+                slug=generate_unique_slug(data['title'], data['isbn'], taken_slugs),
+                **data
+            ))
+        created = Book.objects.bulk_create(books)
+        get_search_backend().index_books(book.pk for book in created if book.pk)
+        Book.touch_owners(
+            {book.author_id for book in created}, {book.category_id for book in created}
+        )
+        self.inserted += len(created)
+
+    def import_reviews(self, batch, offset):
+        rows = []
+        for line, row in enumerate(batch, start=offset + 1):
+            try:
+                rating = int(row['rating'])
+                rows.append((line, str(row['isbn']).strip(), row['username'].strip(), rating,
+                             row.get('comment') or ''))
+            except (KeyError, AttributeError, TypeError, ValueError) as exc:
+                self.error(line, f'dữ liệu không hợp lệ ({exc!r})')
+
+        isbns = {isbn for _, isbn, _, _, _ in rows}
+        usernames = {username for _, _, username, _, _ in rows}
+        book_ids = dict(Book.objects.filter(isbn__in=isbns).values_list('isbn', 'pk'))
+        user_ids = dict(
+            get_user_model().objects.filter(username__in=usernames).values_list('username', 'pk')
+        )
+
+        reviews = []
+        for line, isbn, username, rating, comment in rows:
+            if not 1 <= rating <= 5:
+                self.error(line, 'rating phải từ 1 đến 5')
+            elif isbn not in book_ids or username not in user_ids:
+                self.error(line, 'không tìm thấy sách hoặc người dùng')
+            else:
+                reviews.append(Review(
+                    book_id=book_ids[isbn], user_id=user_ids[username],
+                    rating=rating, comment=comment
+                ))
+
+        # Review trùng (book, user) đã có sẵn được bỏ qua nhờ ignore_conflicts
+        before = Review.objects.filter(book_id__in=book_ids.values()).count()
+        Review.objects.bulk_create(reviews, ignore_conflicts=True)
+        inserted = Review.objects.filter(book_id__in=book_ids.values()).count() - before
+        self.inserted += inserted
+        self.skipped += len(reviews) - inserted
+        Book.rebuild_rating_aggregates(Book.objects.filter(pk__in={r.book_id for r in reviews}))
@@ -0,0 +1,219 @@
+import base64
+import http.client
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.dataset import parse_weights
+from books.models import Author, Book, Category
+
+# Tỉ lệ mặc định của từng endpoint. `available`, `category_books` và
+# `author_books` trả về toàn bộ danh sách (không phân trang) nên để trọng số thấp.
+DEFAULT_MIX = {
+    'books_list': 20,
+    'books_filtered': 5,
+    'books_cursor': 5,
+    'book_detail': 20,
+    'book_reviews': 5,
+    'search': 15,
+    'best_sellers': 3,
+    'new_releases': 3,
+    'statistics': 5,
+    'categories': 2,
+    'authors': 3,
+    'category_books': 1,
+    'author_books': 3,
+    'available': 0,
+}
+
+
+class Sample:
+    """Slug, từ khóa... lấy ngẫu nhiên từ database để request trỏ tới dữ liệu có thật"""
+
+    def __init__(self, size, rng):
+        last = Book.objects.order_by('-pk').values_list('pk', flat=True).first()
+        if last is None:
+            raise CommandError('Chưa có sách nào, hãy chạy generate_dataset trước')
+        ids = [rng.randint(1, last) for _ in range(size)]
+        books = list(Book.objects.filter(pk__in=ids).values_list('slug', 'title', 'language'))
+        if not books:
+            books = list(Book.objects.values_list('slug', 'title', 'language')[:size])
+        self.book_slugs = [slug for slug, _, _ in books]
+        self.words = sorted({word for _, title, _ in books for word in title.split() if len(word) > 2})
+        self.languages = sorted({language for _, _, language in books})
+        self.category_slugs = list(Category.objects.values_list('slug', flat=True)[:size])
+        self.author_slugs = list(
+            Author.objects.filter(books__slug__in=self.book_slugs[:200])
+            .values_list('slug', flat=True).distinct()
+        )
+        self.pages = max(Book.objects.count() // 10, 1)
+
+
+def build_url(name, rng, sample):
+    """URL cho một request của endpoint `name`"""
+    if name == 'books_list':
+        # Phần lớn client chỉ xem vài trang đầu
+        return f'/api/books/?page={min(int(rng.paretovariate(1.2)), sample.pages, 100)}'
+    if name == 'books_filtered':
+        ordering = rng.choice(['-price', 'price', 'title', '-publication_date', '-average_rating'])
+        return f'/api/books/?language={rng.choice(sample.languages)}&ordering={ordering}'
+    if name == 'books_cursor':
+        return '/api/books/?pagination=cursor&fields=id,title,price,cover_url'
+    if name == 'book_detail':
+        return f'/api/books/{rng.choice(sample.book_slugs)}/'
+    if name == 'book_reviews':
+        return f'/api/books/{rng.choice(sample.book_slugs)}/reviews/'
+    if name == 'search':
+        return f'/api/search/?q={quote(rng.choice(sample.words or ["sach"]))}'
+    if name == 'best_sellers':
+        return '/api/books/best_sellers/'
+    if name == 'new_releases':
+        return '/api/books/new_releases/'
+    if name == 'available':
+        return '/api/books/available/'
+    if name == 'statistics':
+        return '/api/statistics/'
+    if name == 'categories':
+        return '/api/categories/'
+    if name == 'authors':
+        return f'/api/authors/?page={rng.randint(1, 20)}'
+    if name == 'category_books':
+        return f'/api/categories/{rng.choice(sample.category_slugs)}/books/'
+    if name == 'author_books':
+        return f'/api/authors/{rng.choice(sample.author_slugs)}/books/'
+    raise ValueError(name)
+
+
+def percentile(quantiles, p):
+    return quantiles[p - 1] * 1000
+
+
+class Command(BaseCommand):
+    """Load test: gửi tỉ lệ có trọng số của các endpoint thật tới server đang chạy"""
+    help = (
+        'Gửi request tới server (ví dụ `manage.py runserver` hoặc gunicorn/uvicorn) theo '
+        'tỉ lệ endpoint có trọng số trong một khoảng thời gian, in throughput và '
+        'latency p50/p95/p99 cho từng endpoint. Slug/từ khóa lấy từ database hiện tại.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--duration', type=float, default=30, help='Số giây chạy')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--mix', help='Ghi đè trọng số, ví dụ search=50,book_detail=50 '
+                          f'(endpoint: {", ".join(DEFAULT_MIX)})'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--sample', type=int, default=1000, help='Số sách lấy mẫu')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--auth', help='username:password cho Basic auth')
+
+    def handle(self, *args, **options):
+        mix = dict(DEFAULT_MIX)
+        if options['mix']:
+            try:
+                mix.update(parse_weights(options['mix'], set(DEFAULT_MIX)))
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        mix = {name: weight for name, weight in mix.items() if weight > 0}
+        if not mix:
+            raise CommandError('Cần ít nhất một endpoint có trọng số dương')
+
+        target = urlsplit(options['url'])
+        if target.scheme not in ('http', 'https') or not target.hostname:
+            raise CommandError('--url phải có dạng http://host:port')
+        self.target = target
+        self.timeout = options['timeout']
+        self.headers = {'Accept': 'application/json'}
+        if options['auth']:
+            token = base64.b64encode(options['auth'].encode()).decode()
+            self.headers['Authorization'] = f'Basic {token}'
+
+        sample = Sample(options['sample'], random.Random(options['seed']))
+        names, weights = zip(*mix.items())
+        deadline = time.monotonic() + options['duration']
+        results = []
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(random.Random(f"{options['seed']}:{index}"), names, weights, sample,
+                      deadline, results),
+            )
+            for index in range(options['concurrency'])
+        ]
+        self.stdout.write(
+            f"{options['concurrency']} luồng trong {options['duration']:.0f}s tới {options['url']}"
+        )
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.report(results, time.monotonic() - started)
+
+    def connect(self):
+        connection_class = (
+            http.client.HTTPSConnection if self.target.scheme == 'https' else http.client.HTTPConnection
+        )
+        return connection_class(self.target.hostname, self.target.port, timeout=self.timeout)
+
+    def worker(self, rng, names, weights, sample, deadline, results):
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        conn = self.connect()
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            url = build_url(name, rng, sample)
+            started = time.perf_counter()
+            try:
+                conn.request('GET', url, headers=self.headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+                if response.will_close:
+                    conn.close()
+                    conn = self.connect()
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = self.connect()
+            latencies[name].append(time.perf_counter() - started)
+            if not ok:
+                errors[name] += 1
+        conn.close()
+        results.append((latencies, errors))
+
+    def report(self, results, elapsed):
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        for thread_latencies, thread_errors in results:
+            for name, values in thread_latencies.items():
+                latencies[name].extend(values)
+            for name, count in thread_errors.items():
+                errors[name] += count
+
+        self.stdout.write(
+            f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>9}"
+            f"{'p50':>10}{'p95':>10}{'p99':>10}"
+        )
+        rows = sorted(latencies.items(), key=lambda item: -len(item[1]))
+        rows.append(('TOTAL', [value for values in latencies.values() for value in values]))
+        errors['TOTAL'] = sum(errors.values())
+        for name, values in rows:
+            if len(values) > 1:
+                quantiles = statistics.quantiles(values, n=100, method='inclusive')
+            else:
+                quantiles = values * 99 or [0] * 99
+            self.stdout.write(
+                f'{name:<16}{len(values):>10}{errors[name]:>8}{len(values) / elapsed:>9.1f}'
+                f'{percentile(quantiles, 50):>8.1f}ms{percentile(quantiles, 95):>8.1f}ms'
+                f'{percentile(quantiles, 99):>8.1f}ms'
+            )
+        if errors['TOTAL']:
+            self.stdout.write(self.style.WARNING(f"{errors['TOTAL']} request lỗi (status >= 400 hoặc lỗi kết nối)"))
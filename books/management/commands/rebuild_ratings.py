@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from books.models import Book
+
+
+class Command(BaseCommand):
+    """Tính lại rating_sum, rating_count và average_rating cho sách"""
+    help = 'Tính lại các trường tổng hợp đánh giá của sách từ bảng Review'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Số sách được cập nhật trong mỗi câu UPDATE'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        book_ids = list(Book.objects.order_by('pk').values_list('pk', flat=True))
+        updated = 0
+        for start in range(0, len(book_ids), batch_size):
+            batch = book_ids[start:start + batch_size]
+            updated += Book.rebuild_rating_aggregates(
+                Book.objects.filter(pk__gte=batch[0], pk__lte=batch[-1])
+            )
+        self.stdout.write(self.style.SUCCESS(f'Đã cập nhật {updated} sách'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from books.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """Xây dựng lại index tìm kiếm toàn văn cho sách"""
+    help = 'Xây dựng lại index tìm kiếm toàn văn (FTS) cho sách'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'{backend.__class__.__name__}: đã index {count} sách'
+        ))
@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from bookstore.db_router import get_replicas
+
+
+class Command(BaseCommand):
+    """Chép database SQLite chính sang các file replica để thử read replica ở local"""
+    help = (
+        'Sao chép database default (SQLite) sang mọi alias trong DATABASE_REPLICAS '
+        'bằng backup API của SQLite. Với --interval, lặp lại định kỳ để giả lập '
+        'replica bị trễ so với primary.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Chép lại sau mỗi N giây (0 = chép một lần rồi thoát)',
+        )
+
+    def handle(self, *args, **options):
+        replicas = get_replicas()
+        if not replicas:
+            raise CommandError('Chưa cấu hình DATABASE_REPLICAS (xem SQLITE_REPLICAS trong settings)')
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite' or any(connections[alias].vendor != 'sqlite' for alias in replicas):
+            raise CommandError('sync_replicas chỉ dùng cho SQLite, replica thật do database tự đồng bộ')
+
+        while True:
+            started = time.perf_counter()
+            source.ensure_connection()
+            for alias in replicas:
+                replica = connections[alias]
+                replica.close()
+                target = sqlite3.connect(replica.settings_dict['NAME'])
+                try:
+                    source.connection.backup(target)
+                finally:
+                    target.close()
+            self.stdout.write(
+                f'Đã chép sang {", ".join(replicas)} trong {time.perf_counter() - started:.2f}s'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
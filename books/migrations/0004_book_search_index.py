@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS books_book_fts USING fts5("
+            "title, description, author_name, category_name, isbn, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            "INSERT INTO books_book_fts "
+            "(rowid, title, description, author_name, category_name, isbn) "
+            "SELECT b.id, b.title, b.description, a.name, c.name, b.isbn "
+            "FROM books_book b "
+            "JOIN books_author a ON a.id = b.author_id "
+            "JOIN books_category c ON c.id = b.category_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS books_book_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(default=dict, verbose_name='Dữ liệu thống kê')),
+                ('computed_at', models.DateTimeField(blank=True, null=True, verbose_name='Thời điểm tính lại')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Ngày cập nhật')),
+            ],
+            options={
+                'verbose_name': 'Bản chụp thống kê',
+                'verbose_name_plural': 'Bản chụp thống kê',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reviews_until', models.DateTimeField(blank=True, null=True, verbose_name='Đã xử lý đánh giá tới')),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True, verbose_name='Lần dựng lại toàn bộ')),
+                ('data', models.JSONField(default=dict, verbose_name='Thông tin lần chạy')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Ngày cập nhật')),
+            ],
+            options={
+                'verbose_name': 'Trạng thái sách tương tự',
+                'verbose_name_plural': 'Trạng thái sách tương tự',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Độ tương đồng')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='books.book', verbose_name='Sách')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='books.book', verbose_name='Sách tương tự')),
+            ],
+            options={
+                'verbose_name': 'Sách tương tự',
+                'verbose_name_plural': 'Sách tương tự',
+                'indexes': [models.Index(fields=['book', '-score'], name='similarity_book_score_idx')],
+                'unique_together': {('book', 'similar')},
+            },
+        ),
+    ]
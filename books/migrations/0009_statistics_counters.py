@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_book_status_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Tên bộ đếm')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Giá trị')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Ngày cập nhật')),
+            ],
+            options={
+                'verbose_name': 'Bộ đếm thống kê',
+                'verbose_name_plural': 'Bộ đếm thống kê',
+            },
+        ),
+        migrations.RemoveField(
+            model_name='statisticssnapshot',
+            name='data',
+        ),
+    ]
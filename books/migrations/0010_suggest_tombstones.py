@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_statistics_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='Loại')),
+                ('object_id', models.BigIntegerField(verbose_name='ID')),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Ngày xóa')),
+            ],
+            options={
+                'verbose_name': 'Entry gợi ý đã xóa',
+                'verbose_name_plural': 'Entry gợi ý đã xóa',
+            },
+        ),
+    ]
@@ -1,8 +1,13 @@
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Now, NullIf
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 from django.conf import settings
 
+from .images import remember_images
+
 
 class Category(models.Model):
     """Model cho danh mục sách"""
@@ -56,6 +61,13 @@ class Author(models.Model):
     def get_absolute_url(self):
         return reverse('author-detail', kwargs={'slug': self.slug})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Ghi nhớ ảnh đã load để chỉ tạo lại biến thể khi ảnh đổi"""
+        instance = super().from_db(db, field_names, values)
+        remember_images(instance, 'photo')
+        return instance
+
 
 class Book(models.Model):
     """Model cho sách"""
@@ -121,6 +133,14 @@ class Book(models.Model):
         default=1, 
         verbose_name="Số lượng tồn kho"
     )
+    # Tổng hợp đánh giá (denormalized), được cập nhật khi Review thay đổi
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name="Tổng điểm đánh giá")
+    rating_count = models.PositiveIntegerField(default=0, verbose_name="Số lượt đánh giá")
+    average_rating = models.FloatField(
+        default=0,
+        db_index=True,
+        verbose_name="Điểm đánh giá trung bình"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật")
 
@@ -128,6 +148,25 @@ class Book(models.Model):
         verbose_name = "Sách"
         verbose_name_plural = "Sách"
         ordering = ['-created_at']
+        indexes = [
+            # Sắp xếp mặc định và các ordering của BookViewSet
+            models.Index(fields=['created_at'], name='book_created_idx'),
+            models.Index(fields=['price'], name='book_price_idx'),
+            models.Index(fields=['title'], name='book_title_idx'),
+            models.Index(fields=['publication_date'], name='book_pubdate_idx'),
+            # Các filter kèm sắp xếp theo ngày tạo
+            models.Index(fields=['status', 'stock_quantity'], name='book_status_stock_idx'),
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='available', stock_quantity__gt=0),
+                name='book_available_created_idx',
+            ),
+            models.Index(fields=['status', 'created_at'], name='book_status_created_idx'),
+            models.Index(fields=['language', 'created_at'], name='book_lang_created_idx'),
+            models.Index(fields=['publisher', 'created_at'], name='book_publisher_created_idx'),
+            models.Index(fields=['category', 'created_at'], name='book_category_created_idx'),
+            models.Index(fields=['author', 'created_at'], name='book_author_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -140,18 +179,89 @@ class Book(models.Model):
     def get_absolute_url(self):
         return reverse('book-detail', kwargs={'slug': self.slug})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Ghi nhớ tác giả/danh mục, giá trị thống kê và ảnh bìa đã load để biết chúng có đổi khi lưu"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_owners = (
+            instance.__dict__.get('author_id'),
+            instance.__dict__.get('category_id'),
+        )
+        instance._loaded_stats = instance.get_stats_key()
+        remember_images(instance, 'cover_image')
+        return instance
+
+    def get_stats_key(self):
+        """(category_id, language, is_available) hoặc None nếu thiếu dữ liệu"""
+        loaded = self.__dict__
+        if not all(name in loaded for name in ('category_id', 'language', 'status', 'stock_quantity')):
+            return None
+        return (self.category_id, self.language, self.is_available)
+
     @property
     def is_available(self):
         """Kiểm tra sách có sẵn không"""
         return self.status == 'available' and self.stock_quantity > 0
 
-    @property
-    def average_rating(self):
-        """Tính điểm đánh giá trung bình"""
-        reviews = self.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 0
+    @classmethod
+    def touch_owners(cls, author_ids, category_ids):
+        """
+        Cập nhật updated_at của tác giả/danh mục có số sách vừa đổi, để
+        validator của conditional GET (trang chi tiết sách hiển thị số sách)
+        chỉ cần đọc chính dòng tác giả/danh mục. Dùng UPDATE nên không chạy
+        lại signal của Author/Category.
+        """
+        now = timezone.now()
+        author_ids = {pk for pk in author_ids if pk is not None}
+        category_ids = {pk for pk in category_ids if pk is not None}
+        if author_ids:
+            Author.objects.filter(pk__in=author_ids).update(updated_at=now)
+        if category_ids:
+            Category.objects.filter(pk__in=category_ids).update(updated_at=now)
+
+    @classmethod
+    def apply_rating_delta(cls, book_id, sum_delta, count_delta):
+        """Cập nhật nguyên tử các trường tổng hợp đánh giá bằng một câu UPDATE"""
+        new_sum = F('rating_sum') + sum_delta
+        new_count = F('rating_count') + count_delta
+        return cls.objects.filter(pk=book_id).update(
+            updated_at=timezone.now(),
+            rating_sum=new_sum,
+            rating_count=new_count,
+            average_rating=Coalesce(
+                Cast(new_sum, models.FloatField()) / NullIf(new_count, 0),
+                Value(0.0),
+                output_field=models.FloatField(),
+            ),
+        )
+
+    @classmethod
+    def rebuild_rating_aggregates(cls, queryset=None):
+        """
+        Tính lại tổng hợp đánh giá từ bảng Review trong một câu UPDATE, chỉ ghi
+        (và đổi updated_at) các sách có giá trị thực sự thay đổi
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        reviews = Review.objects.filter(book=OuterRef('pk')).order_by().values('book')
+        rating_sum = Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0)
+        rating_count = Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0)
+        average_rating = Coalesce(
+            Cast(rating_sum, models.FloatField()) / NullIf(rating_count, 0),
+            Value(0.0),
+            output_field=models.FloatField(),
+        )
+        changed = queryset.annotate(
+            new_sum=rating_sum, new_count=rating_count, new_average=average_rating,
+        ).exclude(
+            rating_sum=F('new_sum'), rating_count=F('new_count'), average_rating=F('new_average'),
+        )
+        return cls.objects.filter(pk__in=changed.values('pk')).update(
+            updated_at=Now(),
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            average_rating=average_rating,
+        )
 
 
 class Review(models.Model):
@@ -180,6 +290,108 @@ class Review(models.Model):
         verbose_name_plural = "Đánh giá"
         unique_together = ['book', 'user']  # Mỗi user chỉ đánh giá 1 lần
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='review_created_idx'),
+            models.Index(fields=['book', 'created_at'], name='review_book_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='review_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.book.title} - {self.rating}/5"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Ghi nhớ book/rating đã lưu để tính delta khi cập nhật"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = (
+            instance.__dict__.get('book_id'),
+            instance.__dict__.get('rating'),
+        )
+        return instance
+
+
+class StatisticsSnapshot(models.Model):
+    """
+    Trạng thái snapshot thống kê phục vụ BookStatisticsView: thời điểm các bộ
+    đếm (StatisticsCounter) được tính lại toàn bộ, None nếu cần tính lại
+    """
+    computed_at = models.DateTimeField(null=True, blank=True, verbose_name="Thời điểm tính lại")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật")
+
+    class Meta:
+        verbose_name = "Bản chụp thống kê"
+        verbose_name_plural = "Bản chụp thống kê"
+
+    def __str__(self):
+        return f"Thống kê lúc {self.computed_at}"
+
+
+class SuggestTombstone(models.Model):
+    """Entry đã bị xóa khỏi index gợi ý, để các process khác xóa theo khi sync"""
+    kind = models.CharField(max_length=20, verbose_name="Loại")
+    object_id = models.BigIntegerField(verbose_name="ID")
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Ngày xóa")
+
+    class Meta:
+        verbose_name = "Entry gợi ý đã xóa"
+        verbose_name_plural = "Entry gợi ý đã xóa"
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
+
+
+class StatisticsCounter(models.Model):
+    """Một bộ đếm của snapshot thống kê (total_books, category:<id>, language:<mã>...)"""
+    name = models.CharField(max_length=100, unique=True, verbose_name="Tên bộ đếm")
+    value = models.BigIntegerField(default=0, verbose_name="Giá trị")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật")
+
+    class Meta:
+        verbose_name = "Bộ đếm thống kê"
+        verbose_name_plural = "Bộ đếm thống kê"
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class BookSimilarity(models.Model):
+    """Top-N sách tương tự của một sách, tính từ đánh giá chung (books.recommendations)"""
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name="Sách"
+    )
+    similar = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name="Sách tương tự"
+    )
+    score = models.FloatField(verbose_name="Độ tương đồng")
+
+    class Meta:
+        verbose_name = "Sách tương tự"
+        verbose_name_plural = "Sách tương tự"
+        unique_together = ['book', 'similar']
+        indexes = [
+            models.Index(fields=['book', '-score'], name='similarity_book_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
+class SimilarityState(models.Model):
+    """Trạng thái lần dựng BookSimilarity gần nhất (một dòng duy nhất)"""
+    reviews_until = models.DateTimeField(null=True, blank=True, verbose_name="Đã xử lý đánh giá tới")
+    rebuilt_at = models.DateTimeField(null=True, blank=True, verbose_name="Lần dựng lại toàn bộ")
+    data = models.JSONField(default=dict, verbose_name="Thông tin lần chạy")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật")
+
+    class Meta:
+        verbose_name = "Trạng thái sách tương tự"
+        verbose_name_plural = "Trạng thái sách tương tự"
+
+    def __str__(self):
+        return f"Sách tương tự tới {self.reviews_until}"
@@ -0,0 +1,164 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Phân trang theo keyset (cursor) dựa trên ordering hiện tại của queryset,
+    luôn thêm `id` làm khóa phụ để thứ tự là duy nhất.
+
+    Không dùng COUNT(*) và OFFSET nên thời gian mỗi trang không phụ thuộc độ sâu,
+    và cursor vẫn ổn định khi có bản ghi mới được thêm vào.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Cursor không hợp lệ'
+
+    def get_ordering(self, queryset):
+        """Trả về [(field, descending), ...] hoặc None nếu ordering không hỗ trợ keyset"""
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        model = queryset.model
+        result = []
+        for term in ordering:
+            if not isinstance(term, str):
+                return None
+            descending = term.startswith('-')
+            name = term.lstrip('-')
+            if name == 'pk':
+                name = model._meta.pk.name
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.is_relation or field.null:
+                return None
+            result.append((field, descending))
+        pk = model._meta.pk
+        if not any(field == pk for field, _ in result):
+            result.append((pk, result[-1][1] if result else False))
+        return result
+
+    def encode_cursor(self, values, reverse=False):
+        payload = {'v': values}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload, separators=(',', ':'), default=str)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = [
+                field.to_python(value)
+                for (field, _), value in zip(self.ordering, payload['v'], strict=True)
+            ]
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise exceptions.ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def build_filter(self, values, reverse):
+        """Điều kiện (f1, f2, ...) > (v1, v2, ...) theo hướng sắp xếp của từng cột"""
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{field.attname}__{lookup}': value})
+            equal &= Q(**{field.attname: value})
+        # Điều kiện thừa trên cột đầu tiên để database dùng được range scan trên index
+        (field, descending), value = self.ordering[0], values[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{field.attname}__{lookup}': value}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = self.get_ordering(queryset)
+        if self.ordering is None:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        cursor = request.query_params.get(self.cursor_query_param)
+        reverse = False
+        if cursor:
+            values, reverse = self.decode_cursor(cursor)
+            queryset = queryset.filter(self.build_filter(values, reverse))
+
+        order_by = [
+            f"{'-' if descending != reverse else ''}{field.attname}"
+            for field, descending in self.ordering
+        ]
+        rows = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Trang trước/sau: khi đi lùi, "còn nữa" nghĩa là còn trang trước
+        self.has_next = has_more if not reverse else bool(cursor)
+        self.has_previous = bool(cursor) if not reverse else has_more
+        self.first = rows[0] if rows else None
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_values(self, obj):
+        return [getattr(obj, field.attname) for field, _ in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        cursor = self.encode_cursor(self.get_values(self.last))
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        cursor = self.encode_cursor(self.get_values(self.first), reverse=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class BookstorePagination(PageNumberPagination):
+    """
+    Phân trang mặc định: theo số trang như cũ, hoặc theo keyset khi client
+    gửi `?pagination=cursor` hoặc một `cursor` lấy từ link next/previous.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def wants_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor' or
+            self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.wants_keyset(request):
+            keyset = self.keyset_class()
+            keyset.page_size = self.get_page_size(request) or keyset.page_size
+            page = keyset.paginate_queryset(queryset, request, view)
+            if page is not None:
+                keyset.base_url = remove_query_param(keyset.base_url, self.page_query_param)
+                self.keyset = keyset
+                return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,194 @@
+import itertools
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+from .models import Book, BookSimilarity, Review, SimilarityState
+
+STATE_ID = 1
+
+
+def get_top():
+    """Số sách tương tự lưu cho mỗi sách, cấu hình bằng BOOK_SIMILAR_TOP"""
+    return getattr(settings, 'BOOK_SIMILAR_TOP', 20)
+
+
+def get_min_common():
+    """Số người đánh giá chung tối thiểu để hai sách được coi là tương tự"""
+    return getattr(settings, 'BOOK_SIMILAR_MIN_COMMON', 2)
+
+
+def get_block_size():
+    """Số dòng nhân ma trận mỗi lần (giới hạn bộ nhớ), cấu hình bằng BOOK_SIMILAR_BLOCK_SIZE"""
+    return getattr(settings, 'BOOK_SIMILAR_BLOCK_SIZE', 2000)
+
+
+def similar_books(book):
+    """Queryset các sách tương tự đã lưu của `book`, độ tương đồng giảm dần"""
+    return Book.objects.filter(similar_to__book=book).order_by('-similar_to__score', 'pk')
+
+
+class RatingMatrix:
+    """
+    Ma trận thưa sách × user (CSR), giá trị là điểm đánh giá, mỗi dòng chuẩn hóa
+    L2 để tích vô hướng hai dòng là cosine của hai sách. `binary` cùng cấu trúc
+    nhưng giá trị 1, tích của nó là số người đánh giá chung.
+    """
+
+    def __init__(self, book_ids, user_ids, ratings):
+        self.books, rows = np.unique(book_ids, return_inverse=True)
+        self.users, columns = np.unique(user_ids, return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (ratings.astype(np.float32), (rows, columns)), shape=(len(self.books), len(self.users))
+        )
+        matrix.sum_duplicates()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        self.normalized = sparse.csr_matrix(sparse.diags(1 / norms) @ matrix, dtype=np.float32)
+        self.binary = self.normalized.copy()
+        self.binary.data[:] = 1
+        # Nhân với ma trận chuyển vị dạng CSR để scipy không phải chuyển đổi mỗi block
+        self.normalized_t = self.normalized.T.tocsr()
+        self.binary_t = self.binary.T.tocsr()
+
+    @classmethod
+    def from_reviews(cls, queryset=None):
+        queryset = Review.objects.all() if queryset is None else queryset
+        values = np.fromiter(
+            itertools.chain.from_iterable(
+                queryset.order_by().values_list('book_id', 'user_id', 'rating').iterator(chunk_size=10000)
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 3)
+        return cls(values[:, 0], values[:, 1], values[:, 2])
+
+    @property
+    def shape(self):
+        return self.normalized.shape
+
+    def rows_for(self, book_ids):
+        """Chỉ số dòng của các sách (bỏ qua sách không có đánh giá)"""
+        return np.intersect1d(self.books, np.asarray(book_ids, dtype=np.int64), return_indices=True)[1]
+
+    def books_rated_by(self, user_ids):
+        """Id các sách mà những user này đã đánh giá"""
+        columns = np.intersect1d(self.users, np.asarray(user_ids, dtype=np.int64), return_indices=True)[1]
+        return self.books[np.unique(self.binary_t[columns].indices)]
+
+    def neighbours(self, rows, top, min_common):
+        """
+        Top-`top` sách tương tự của các dòng `rows` (mảng đã sắp xếp).
+        Trả về (book_id, similar_id, score) dạng mảng, sắp theo book_id rồi score giảm dần.
+        """
+        scores = self.normalized[rows] @ self.normalized_t
+        common = self.binary[rows] @ self.binary_t
+        scores.sort_indices()
+        common.sort_indices()
+        # Hai tích có cùng cấu trúc thưa nên data của chúng khớp nhau theo vị trí
+        source = rows[np.repeat(np.arange(len(rows)), np.diff(scores.indptr))]
+        target = scores.indices
+        keep = (common.data >= min_common) & (target != source)
+        source, target, score = source[keep], target[keep], scores.data[keep]
+
+        order = np.lexsort((target, -score, source))
+        source, target, score = source[order], target[order], score[order]
+        starts = np.flatnonzero(np.r_[True, source[1:] != source[:-1]]) if len(source) else source
+        rank = np.arange(len(source)) - np.repeat(starts, np.diff(np.r_[starts, len(source)]))
+        keep = rank < top
+        return self.books[source[keep]], self.books[target[keep]], score[keep]
+
+
+def save_neighbours(book_ids, sources, targets, scores):
+    """Thay các dòng BookSimilarity của `book_ids` bằng kết quả mới trong một transaction"""
+    with transaction.atomic():
+        BookSimilarity.objects.filter(book_id__in=book_ids).delete()
+        BookSimilarity.objects.bulk_create(
+            [
+                BookSimilarity(book_id=source, similar_id=target, score=score)
+                for source, target, score in zip(sources.tolist(), targets.tolist(), scores.tolist())
+            ],
+            batch_size=2000,
+        )
+
+
+def changed_books(matrix, since):
+    """
+    Sách cần tính lại sau các đánh giá mới/sửa từ `since`: sách được đánh giá và
+    mọi sách khác của những user đó (cặp sách có thêm người đánh giá chung).
+    """
+    changes = list(Review.objects.filter(updated_at__gt=since).values_list('book_id', 'user_id'))
+    if not changes:
+        return []
+    books, users = zip(*changes)
+    return np.union1d(np.asarray(books, dtype=np.int64), matrix.books_rated_by(users))
+
+
+def build_similarities(incremental=False, top=None, min_common=None, block_size=None, log=None):
+    """
+    Dựng bảng BookSimilarity từ Review.
+
+    `incremental=True` chỉ tính lại những sách bị ảnh hưởng bởi đánh giá mới
+    hoặc sửa kể từ lần chạy trước (tự chuyển sang dựng toàn bộ nếu chưa có lần
+    nào). Đánh giá bị xóa và độ lệch nhỏ ở sách không bị tính lại chỉ được sửa
+    khi dựng lại toàn bộ, nên vẫn cần chạy toàn bộ định kỳ.
+    """
+    if np is None or sparse is None:
+        raise ImproperlyConfigured('Cần cài numpy và scipy để dựng sách tương tự')
+    top = top or get_top()
+    min_common = get_min_common() if min_common is None else min_common
+    block_size = block_size or get_block_size()
+    log = log or (lambda message: None)
+
+    started = time.perf_counter()
+    state = SimilarityState.objects.filter(pk=STATE_ID).first()
+    if incremental and (state is None or state.reviews_until is None):
+        log('Chưa có lần dựng nào, dựng lại toàn bộ')
+        incremental = False
+    until = timezone.now()
+    matrix = RatingMatrix.from_reviews()
+    log(f'Ma trận {matrix.shape[0]} sách × {matrix.shape[1]} user, {matrix.normalized.nnz} đánh giá '
+        f'({time.perf_counter() - started:.2f}s)')
+
+    if incremental:
+        rows = matrix.rows_for(changed_books(matrix, state.reviews_until))
+    else:
+        rows = np.arange(matrix.shape[0])
+
+    pairs = 0
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        sources, targets, scores = matrix.neighbours(block, top, min_common)
+        save_neighbours(matrix.books[block].tolist(), sources, targets, scores)
+        pairs += len(scores)
+        log(f'{min(start + block_size, len(rows))}/{len(rows)} sách, {pairs} cặp '
+            f'({time.perf_counter() - started:.2f}s)')
+
+    if not incremental:
+        # Sách không còn đánh giá nào
+        BookSimilarity.objects.filter(
+            ~Exists(Review.objects.filter(book_id=OuterRef('book_id')))
+        ).delete()
+
+    result = {
+        'incremental': incremental,
+        'books': len(rows),
+        'pairs': pairs,
+        'reviews': int(matrix.normalized.nnz),
+        'top': top,
+        'min_common': min_common,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+    defaults = {'reviews_until': until, 'data': result}
+    if not incremental:
+        defaults['rebuilt_at'] = until
+    SimilarityState.objects.update_or_create(pk=STATE_ID, defaults=defaults)
+    return result
@@ -0,0 +1,139 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Author, Book, Category
+
+
+class BaseSearchBackend:
+    """Backend tìm kiếm sách cơ bản (không có index, lọc bằng icontains)"""
+
+    def search(self, queryset, query):
+        """Lọc queryset theo từ khóa, sắp xếp theo độ liên quan nếu có thể"""
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(author__name__icontains=query) |
+            Q(category__name__icontains=query) |
+            Q(isbn__icontains=query)
+        )
+
+    def index_books(self, book_ids):
+        """Cập nhật index cho các sách"""
+
+    def index_author(self, author_id):
+        """Cập nhật index cho toàn bộ sách của tác giả"""
+
+    def index_category(self, category_id):
+        """Cập nhật index cho toàn bộ sách trong danh mục"""
+
+    def remove_books(self, book_ids):
+        """Xóa các sách khỏi index"""
+
+    def rebuild(self):
+        """Xây dựng lại toàn bộ index"""
+        return 0
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """Backend tìm kiếm dùng bảng ảo FTS5 của SQLite, xếp hạng bằng BM25"""
+    table = 'books_book_fts'
+    columns = ['title', 'description', 'author_name', 'category_name', 'isbn']
+    # Trọng số BM25 theo thứ tự cột ở trên
+    weights = [10.0, 1.0, 5.0, 3.0, 8.0]
+    token_re = re.compile(r'\w+', re.UNICODE)
+
+    def create_table(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            f"{', '.join(self.columns)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def drop_table(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def build_match_query(self, query):
+        """Chuyển từ khóa người dùng thành biểu thức MATCH an toàn (prefix cho từ cuối)"""
+        tokens = self.token_re.findall(query)
+        if not tokens:
+            return None
+        terms = [f'"{token}"' for token in tokens[:-1]]
+        terms.append(f'"{tokens[-1]}"*')
+        return ' '.join(terms)
+
+    def search(self, queryset, query):
+        match = self.build_match_query(query)
+        if match is None:
+            return queryset.none()
+        book_table = Book._meta.db_table
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = {book_table}.id', f'{self.table} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'bm25({self.table}, {weights})'},
+        ).order_by('search_rank', '-created_at')
+
+    def _reindex(self, where, params):
+        book_table = Book._meta.db_table
+        author_table = Author._meta.db_table
+        category_table = Category._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN "
+                f"(SELECT b.id FROM {book_table} b WHERE {where})",
+                params,
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, {', '.join(self.columns)}) "
+                f"SELECT b.id, b.title, b.description, a.name, c.name, b.isbn "
+                f"FROM {book_table} b "
+                f"JOIN {author_table} a ON a.id = b.author_id "
+                f"JOIN {category_table} c ON c.id = b.category_id "
+                f"WHERE {where}",
+                params,
+            )
+
+    def index_books(self, book_ids):
+        book_ids = list(book_ids)
+        if book_ids:
+            placeholders = ', '.join(['%s'] * len(book_ids))
+            self._reindex(f'b.id IN ({placeholders})', book_ids)
+
+    def index_author(self, author_id):
+        self._reindex('b.author_id = %s', [author_id])
+
+    def index_category(self, category_id):
+        self._reindex('b.category_id = %s', [category_id])
+
+    def remove_books(self, book_ids):
+        book_ids = list(book_ids)
+        if book_ids:
+            placeholders = ', '.join(['%s'] * len(book_ids))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})",
+                    book_ids,
+                )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            self.create_table(cursor)
+            cursor.execute(f"DELETE FROM {self.table}")
+        self._reindex('1 = 1', [])
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {self.table}")
+            return cursor.fetchone()[0]
+
+
+def get_search_backend():
+    """Lấy backend tìm kiếm từ settings.BOOK_SEARCH_BACKEND hoặc theo loại database"""
+    backend_path = getattr(settings, 'BOOK_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTS5Backend()
+    return BaseSearchBackend()
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from .fieldsets import DynamicFieldsMixin
+from .images import image_url, variant_urls
 from .models import Category, Author, Book, Review
 
 
@@ -15,42 +17,102 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['slug', 'created_at', 'updated_at']
     
     def get_books_count(self, obj):
-        """Đếm số sách trong danh mục"""
-        return obj.books.count()
+        """Đếm số sách trong danh mục (ưu tiên giá trị đã annotate sẵn)"""
+        count = getattr(obj, 'books_count', None)
+        if count is None:
+            count = obj.books.count()
+        return count
 
 
 class AuthorSerializer(serializers.ModelSerializer):
     """Serializer cho Author model"""
     books_count = serializers.SerializerMethodField()
     photo_url = serializers.SerializerMethodField()
+    photo_urls = serializers.SerializerMethodField()
     
     class Meta:
         model = Author
         fields = [
             'id', 'name', 'bio', 'email', 'website', 'photo', 'photo_url',
-            'slug', 'created_at', 'updated_at', 'books_count'
+            'photo_urls', 'slug', 'created_at', 'updated_at', 'books_count'
         ]
         read_only_fields = ['slug', 'created_at', 'updated_at']
     
     def get_books_count(self, obj):
-        """Đếm số sách của tác giả"""
-        return obj.books.count()
+        """Đếm số sách của tác giả (ưu tiên giá trị đã annotate sẵn)"""
+        count = getattr(obj, 'books_count', None)
+        if count is None:
+            count = obj.books.count()
+        return count
     
     def get_photo_url(self, obj):
-        """Lấy URL của ảnh tác giả"""
-        if obj.photo:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.photo.url)
-            return obj.photo.url
-        return None
+        """Lấy URL của ảnh tác giả (hoặc biến thể theo ?photo_size=)"""
+        return image_url(obj.photo, self.context.get('request'), param='photo')
+    
+    def get_photo_urls(self, obj):
+        """URL các biến thể đã resize của ảnh tác giả"""
+        return variant_urls(obj.photo, self.context.get('request'))
+
+
+class ReviewSerializer(serializers.ModelSerializer):
+    """Serializer cho Review model"""
+    user_username = serializers.CharField(source='user.username', read_only=True)
+    book_title = serializers.CharField(source='book.title', read_only=True)
+    
+    class Meta:
+        model = Review
+        fields = [
+            'id', 'book', 'book_title', 'user', 'user_username',
+            'rating', 'comment', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['user', 'created_at', 'updated_at']
+    
+    def create(self, validated_data):
+        """Tự động gán user hiện tại khi tạo review"""
+        validated_data['user'] = self.context['request'].user
+        return super().create(validated_data)
+    
+    def validate_rating(self, value):
+        """Validate rating phải từ 1-5"""
+        if value < 1 or value > 5:
+            raise serializers.ValidationError("Rating phải từ 1 đến 5")
+        return value
 
 
-class BookListSerializer(serializers.ModelSerializer):
+class BookFieldsMixin(DynamicFieldsMixin):
+    """Sparse fieldsets (`?fields=`) và mở rộng (`?expand=`) dùng chung cho serializer sách"""
+    expandable_fields = {
+        'author': (AuthorSerializer, {}),
+        'category': (CategorySerializer, {}),
+        'reviews': (ReviewSerializer, {'many': True}),
+    }
+    prefetch_querysets = {
+        'reviews': Review.objects.select_related('user'),
+    }
+    field_sources = {
+        'cover_url': ['cover_image'],
+        'cover_urls': ['cover_image'],
+        'is_available': ['status', 'stock_quantity'],
+        'reviews_count': ['rating_count'],
+        # book_title của từng review đọc lại title của sách
+        'reviews': ['reviews', 'title'],
+    }
+    
+    def to_representation(self, instance):
+        """Chuyển số sách đã annotate sẵn xuống author/category lồng bên trong"""
+        for relation in ('author', 'category'):
+            count = getattr(instance, f'{relation}_books_count', None)
+            if count is not None:
+                setattr(getattr(instance, relation), 'books_count', count)
+        return super().to_representation(instance)
+
+
+class BookListSerializer(BookFieldsMixin, serializers.ModelSerializer):
     """Serializer cho danh sách sách (tối ưu cho performance)"""
     author_name = serializers.CharField(source='author.name', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     cover_url = serializers.SerializerMethodField()
+    cover_urls = serializers.SerializerMethodField()
     is_available = serializers.BooleanField(read_only=True)
     
     class Meta:
@@ -58,26 +120,26 @@ class BookListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'slug', 'author_name', 'category_name',
             'isbn', 'publication_date', 'publisher', 'language',
-            'price', 'cover_url', 'status', 'stock_quantity',
+            'price', 'cover_url', 'cover_urls', 'status', 'stock_quantity',
             'is_available', 'created_at'
         ]
         read_only_fields = ['slug', 'created_at']
     
     def get_cover_url(self, obj):
-        """Lấy URL của ảnh bìa sách"""
-        if obj.cover_image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.cover_image.url)
-            return obj.cover_image.url
-        return None
+        """Lấy URL của ảnh bìa sách (hoặc biến thể theo ?cover_size=)"""
+        return image_url(obj.cover_image, self.context.get('request'))
+    
+    def get_cover_urls(self, obj):
+        """URL các biến thể đã resize của ảnh bìa"""
+        return variant_urls(obj.cover_image, self.context.get('request'))
 
 
-class BookDetailSerializer(serializers.ModelSerializer):
+class BookDetailSerializer(BookFieldsMixin, serializers.ModelSerializer):
     """Serializer chi tiết cho sách"""
     author = AuthorSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     cover_url = serializers.SerializerMethodField()
+    cover_urls = serializers.SerializerMethodField()
     is_available = serializers.BooleanField(read_only=True)
     average_rating = serializers.FloatField(read_only=True)
     reviews_count = serializers.SerializerMethodField()
@@ -87,49 +149,23 @@ class BookDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'slug', 'author', 'category', 'description',
             'isbn', 'publication_date', 'publisher', 'language', 'pages',
-            'price', 'cover_image', 'cover_url', 'status', 'stock_quantity',
+            'price', 'cover_image', 'cover_url', 'cover_urls', 'status', 'stock_quantity',
             'is_available', 'average_rating', 'reviews_count',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['slug', 'created_at', 'updated_at']
     
     def get_cover_url(self, obj):
-        """Lấy URL của ảnh bìa sách"""
-        if obj.cover_image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.cover_image.url)
-            return obj.cover_image.url
-        return None
+        """Lấy URL của ảnh bìa sách (hoặc biến thể theo ?cover_size=)"""
+        return image_url(obj.cover_image, self.context.get('request'))
     
-    def get_reviews_count(self, obj):
-        """Đếm số đánh giá của sách"""
-        return obj.reviews.count()
-
-
-class ReviewSerializer(serializers.ModelSerializer):
-    """Serializer cho Review model"""
-    user_username = serializers.CharField(source='user.username', read_only=True)
-    book_title = serializers.CharField(source='book.title', read_only=True)
+    def get_cover_urls(self, obj):
+        """URL các biến thể đã resize của ảnh bìa"""
+        return variant_urls(obj.cover_image, self.context.get('request'))
     
-    class Meta:
-        model = Review
-        fields = [
-            'id', 'book', 'book_title', 'user', 'user_username',
-            'rating', 'comment', 'created_at', 'updated_at'
-        ]
-        read_only_fields = ['user', 'created_at', 'updated_at']
-    
-    def create(self, validated_data):
-        """Tự động gán user hiện tại khi tạo review"""
-        validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
-    
-    def validate_rating(self, value):
-        """Validate rating phải từ 1-5"""
-        if value < 1 or value > 5:
-            raise serializers.ValidationError("Rating phải từ 1 đến 5")
-        return value
+    def get_reviews_count(self, obj):
+        """Số đánh giá của sách (đã được tổng hợp sẵn trên Book)"""
+        return obj.rating_count
 
 
 class BookCreateUpdateSerializer(serializers.ModelSerializer):
@@ -159,4 +195,87 @@ class BookCreateUpdateSerializer(serializers.ModelSerializer):
         """Validate số lượng tồn kho"""
         if value < 0:
             raise serializers.ValidationError("Số lượng tồn kho không được âm")
-        return value 
\ No newline at end of file
+        return value 
+
+class BookBulkItemSerializer(BookCreateUpdateSerializer):
+    """
+    Serializer cho một dòng trong bulk write.
+
+    Tác giả/danh mục được tra trong map nạp sẵn (context) và ISBN không có
+    UniqueValidator, để việc validate cả lô không tốn query cho từng dòng.
+    """
+    author = serializers.IntegerField()
+    category = serializers.IntegerField()
+    isbn = serializers.CharField(max_length=13)
+
+    class Meta(BookCreateUpdateSerializer.Meta):
+        fields = [
+            'title', 'author', 'category', 'description', 'isbn',
+            'publication_date', 'publisher', 'language', 'pages',
+            'price', 'status', 'stock_quantity'
+        ]
+
+    def validate_author(self, value):
+        """Tra tác giả trong map đã nạp sẵn"""
+        author = self.context['authors'].get(value)
+        if author is None:
+            raise serializers.ValidationError("Tác giả không tồn tại")
+        return author
+
+    def validate_category(self, value):
+        """Tra danh mục trong map đã nạp sẵn"""
+        category = self.context['categories'].get(value)
+        if category is None:
+            raise serializers.ValidationError("Danh mục không tồn tại")
+        return category
+
+
+class BookBulkDeleteSerializer(serializers.Serializer):
+    """Danh sách ISBN cần xóa trong DELETE /api/books/bulk/"""
+    isbns = serializers.ListField(
+        child=serializers.RegexField(
+            r'^\d{13}$', error_messages={'invalid': 'ISBN phải gồm đúng 13 chữ số'}
+        )
+    )
+
+    def validate_isbns(self, value):
+        max_items = self.context.get('max_items')
+        if max_items and len(value) > max_items:
+            raise serializers.ValidationError(f"Tối đa {max_items} ISBN mỗi lô")
+        return value
+
+
+class BookExportQuerySerializer(serializers.Serializer):
+    """Bộ lọc query string của /api/export/books/"""
+    language = serializers.ChoiceField(choices=Book.LANGUAGE_CHOICES, required=False)
+    category = serializers.IntegerField(min_value=1, required=False)
+
+
+class StockChangeSerializer(serializers.Serializer):
+    """Số lượng cho checkout/return một sách"""
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class CheckoutSerializer(StockChangeSerializer):
+    """Checkout một sách: mượn (borrow) hoặc đặt trước (reserve)"""
+    type = serializers.ChoiceField(choices=['borrow', 'reserve'], default='borrow')
+
+
+class StockItemSerializer(StockChangeSerializer):
+    """Một dòng trong checkout/return theo lô"""
+    book = serializers.IntegerField(min_value=1)
+
+
+class StockBatchSerializer(serializers.Serializer):
+    """Checkout/return nhiều sách trong một transaction"""
+    items = StockItemSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, value):
+        max_items = self.context.get('max_items')
+        if max_items and len(value) > max_items:
+            raise serializers.ValidationError(f"Tối đa {max_items} sách mỗi lô")
+        return value
+
+
+class CheckoutBatchSerializer(StockBatchSerializer):
+    type = serializers.ChoiceField(choices=['borrow', 'reserve'], default='borrow')
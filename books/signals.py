@@ -0,0 +1,164 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import statistics, suggest
+from .images import schedule_changed_variants
+from .models import Author, Book, Category, Review
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Review)
+def update_book_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    """Cập nhật tổng hợp đánh giá của sách khi review được tạo hoặc sửa"""
+    if raw:
+        return
+
+    with transaction.atomic():
+        old_book_id, old_rating = getattr(instance, '_loaded_rating', (None, None))
+        if created:
+            Book.apply_rating_delta(instance.book_id, instance.rating, 1)
+        elif old_book_id is None:
+            # Không biết giá trị cũ (instance không được load từ DB): tính lại
+            Book.rebuild_rating_aggregates(Book.objects.filter(pk=instance.book_id))
+        elif old_book_id != instance.book_id:
+            Book.apply_rating_delta(old_book_id, -old_rating, -1)
+            Book.apply_rating_delta(instance.book_id, instance.rating, 1)
+        elif old_rating != instance.rating:
+            Book.apply_rating_delta(instance.book_id, instance.rating - old_rating, 0)
+
+    instance._loaded_rating = (instance.book_id, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_book_rating_on_delete(sender, instance, **kwargs):
+    """Cập nhật tổng hợp đánh giá của sách khi review bị xóa"""
+    old_book_id, old_rating = getattr(
+        instance, '_loaded_rating', (instance.book_id, instance.rating)
+    )
+    Book.apply_rating_delta(old_book_id, -old_rating, -1)
+
+
+@receiver(post_save, sender=Book)
+def index_book_on_save(sender, instance, **kwargs):
+    """Cập nhật index tìm kiếm khi sách được lưu"""
+    get_search_backend().index_books([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_from_index(sender, instance, **kwargs):
+    """Xóa sách khỏi index tìm kiếm"""
+    get_search_backend().remove_books([instance.pk])
+
+
+@receiver(post_save, sender=Author)
+def index_author_books_on_save(sender, instance, created, **kwargs):
+    """Cập nhật tên tác giả trong index tìm kiếm"""
+    if not created:
+        get_search_backend().index_author(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def index_category_books_on_save(sender, instance, created, **kwargs):
+    """Cập nhật tên danh mục trong index tìm kiếm"""
+    if not created:
+        get_search_backend().index_category(instance.pk)
+
+
+@receiver(post_save, sender=Book)
+def update_suggest_on_book_save(sender, instance, **kwargs):
+    """Cập nhật index gợi ý sau khi transaction commit"""
+    transaction.on_commit(lambda: suggest.book_saved(instance))
+
+
+@receiver(post_delete, sender=Book)
+def update_suggest_on_book_delete(sender, instance, **kwargs):
+    # pk bị đặt về None sau khi xóa xong, lấy trước
+    pk = instance.pk
+    suggest.record_removed('book', pk)
+    transaction.on_commit(lambda: suggest.removed('book', pk))
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+def update_suggest_on_name_save(sender, instance, **kwargs):
+    kind = 'author' if sender is Author else 'category'
+    transaction.on_commit(lambda: suggest.named_saved(kind, instance))
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Category)
+def update_suggest_on_name_delete(sender, instance, **kwargs):
+    kind = 'author' if sender is Author else 'category'
+    pk = instance.pk
+    suggest.record_removed(kind, pk)
+    transaction.on_commit(lambda: suggest.removed(kind, pk))
+
+
+@receiver(post_save, sender=Book)
+def update_statistics_on_book_save(sender, instance, created, **kwargs):
+    """Cập nhật bộ đếm thống kê khi sách được thêm hoặc đổi danh mục/ngôn ngữ/còn hàng"""
+    new_key = instance.get_stats_key()
+    if created:
+        statistics.book_changed(None, new_key)
+    else:
+        old_key = getattr(instance, '_loaded_stats', None)
+        if old_key is None or new_key is None:
+            # Không biết giá trị cũ (instance không được load từ DB): tính lại
+            statistics.invalidate_snapshot()
+        elif old_key != new_key:
+            statistics.book_changed(old_key, new_key)
+    instance._loaded_stats = new_key
+
+
+@receiver(post_delete, sender=Book)
+def update_statistics_on_book_delete(sender, instance, **kwargs):
+    """Cập nhật bộ đếm thống kê khi sách bị xóa"""
+    old_key = getattr(instance, '_loaded_stats', None) or instance.get_stats_key()
+    if old_key is None:
+        statistics.invalidate_snapshot()
+    else:
+        statistics.book_changed(old_key, None)
+
+
+@receiver(post_save, sender=Author)
+def update_statistics_on_author_save(sender, instance, created, **kwargs):
+    """Cập nhật số tác giả khi có tác giả mới"""
+    if created:
+        statistics.add_deltas({'total_authors': 1})
+
+
+@receiver(post_delete, sender=Author)
+def update_statistics_on_author_delete(sender, instance, **kwargs):
+    """Cập nhật số tác giả khi tác giả bị xóa"""
+    statistics.add_deltas({'total_authors': -1})
+
+
+@receiver(post_save, sender=Book)
+def touch_owners_on_book_save(sender, instance, created, **kwargs):
+    """Cập nhật tác giả/danh mục khi sách được thêm hoặc chuyển tác giả/danh mục"""
+    new_owners = (instance.author_id, instance.category_id)
+    old_owners = (None, None) if created else getattr(instance, '_loaded_owners', (None, None))
+    Book.touch_owners(
+        {old_owners[0], new_owners[0]} if old_owners[0] != new_owners[0] else (),
+        {old_owners[1], new_owners[1]} if old_owners[1] != new_owners[1] else (),
+    )
+    instance._loaded_owners = new_owners
+
+
+@receiver(post_delete, sender=Book)
+def touch_owners_on_book_delete(sender, instance, **kwargs):
+    """Cập nhật tác giả/danh mục khi sách bị xóa"""
+    Book.touch_owners([instance.author_id], [instance.category_id])
+
+
+@receiver(post_save, sender=Book)
+def generate_cover_variants(sender, instance, created, update_fields=None, **kwargs):
+    """Tạo các biến thể ảnh bìa sau khi upload (chỉ khi ảnh bìa đổi)"""
+    schedule_changed_variants(instance, 'cover_image', created, update_fields)
+
+
+@receiver(post_save, sender=Author)
+def generate_photo_variants(sender, instance, created, update_fields=None, **kwargs):
+    """Tạo các biến thể ảnh tác giả sau khi upload (chỉ khi ảnh đổi)"""
+    schedule_changed_variants(instance, 'photo', created, update_fields)
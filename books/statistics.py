@@ -0,0 +1,205 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Author, Book, Category, StatisticsCounter, StatisticsSnapshot
+
+SNAPSHOT_ID = 1
+
+
+def get_ttl():
+    """Thời gian sống của snapshot (giây), cấu hình bằng BOOK_STATISTICS_TTL"""
+    return getattr(settings, 'BOOK_STATISTICS_TTL', 300)
+
+
+def compute_statistics():
+    """Tính toàn bộ thống kê từ database"""
+    languages = Book.objects.order_by().values('language').annotate(count=Count('id'))
+    categories = Category.objects.order_by().annotate(book_count=Count('books'))
+    return {
+        'total_books': Book.objects.count(),
+        'available_books': Book.objects.filter(status='available', stock_quantity__gt=0).count(),
+        'total_authors': Author.objects.count(),
+        'categories': {
+            str(category.pk): {'name': category.name, 'book_count': category.book_count}
+            for category in categories
+        },
+        'languages': {row['language']: row['count'] for row in languages},
+    }
+
+
+def counter_values(data):
+    """Các cặp (tên bộ đếm, giá trị) tương ứng với dữ liệu của compute_statistics()"""
+    yield 'total_books', data['total_books']
+    yield 'available_books', data['available_books']
+    yield 'total_authors', data['total_authors']
+    for pk, entry in data['categories'].items():
+        yield f'category:{pk}', entry['book_count']
+    for language, count in data['languages'].items():
+        yield f'language:{language}', count
+
+
+def read_statistics():
+    """
+    Đọc thống kê từ các bộ đếm, cùng dạng với compute_statistics(). Tên danh
+    mục được đọc trực tiếp nên đổi tên/thêm danh mục không cần cập nhật bộ đếm.
+    """
+    counters = dict(StatisticsCounter.objects.values_list('name', 'value'))
+    categories = Category.objects.order_by().values_list('pk', 'name')
+    return {
+        'total_books': counters.get('total_books', 0),
+        'available_books': counters.get('available_books', 0),
+        'total_authors': counters.get('total_authors', 0),
+        'categories': {
+            str(pk): {'name': name, 'book_count': counters.get(f'category:{pk}', 0)}
+            for pk, name in categories
+        },
+        'languages': {
+            name.split(':', 1)[1]: value for name, value in counters.items()
+            if name.startswith('language:') and value
+        },
+    }
+
+
+def rebuild_snapshot(current=None):
+    """
+    Tính lại toàn bộ thống kê và ghi đè các bộ đếm (đường sửa sai: lần đầu,
+    sau invalidate hoặc khi quá TTL).
+
+    `current` là snapshot vừa đọc: chỉ ghi đè nếu dòng chưa bị sửa (invalidate
+    hoặc cộng delta) kể từ lúc đọc, để kết quả tính trên dữ liệu cũ không làm
+    mất một thay đổi xảy ra trong lúc đang tính.
+    """
+    data, computed_at = compute_statistics(), timezone.now()
+    snapshot = StatisticsSnapshot(pk=SNAPSHOT_ID, computed_at=computed_at, updated_at=computed_at)
+    try:
+        with transaction.atomic():
+            if current is None:
+                snapshot, _ = StatisticsSnapshot.objects.update_or_create(
+                    pk=SNAPSHOT_ID, defaults={'computed_at': computed_at},
+                )
+            elif not StatisticsSnapshot.objects.filter(
+                pk=SNAPSHOT_ID, updated_at=current.updated_at
+            ).update(computed_at=computed_at, updated_at=computed_at):
+                snapshot.data = data
+                return snapshot
+            StatisticsCounter.objects.all().delete()
+            StatisticsCounter.objects.bulk_create(
+                StatisticsCounter(name=name, value=value) for name, value in counter_values(data)
+            )
+    except (IntegrityError, OperationalError):
+        # Request khác đang ghi snapshot cùng lúc (SQLite khóa database khi có
+        # nhiều writer): vẫn trả về kết quả vừa tính, không lưu lại
+        pass
+    snapshot.data = data
+    return snapshot
+
+
+def invalidate_snapshot():
+    """
+    Đánh dấu snapshot cần tính lại toàn bộ ở lần đọc tiếp theo. Dùng cho các
+    thay đổi hàng loạt không có delta (import, sinh dữ liệu).
+
+    Chạy sau khi transaction hiện tại commit: lần tính lại không thể đọc dữ
+    liệu chưa commit, và transaction ghi sách không giữ khóa dòng snapshot.
+    Chỉ lần invalidate đầu tiên sau mỗi lần tính lại thực sự ghi vào dòng này.
+    Lỗi lúc invalidate chỉ được log (dữ liệu đã commit), snapshot khi đó vẫn
+    được tính lại sau TTL.
+    """
+    def invalidate():
+        StatisticsSnapshot.objects.filter(pk=SNAPSHOT_ID, computed_at__isnull=False).update(
+            computed_at=None, updated_at=timezone.now(),
+        )
+
+    transaction.on_commit(invalidate, robust=True)
+
+
+def book_deltas(old_key, new_key):
+    """Delta của các bộ đếm khi một sách đổi từ `old_key` sang `new_key` (get_stats_key)"""
+    deltas = Counter()
+    for key, sign in ((old_key, -1), (new_key, 1)):
+        if key is None:
+            continue
+        category_id, language, available = key
+        deltas.update({
+            'total_books': sign,
+            f'category:{category_id}': sign,
+            f'language:{language}': sign,
+            'available_books': sign if available else 0,
+        })
+    return deltas
+
+
+def add_deltas(deltas):
+    """
+    Cộng `deltas` ({tên bộ đếm: delta}) vào các bộ đếm trong transaction hiện
+    tại, nên bộ đếm được commit hoặc rollback cùng dữ liệu thay đổi.
+
+    Mỗi bộ đếm là một câu `UPDATE ... SET value = value + delta` (theo thứ tự
+    tên để các transaction không khóa chéo nhau), nên các request đồng thời
+    không ghi đè lên nhau. Dòng snapshot cũng được cập nhật để một lần tính
+    lại đang chạy song song không ghi đè delta này. Delta bị bỏ qua khi
+    snapshot chưa có hoặc đang chờ tính lại (lần tính lại sẽ đếm thay đổi này).
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        if not StatisticsSnapshot.objects.filter(
+            pk=SNAPSHOT_ID, computed_at__isnull=False
+        ).update(updated_at=now):
+            return
+        StatisticsCounter.objects.bulk_create(
+            [StatisticsCounter(name=name) for name in sorted(deltas)], ignore_conflicts=True,
+        )
+        for name in sorted(deltas):
+            StatisticsCounter.objects.filter(name=name).update(
+                value=F('value') + deltas[name], updated_at=now,
+            )
+
+
+def book_changed(old_key, new_key):
+    """Cập nhật bộ đếm cho một sách được thêm (old_key None), sửa hoặc xóa (new_key None)"""
+    add_deltas(book_deltas(old_key, new_key))
+
+
+def get_snapshot():
+    """
+    Lấy snapshot hiện tại với `data` đọc từ các bộ đếm; tính lại toàn bộ nếu
+    chưa có, bị invalidate hoặc quá TTL
+    """
+    snapshot = StatisticsSnapshot.objects.filter(pk=SNAPSHOT_ID).first()
+    ttl = get_ttl()
+    if (
+        snapshot is None or snapshot.computed_at is None or
+        (ttl and snapshot.computed_at < timezone.now() - timedelta(seconds=ttl))
+    ):
+        return rebuild_snapshot(snapshot)
+    snapshot.data = read_statistics()
+    return snapshot
+
+
+def render_snapshot(snapshot):
+    """Chuyển snapshot thành dữ liệu response của BookStatisticsView"""
+    data = snapshot.data
+    category_stats = sorted(data['categories'].values(), key=lambda entry: entry['name'])
+    language_stats = sorted(
+        ({'language': language, 'count': count} for language, count in data['languages'].items()),
+        key=lambda entry: -entry['count'],
+    )
+    return {
+        'total_books': data['total_books'],
+        'available_books': data['available_books'],
+        'total_authors': data['total_authors'],
+        'total_categories': len(data['categories']),
+        'category_stats': [
+            {'name': entry['name'], 'book_count': entry['book_count']}
+            for entry in category_stats
+        ],
+        'language_stats': language_stats,
+    }
@@ -0,0 +1,381 @@
+import heapq
+import logging
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Author, Book, Category, SuggestTombstone
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('book', 'author', 'category')
+# Khóa chỉ giữ tối đa bấy nhiêu ký tự (prefix dài hơn cũng chỉ so chừng đó)
+MAX_KEY_LENGTH = 40
+
+_combining_re = re.compile('[\u0300-\u036f]')
+_word_re = re.compile(r'\w+')
+
+
+def fold(text):
+    """Chữ thường, bỏ dấu và dấu câu: 'Nguyễn Đình-Chiểu' -> 'nguyen dinh chieu'"""
+    text = unicodedata.normalize('NFKD', text.casefold().replace('đ', 'd'))
+    return ' '.join(_word_re.findall(_combining_re.sub('', text)))
+
+
+def get_limit():
+    return getattr(settings, 'BOOK_SUGGEST_LIMIT', 10)
+
+
+def get_tombstone_ttl():
+    """Số giây giữ tombstone; process chưa sync lâu hơn thế phải dựng lại toàn bộ index"""
+    return getattr(settings, 'BOOK_SUGGEST_TOMBSTONE_TTL', 86400)
+
+
+def load_entries(since=None):
+    """
+    Đọc (kind, id, slug, label, độ phổ biến) từ database. Độ phổ biến của sách
+    là số lượt đánh giá, của tác giả/danh mục là tổng số lượt đánh giá các sách.
+    """
+    querysets = {
+        'book': Book.objects.values_list('id', 'slug', 'title', 'rating_count'),
+        'author': Author.objects.annotate(
+            popularity=Coalesce(Sum('books__rating_count'), 0)
+        ).values_list('id', 'slug', 'name', 'popularity'),
+        'category': Category.objects.annotate(
+            popularity=Coalesce(Sum('books__rating_count'), 0)
+        ).values_list('id', 'slug', 'name', 'popularity'),
+    }
+    for kind, queryset in querysets.items():
+        if since is not None:
+            queryset = queryset.filter(updated_at__gte=since)
+        for row in queryset.order_by().iterator(chunk_size=5000):
+            yield (kind, *row)
+
+
+class PrefixIndex:
+    """
+    Index bất biến: mảng khóa đã sắp xếp, mỗi khóa là phần nhãn (đã fold) bắt
+    đầu từ một từ, để 'van' khớp cả 'Nguyễn Văn A'. Prefix ứng với một đoạn liên
+    tiếp của mảng (bisect); segment tree lưu khóa phổ biến nhất của từng đoạn nên
+    lấy top-k chỉ tốn O(k log n) dù prefix khớp hàng trăm nghìn khóa.
+    """
+
+    def __init__(self, entries):
+        self.kinds = array('b')
+        self.ids = array('q')
+        self.popularity = array('q')
+        self.slugs = []
+        self.labels = []
+        self.positions = {}
+        pairs = []
+        for kind, pk, slug, label, popularity in entries:
+            position = len(self.ids)
+            self.positions[(kind, pk)] = position
+            self.kinds.append(KINDS.index(kind))
+            self.ids.append(pk)
+            self.popularity.append(popularity or 0)
+            self.slugs.append(slug)
+            self.labels.append(label)
+            pairs.extend((key, position) for key in index_keys(label))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.key_entries = array('i', (position for _, position in pairs))
+        self.size = len(self.keys)
+        # tree[size + i] = i; tree[node] = khóa phổ biến nhất trong hai con
+        tree = array('i', [0]) * (2 * self.size)
+        for i in range(self.size):
+            tree[self.size + i] = i
+        for node in range(self.size - 1, 0, -1):
+            tree[node] = self._better(tree[2 * node], tree[2 * node + 1])
+        self.tree = tree
+
+    def entry(self, position):
+        return (KINDS[self.kinds[position]], self.ids[position], self.slugs[position],
+                self.labels[position], self.popularity[position])
+
+    def __iter__(self):
+        return (self.entry(position) for position in range(len(self.ids)))
+
+    def _better(self, a, b):
+        """Khóa phổ biến hơn; bằng nhau thì khóa đứng trước (thứ tự chữ cái)"""
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        score_a = self.popularity[self.key_entries[a]]
+        score_b = self.popularity[self.key_entries[b]]
+        return a if score_a > score_b or (score_a == score_b and a < b) else b
+
+    def _argmax(self, lo, hi):
+        best = -1
+        lo += self.size
+        hi += self.size
+        tree = self.tree
+        while lo < hi:
+            if lo & 1:
+                best = self._better(best, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = self._better(best, tree[hi])
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def top(self, prefix, skip=lambda position: False):
+        """Duyệt các entry khớp prefix theo độ phổ biến giảm dần (không trùng)"""
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + '\U0010ffff', lo)
+        heap = []
+
+        def push(lo, hi):
+            if lo < hi:
+                best = self._argmax(lo, hi)
+                heapq.heappush(heap, (-self.popularity[self.key_entries[best]], best, lo, hi))
+
+        push(lo, hi)
+        seen = set()
+        while heap:
+            _, best, lo, hi = heapq.heappop(heap)
+            push(lo, best)
+            push(best + 1, hi)
+            position = self.key_entries[best]
+            if position not in seen and not skip(position):
+                seen.add(position)
+                yield position
+
+    def memory_usage(self):
+        """Ước lượng số byte của index (list, array, chuỗi và dict vị trí)"""
+        total = sum(sys.getsizeof(part) for part in (
+            self.kinds, self.ids, self.popularity, self.key_entries, self.tree,
+            self.keys, self.slugs, self.labels, self.positions,
+        ))
+        total += sum(sys.getsizeof(key) for key in self.keys)
+        total += sum(sys.getsizeof(text) for text in self.slugs)
+        total += sum(sys.getsizeof(text) for text in self.labels)
+        total += sum(sys.getsizeof(key) for key in self.positions)
+        return total
+
+
+def index_keys(label):
+    words = fold(label).split(' ')
+    return {' '.join(words[start:])[:MAX_KEY_LENGTH] for start in range(len(words)) if words[start]}
+
+
+class SuggestIndex:
+    """
+    PrefixIndex cộng một lớp thay đổi nhỏ: entry thêm/sửa nằm trong `overlay`
+    (duyệt tuần tự), entry cũ bị thay hoặc bị xóa nằm trong `removed`. Khi lớp
+    này lớn hơn BOOK_SUGGEST_COMPACT_AFTER thì dựng lại PrefixIndex từ bộ nhớ.
+    """
+
+    def __init__(self, entries):
+        # Lấy mốc trước khi đọc để lần sync sau không bỏ sót thay đổi trong lúc dựng
+        self.synced_at = timezone.now()
+        self.base = PrefixIndex(entries)
+        self.overlay = {}
+        self.removed = set()
+        # (kind, id) đã xóa kể từ lần compact trước
+        self.deleted = set()
+        self.lock = threading.Lock()
+        self.compact_lock = threading.Lock()
+
+    def update(self, kind, pk, slug, label, popularity=None):
+        with self.lock:
+            old = self.get(kind, pk)
+            if popularity is None:
+                popularity = old[4] if old else 0
+            self.overlay[(kind, pk)] = ((kind, pk, slug, label, popularity), index_keys(label))
+            self.deleted.discard((kind, pk))
+            self._remove_from_base(kind, pk)
+        self.compact_if_needed()
+
+    def remove(self, kind, pk):
+        with self.lock:
+            self.overlay.pop((kind, pk), None)
+            self.deleted.add((kind, pk))
+            self._remove_from_base(kind, pk)
+        self.compact_if_needed()
+
+    def get(self, kind, pk):
+        if (kind, pk) in self.overlay:
+            return self.overlay[(kind, pk)][0]
+        position = self.base.positions.get((kind, pk))
+        if position is None or position in self.removed:
+            return None
+        return self.base.entry(position)
+
+    def _remove_from_base(self, kind, pk):
+        position = self.base.positions.get((kind, pk))
+        if position is not None:
+            self.removed.add(position)
+
+    def compact_if_needed(self):
+        if len(self.overlay) + len(self.removed) <= getattr(settings, 'BOOK_SUGGEST_COMPACT_AFTER', 1000):
+            return
+        if not self.compact_lock.acquire(blocking=False):
+            return
+        try:
+            with self.lock:
+                entries = [
+                    entry for position, entry in enumerate(self.base) if position not in self.removed
+                ] + [entry for entry, _ in self.overlay.values()]
+                overlay, deleted = dict(self.overlay), set(self.deleted)
+            # Dựng index mới ngoài lock; thay đổi đến trong lúc dựng vẫn nằm trong overlay/deleted
+            base = PrefixIndex(entries)
+            with self.lock:
+                self.overlay = {
+                    key: value for key, value in self.overlay.items() if overlay.get(key) is not value
+                }
+                self.deleted -= deleted
+                self.removed = {
+                    base.positions[key] for key in (*self.overlay, *self.deleted) if key in base.positions
+                }
+                self.base = base
+        finally:
+            self.compact_lock.release()
+
+    def suggest(self, prefix, limit):
+        """Top `limit` entry khớp prefix, phổ biến nhất trước"""
+        prefix = fold(prefix)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        with self.lock:
+            base, removed = self.base, frozenset(self.removed)
+            extra = [
+                entry for entry, keys in self.overlay.values()
+                if any(key.startswith(prefix) for key in keys)
+            ]
+        results = []
+        for position in base.top(prefix, removed.__contains__):
+            results.append(base.entry(position))
+            if len(results) >= limit:
+                break
+        results.extend(extra)
+        results.sort(key=lambda entry: -entry[4])
+        return results[:limit]
+
+    def sync(self):
+        """
+        Áp dụng thay đổi ghi từ process khác kể từ lần sync trước: entry thêm/sửa
+        theo updated_at, entry bị xóa theo SuggestTombstone
+        """
+        started = timezone.now()
+        # Lùi lại một chút để không bỏ sót transaction commit trễ
+        since = self.synced_at - timedelta(seconds=5)
+        for kind, pk, slug, label, popularity in load_entries(since=since):
+            self.update(kind, pk, slug, label, popularity)
+        tombstones = SuggestTombstone.objects.filter(deleted_at__gte=since).values_list('kind', 'object_id')
+        for kind, pk in tombstones.iterator():
+            self.remove(kind, pk)
+        expired = SuggestTombstone.objects.filter(
+            deleted_at__lt=started - timedelta(seconds=get_tombstone_ttl())
+        )
+        if expired.exists():
+            expired.delete()
+        self.synced_at = started
+
+    def stats(self):
+        return {
+            'entries': len(self.base.ids) - len(self.removed) + len(self.overlay),
+            'keys': self.base.size,
+            'pending_changes': len(self.overlay) + len(self.removed),
+            'memory_bytes': self.base.memory_usage(),
+        }
+
+
+_index = None
+_build_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def build_index():
+    """Dựng lại toàn bộ index từ database và dùng nó cho các request sau"""
+    global _index
+    started = time.perf_counter()
+    index = SuggestIndex(load_entries())
+    _index = index
+    stats = index.stats()
+    logger.info(
+        'Suggest index: %d entries, %d keys, %.1f MB, %.2fs',
+        stats['entries'], stats['keys'], stats['memory_bytes'] / 2 ** 20,
+        time.perf_counter() - started,
+    )
+    return index
+
+
+def get_index():
+    """Index hiện tại (dựng nếu chưa có); sync định kỳ mỗi BOOK_SUGGEST_SYNC_SECONDS giây"""
+    index = _index
+    if index is None:
+        with _build_lock:
+            index = _index or build_index()
+    interval = getattr(settings, 'BOOK_SUGGEST_SYNC_SECONDS', 30)
+    if interval and index.synced_at < timezone.now() - timedelta(seconds=interval):
+        # Chỉ một request trả giá sync, các request khác dùng index hiện có
+        if _sync_lock.acquire(blocking=False):
+            try:
+                if index.synced_at < timezone.now() - timedelta(seconds=get_tombstone_ttl()):
+                    # Tombstone cần thiết có thể đã bị dọn: dựng lại toàn bộ
+                    index = build_index()
+                else:
+                    index.sync()
+            finally:
+                _sync_lock.release()
+    return index
+
+
+def warm_up():
+    """Dựng index ở thread nền khi server khởi động (gọi từ wsgi.py/asgi.py)"""
+    def build():
+        try:
+            with _build_lock:
+                if _index is None:
+                    build_index()
+        except DatabaseError:
+            logger.exception('Không dựng được suggest index')
+
+    threading.Thread(target=build, name='suggest-warmup', daemon=True).start()
+
+
+def suggest(prefix, limit=None):
+    return get_index().suggest(prefix, limit or get_limit())
+
+
+def book_saved(book):
+    if _index is not None:
+        _index.update('book', book.pk, book.slug, book.title, book.rating_count)
+
+
+def books_saved(books, created):
+    """Cập nhật sau các thao tác bulk (không qua signal); sách được sửa giữ độ phổ biến cũ"""
+    if _index is not None:
+        for book in books:
+            _index.update('book', book.pk, book.slug, book.title, book.rating_count if created else None)
+
+
+def named_saved(kind, instance):
+    """Tác giả/danh mục đổi tên hoặc slug; độ phổ biến giữ nguyên"""
+    if _index is not None:
+        _index.update(kind, instance.pk, instance.slug, instance.name)
+
+
+def record_removed(kind, pk):
+    """Ghi tombstone trong transaction xóa, để index của các process khác xóa theo khi sync"""
+    SuggestTombstone.objects.create(kind=kind, object_id=pk)
+
+
+def removed(kind, pk):
+    if _index is not None:
+        _index.remove(kind, pk)
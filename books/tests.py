@@ -1,3 +1,1045 @@
-from django.test import TestCase
+import json
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.db import OperationalError, connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import bulk, images, recommendations, statistics, suggest
+from .facets import count_facets
+from .images import variant_name, variant_url
+from .inventory import CHECKOUT_STATUSES, StockError, checkout_books, return_books
+from .management.commands import import_catalog
+from .models import Author, Book, BookSimilarity, Category, Review, StatisticsCounter, StatisticsSnapshot
+from .pagination import KeysetPagination
+
+
+def make_book(title, author, category, **fields):
+    """Tạo sách với các field bắt buộc điền sẵn, ISBN theo số sách đã có"""
+    defaults = {
+        'description': f'Mô tả {title}',
+        'isbn': f'{9780000000000 + Book.objects.count() + 1}',
+        'publication_date': date(2020, 1, 1),
+        'publisher': 'NXB Trẻ',
+        'pages': 200,
+        'price': Decimal('120000'),
+    }
+    defaults.update(fields)
+    return Book.objects.create(title=title, author=author, category=category, **defaults)
+
+
+class StockStressTests(TransactionTestCase):
+    """
+    Nhiều thread cùng checkout (theo lô) và trả các sách dùng chung với tồn kho
+    nhỏ trên database test: tồn kho cuối = ban đầu - đã mượn + đã trả, không âm,
+    trạng thái khớp tồn kho và snapshot thống kê khớp dữ liệu thật.
+    """
+    threads = 8
+    operations = 40
+    stock = 12
+    max_quantity = 3
+    return_ratio = 0.3
+    retries = 200
+
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        category = Category.objects.create(name='Văn học')
+        self.book_ids = [
+            make_book(f'Sách {index}', author, category, stock_quantity=self.stock).pk
+            for index in range(4)
+        ]
+        statistics.rebuild_snapshot()
+        self.lock = threading.Lock()
+        self.borrowed = Counter()
+        self.returned = Counter()
+        self.outcomes = Counter()
+        self.min_stock = self.stock
+
+    def test_concurrent_checkout_and_return(self):
+        threads = [
+            threading.Thread(target=self.worker, args=(random.Random(index),))
+            for index in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertGreater(self.outcomes['checkout'], 0, self.outcomes)
+        self.assertGreaterEqual(self.min_stock, 0)
+        rows = Book.objects.filter(pk__in=self.book_ids).values_list('pk', 'stock_quantity', 'status')
+        for book_id, stock, book_status in rows:
+            self.assertEqual(stock, self.stock - self.borrowed[book_id] + self.returned[book_id], self.outcomes)
+            self.assertEqual(stock == 0, book_status in CHECKOUT_STATUSES.values())
+
+        snapshot = statistics.get_snapshot()
+        self.assertEqual(snapshot.data, statistics.compute_statistics())
+
+    def worker(self, rng):
+        held = []
+        try:
+            for _ in range(self.operations):
+                if held and rng.random() < self.return_ratio:
+                    book_id, quantity = held.pop(rng.randrange(len(held)))
+                    self.apply('return', return_books, [(book_id, quantity)], held)
+                else:
+                    items = [
+                        (book_id, rng.randint(1, self.max_quantity))
+                        for book_id in rng.sample(self.book_ids, rng.randint(1, 2))
+                    ]
+                    self.apply('checkout', checkout_books, items, held, kind=rng.choice(list(CHECKOUT_STATUSES)))
+        finally:
+            connection.close()
+
+    def apply(self, name, operation, items, held, **kwargs):
+        for _ in range(self.retries):
+            try:
+                results = operation(items, **kwargs)
+            except StockError:
+                outcome = f'{name}_conflict'
+            except OperationalError:
+                # Database bận (SQLite in-memory khóa theo bảng, không chờ): cả lô
+                # đã rollback, thử lại như client
+                outcome = f'{name}_db_error'
+                time.sleep(0.001)
+                continue
+            else:
+                outcome = name
+            break
+        if outcome == 'return_db_error':
+            held.extend(items)
+        with self.lock:
+            self.outcomes[outcome] += 1
+            if outcome == 'checkout':
+                self.borrowed.update(dict(items))
+                held.extend(items)
+            elif outcome == 'return':
+                self.returned.update(dict(items))
+            if outcome in ('checkout', 'return'):
+                self.min_stock = min(self.min_stock, *(result['stock_quantity'] for result in results))
+
+
+# Bảng bị quét toàn bộ ("SCAN books_book" không kèm index) hoặc phải sort tạm
+FULL_SCAN_RE = re.compile(r'\bSCAN (\w+)$')
+TEMP_SORT_RE = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)')
+
+
+class StatisticsSnapshotTests(TestCase):
+    """Bộ đếm thống kê được cộng delta khi ghi, chỉ tính lại khi invalidate hoặc quá TTL"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        cls.category = Category.objects.create(name='Văn học')
+        cls.book = make_book('Mắt biếc', cls.author, cls.category, stock_quantity=1)
+
+    def setUp(self):
+        self.computed_at = statistics.rebuild_snapshot().computed_at
+
+    def assert_fresh(self):
+        snapshot = statistics.get_snapshot()
+        self.assertEqual(snapshot.data, statistics.compute_statistics())
+        # Không tính lại toàn bộ: chỉ cộng delta vào bộ đếm
+        self.assertEqual(snapshot.computed_at, self.computed_at)
+
+    def test_model_changes_apply_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_book('Kính vạn hoa', self.author, self.category, language='en')
+        self.assert_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Thiếu nhi')
+        self.assert_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.language = 'fr'
+            self.book.save()
+        self.assert_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+        self.assert_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            Author.objects.create(name='Tô Hoài')
+        self.assert_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.delete()
+        self.assert_fresh()
+
+    def test_bulk_write_applies_deltas(self):
+        item = {
+            'title': 'Kính vạn hoa', 'description': 'Mô tả', 'author': self.author.pk, 'category': self.category.pk,
+            'isbn': '9786042000001', 'publication_date': '2020-01-01', 'publisher': 'NXB Trẻ',
+            'language': 'en', 'pages': 100, 'price': '50000.00', 'status': 'available',
+            'stock_quantity': 2,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            results = bulk.bulk_write_books(
+                [item, dict(item, title='Mắt biếc', isbn=self.book.isbn, stock_quantity=0)], upsert=True,
+            )
+        self.assertEqual([result['status'] for result in results], ['created', 'updated'])
+        self.assert_fresh()
+
+    def test_unrelated_book_edit_keeps_snapshot(self):
+        updated_at = statistics.get_snapshot().updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.description = 'Mô tả mới'
+            self.book.save()
+        self.assertEqual(statistics.get_snapshot().updated_at, updated_at)
+
+    def test_checkout_applies_delta(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout_books([(self.book.pk, 1)])
+        self.assertEqual(statistics.get_snapshot().data['available_books'], 0)
+        self.assert_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            return_books([(self.book.pk, 1)])
+        self.assertEqual(statistics.get_snapshot().data['available_books'], 1)
+        self.assert_fresh()
+
+    def test_invalidate_recomputes(self):
+        StatisticsCounter.objects.filter(name='total_books').update(value=100)
+        with self.captureOnCommitCallbacks(execute=True):
+            statistics.invalidate_snapshot()
+        snapshot = statistics.get_snapshot()
+        self.assertEqual(snapshot.data['total_books'], 1)
+        self.assertNotEqual(snapshot.computed_at, self.computed_at)
+
+    def test_rebuild_does_not_overwrite_newer_invalidation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            statistics.invalidate_snapshot()
+        stale = statistics.StatisticsSnapshot.objects.get()
+        # Một request khác invalidate trong lúc snapshot đang được tính lại
+        with self.captureOnCommitCallbacks(execute=True):
+            make_book('Kính vạn hoa', self.author, self.category)
+        statistics.StatisticsSnapshot.objects.update(updated_at=stale.updated_at + timedelta(seconds=1))
+        statistics.rebuild_snapshot(stale)
+        self.assertIsNone(statistics.StatisticsSnapshot.objects.get().computed_at)
+
+
+def find_plan_problems(plan):
+    problems = []
+    for line in plan:
+        match = FULL_SCAN_RE.search(line)
+        if match:
+            problems.append(f'full scan trên {match.group(1)}')
+        match = TEMP_SORT_RE.search(line)
+        if match:
+            problems.append(f'temp B-tree cho {match.group(1)}')
+    return problems
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN của SQLite')
+class QueryPlanTests(TestCase):
+    """
+    Gọi từng endpoint đọc chính qua view thật (filter_queryset(get_queryset()),
+    sparse fieldsets, phân trang, facet, validator của conditional GET) và chạy
+    EXPLAIN QUERY PLAN cho mọi câu SELECT được thực thi: không được có full
+    table scan hay sort bằng temp B-tree, trừ các trường hợp không tránh được
+    khai báo trong `allowed`.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='reader', password='x', is_staff=True)
+        cls.author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        cls.category = Category.objects.create(name='Văn học')
+        cls.book = make_book('Mắt biếc', cls.author, cls.category, language='vi')
+        make_book('Cho tôi xin một vé đi tuổi thơ', cls.author, cls.category, language='vi')
+        Review.objects.create(book=cls.book, user=cls.user, rating=5, comment='Hay')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans(self, path, allowed=(), user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            plan = self.explain(sql)
+            problems = [problem for problem in find_plan_problems(plan) if problem not in allowed]
+            if ' WHERE ' not in sql and ' LIMIT ' not in sql:
+                # Tổng hợp trên toàn bảng (validator của danh sách không filter): phải đọc mọi dòng
+                problems = [problem for problem in problems if not problem.startswith('full scan')]
+            self.assertFalse(problems, f'{path}\n{sql}\n' + '\n'.join(plan))
+
+    def test_book_list(self):
+        for query in [
+            '', '?ordering=price', '?ordering=-price', '?ordering=title',
+            '?ordering=publication_date', '?ordering=-average_rating',
+            '?language=vi', '?publisher=NXB%20Tr%E1%BA%BB', '?status=available',
+            f'?category={self.category.pk}', f'?author={self.author.pk}',
+            '?fields=id,title,price', '?expand=author,category',
+        ]:
+            with self.subTest(query=query):
+                self.assert_plans(f'/api/books/{query}')
+
+    def test_book_list_cursor(self):
+        for index in range(10):
+            make_book(f'Sách {index}', self.author, self.category)
+        self.assert_plans('/api/books/?pagination=cursor')
+        next_link = APIClient().get('/api/books/?pagination=cursor').json()['next']
+        self.assertIsNotNone(next_link)
+        self.assert_plans(next_link.split('testserver', 1)[1])
+
+    def test_book_list_facets(self):
+        # Đếm facet phải đọc mọi sách thỏa filter và gom nhóm theo giá trị
+        allowed = ['full scan trên books_book', 'temp B-tree cho GROUP BY']
+        self.assert_plans('/api/books/?facets=language,category,status,price', allowed)
+        self.assert_plans('/api/books/?language=vi&facets=language,status', allowed)
+
+    def test_book_actions(self):
+        # /available/ trả về mọi sách còn hàng (không phân trang): SQLite thích
+        # range trên book_status_stock_idx hơn, sort thêm không đổi bậc chi phí
+        self.assert_plans('/api/books/available/', ['temp B-tree cho ORDER BY'])
+        for path in [
+            f'/api/books/{self.book.slug}/',
+            f'/api/books/{self.book.slug}/?expand=author,category,reviews',
+            f'/api/books/{self.book.slug}/reviews/',
+            '/api/books/best_sellers/',
+            '/api/books/new_releases/',
+            f'/api/categories/{self.category.slug}/books/',
+            f'/api/authors/{self.author.slug}/books/',
+        ]:
+            with self.subTest(path=path):
+                self.assert_plans(path)
+
+    def test_search(self):
+        # bm25() chỉ tính được sau khi MATCH nên sắp xếp theo độ liên quan luôn cần temp B-tree
+        allowed = ['temp B-tree cho ORDER BY']
+        self.assert_plans('/api/search/?q=mắt', allowed)
+        self.assert_plans('/api/search/?q=mắt&language=vi&facets=language,price', allowed + [
+            'temp B-tree cho GROUP BY',
+        ])
+        self.assert_plans('/api/search/?language=vi')
+
+    def test_reviews_and_profiles(self):
+        self.assert_plans('/api/reviews/', user=self.user)
+        self.assert_plans(f'/api/reviews/?user={self.user.pk}', user=self.user)
+        self.assert_plans(f'/api/profile/{self.user.username}/')
+        self.assert_plans(f'/api/profile/{self.user.username}/reviews/')
+
+
+class FastListSerializerParityTests(TestCase):
+    """FastBookListSerializer cho JSON giống hệt BookListSerializer trên cùng endpoint"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        category = Category.objects.create(name='Văn học')
+        other = Category.objects.create(name='Thiếu nhi')
+        make_book('Mắt biếc', author, category, cover_image='books/covers/mat-biec.jpg')
+        make_book('Mắt biếc (tái bản)', author, other, price=Decimal('89000.50'), stock_quantity=0)
+        make_book('Tôi thấy hoa vàng trên cỏ xanh', author, category, language='en', status='borrowed')
+        make_book('Cô gái đến từ hôm qua', author, other, cover_image='books/covers/co gai.png')
+
+    def assert_same(self, path):
+        responses = []
+        for fast in (False, True):
+            with override_settings(BOOK_FAST_LIST_SERIALIZER=fast):
+                response = APIClient().get(path)
+            self.assertEqual(response.status_code, 200, response.content)
+            responses.append(response.content)
+        self.assertEqual(responses[0], responses[1], path)
+        return responses[1]
+
+    def test_book_list(self):
+        for query in [
+            '',
+            '?fields=id,title,price,cover_url',
+            '?fields=id,title,author_name,category_name,is_available,created_at',
+            '?cover_size=256&cover_format=webp',
+            '?cover_size=64&fields=cover_url,cover_urls',
+            '?cover_size=999',
+            '?ordering=price',
+            '?pagination=cursor',
+        ]:
+            with self.subTest(query=query):
+                self.assert_same(f'/api/books/{query}')
+
+    def test_search_rank(self):
+        content = self.assert_same('/api/search/?q=mắt biếc')
+        self.assertIn('Mắt biếc'.encode(), content)
+        self.assert_same('/api/search/?q=mắt&fields=id,title&cover_size=256')
+        self.assert_same('/api/search/?q=mắt&pagination=cursor')
+
+    def test_related_lists(self):
+        category = Category.objects.get(name='Văn học')
+        self.assert_same(f'/api/categories/{category.slug}/books/?fields=id,title,cover_url')
+
+
+class BookBulkTests(TestCase):
+    """Bulk write/delete: xung đột ghi đồng thời và dữ liệu sai không thành lỗi 500"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        cls.category = Category.objects.create(name='Văn học')
+        cls.user = get_user_model().objects.create_user(username='editor', password='Mat-khau-123')
+
+    def item(self, title, isbn, **fields):
+        return {
+            'title': title, 'author': self.author.pk, 'category': self.category.pk,
+            'description': f'Mô tả {title}', 'isbn': isbn, 'publication_date': '2020-01-01',
+            'publisher': 'NXB Trẻ', 'pages': 200, 'price': '120000', **fields,
+        }
+
+    def racing(self, conflicts):
+        """Request khác tạo sách (title, isbn, slug) ngay sau lúc kiểm tra xung đột"""
+        generate = bulk.generate_unique_slug
+
+        def generate_unique_slug(title, isbn, taken):
+            while conflicts:
+                conflict_title, conflict_isbn, slug = conflicts.pop()
+                make_book(conflict_title, self.author, self.category, isbn=conflict_isbn, slug=slug)
+            return generate(title, isbn, taken)
+        return mock.patch('books.bulk.generate_unique_slug', generate_unique_slug)
+
+    def test_slug_avoids_existing_isbn_suffix(self):
+        make_book('Mắt biếc', self.author, self.category, isbn='9780000000101')
+        make_book('Mắt biếc khác', self.author, self.category, isbn='9780000000102', slug='mat-biec-9780000000103')
+        results = bulk.bulk_write_books([self.item('Mắt biếc', '9780000000103')])
+        self.assertEqual(results[0]['status'], 'created')
+        self.assertEqual(results[0]['slug'], 'mat-biec-9780000000103-2')
+
+    def test_concurrent_isbn_conflict(self):
+        items = [self.item('Mắt biếc', '9780000000201'), self.item('Kính vạn hoa', '9780000000202')]
+        with self.racing([('Bản khác', '9780000000201', 'ban-khac')]):
+            results = bulk.bulk_write_books(items)
+        self.assertEqual([result['status'] for result in results], ['error', 'created'])
+        self.assertIn('isbn', results[0]['errors'])
+
+        Book.objects.filter(isbn='9780000000202').delete()
+        with self.racing([('Bản khác 2', '9780000000202', 'ban-khac-2')]):
+            results = bulk.bulk_write_books([self.item('Kính vạn hoa', '9780000000202')], upsert=True)
+        self.assertEqual(results[0]['status'], 'updated')
+        self.assertEqual(Book.objects.get(isbn='9780000000202').title, 'Kính vạn hoa')
+
+    def test_concurrent_slug_conflict(self):
+        with self.racing([('Mắt biếc', '9780000000301', 'mat-biec')]):
+            results = bulk.bulk_write_books([self.item('Mắt biếc', '9780000000302')])
+        self.assertEqual(results[0]['status'], 'created')
+        self.assertEqual(results[0]['slug'], 'mat-biec-9780000000302')
+
+    def test_import_seeds_isbn_slugs(self):
+        make_book('Mắt biếc', self.author, self.category, isbn='9780000000501')
+        make_book('Bản khác', self.author, self.category, isbn='9780000000502', slug='mat-biec-9780000000503')
+        command = import_catalog.Command()
+        command.authors = import_catalog.NameResolver(Author)
+        command.categories = import_catalog.NameResolver(Category)
+        command.inserted = command.skipped = command.failed = 0
+        command.import_books([{
+            'title': 'Mắt biếc', 'isbn': '9780000000503', 'author_name': self.author.name,
+            'category_name': self.category.name, 'price': '120000', 'publication_date': '2020-01-01',
+        }], 0)
+        self.assertEqual(command.inserted, 1)
+        self.assertEqual(Book.objects.get(isbn='9780000000503').slug, 'mat-biec-9780000000503-2')
+
+    def test_delete_validates_isbns(self):
+        make_book('Mắt biếc', self.author, self.category, isbn='9780000000401')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for data in [{'isbns': ['123']}, {'isbns': [{'isbn': 1}]}, {'isbns': 'abc'}, ['9780000000401']]:
+            with self.subTest(data=data):
+                response = client.delete('/api/books/bulk/', data, format='json')
+                self.assertEqual(response.status_code, 400)
+        response = client.delete('/api/books/bulk/', {'isbns': ['9780000000401']}, format='json')
+        self.assertEqual(response.json(), {'deleted': 1})
+
+
+class ImageVariantTests(TestCase):
+    """URL biến thể ảnh quay về ảnh gốc khi chưa tạo xong, job chỉ chạy khi ảnh đổi"""
+    cover = 'books/covers/mat-biec.jpg'
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        # Trạng thái biến thể được cache theo tên file, không theo MEDIA_ROOT
+        cache.clear()
+        self.addCleanup(cache.clear)
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        category = Category.objects.create(name='Văn học')
+        with mock.patch('books.images.schedule_variants'):
+            self.book = make_book('Mắt biếc', author, category, cover_image=self.cover)
+
+    def cover_urls(self):
+        responses = []
+        for fast in (False, True):
+            with override_settings(BOOK_FAST_LIST_SERIALIZER=fast):
+                response = APIClient().get('/api/books/?cover_size=64&fields=cover_url,cover_urls')
+            responses.append(response.json()['results'][0])
+        self.assertEqual(responses[0], responses[1])
+        return responses[0]
+
+    def test_missing_variant_falls_back_to_original(self):
+        data = self.cover_urls()
+        self.assertTrue(data['cover_url'].endswith(f'/media/{self.cover}'))
+        self.assertTrue(data['cover_urls']['64']['webp'].endswith(f'/media/{self.cover}'))
+        self.assertEqual(variant_url(self.book.cover_image, 64), f'/media/{self.cover}')
+
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 1400), 'white').save(buffer, format='JPEG')
+        default_storage.save(self.cover, ContentFile(buffer.getvalue()))
+        # Job tạo biến thể ghi nhận kết quả vào cache: không phải chờ hết TTL "chưa có"
+        images.generate_variants(default_storage, self.cover)
+        data = self.cover_urls()
+        variant = variant_name(self.cover, 64, 'jpeg')
+        self.assertTrue(data['cover_url'].endswith(f'/media/{variant}'))
+        self.assertTrue(data['cover_urls']['64']['jpeg'].endswith(f'/media/{variant}'))
+        self.assertTrue(data['cover_urls']['256']['webp'].endswith(variant_name(self.cover, 256, 'webp')))
+        self.assertEqual(variant_url(self.book.cover_image, 64), f'/media/{variant}')
+
+    def test_storage_checked_once_per_image(self):
+        with mock.patch.object(default_storage, 'exists', return_value=False) as exists:
+            self.cover_urls()
+            checks = exists.call_count
+            self.cover_urls()
+            APIClient().get(f'/api/books/{self.book.slug}/')
+        # Chỉ request đầu hỏi storage, kết quả "chưa có" được cache cho các request sau
+        self.assertGreater(checks, 0)
+        self.assertEqual(exists.call_count, checks)
+
+    def test_variants_scheduled_only_when_cover_changes(self):
+        with mock.patch('books.images.schedule_variants') as schedule:
+            book = Book.objects.get(pk=self.book.pk)
+            book.price = Decimal('99000')
+            book.save()
+            book.save(update_fields=['stock_quantity'])
+            Book.objects.only('title').get(pk=book.pk).save()
+            self.assertEqual(schedule.call_count, 0)
+
+            book.cover_image = 'books/covers/mat-biec-2.jpg'
+            book.save()
+            self.assertEqual(schedule.call_count, 1)
+            self.assertEqual(schedule.call_args.args[0].name, 'books/covers/mat-biec-2.jpg')
+
+
+class AsyncViewTests(TransactionTestCase):
+    """
+    Endpoint async trả về giống hệt endpoint sync, kể cả lỗi 400 và 304.
+    Query chạy trên thread khác nên dữ liệu phải được commit (TransactionTestCase).
+    """
+
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        category = Category.objects.create(name='Văn học')
+        make_book('Mắt biếc', author, category)
+        make_book('Tôi thấy hoa vàng trên cỏ xanh', author, category, language='en')
+
+    async def assert_same(self, query, sync_path='/api/books/', async_path='/api/async/books/'):
+        expected = await AsyncClient().get(f'{sync_path}{query}')
+        response = await AsyncClient().get(f'{async_path}{query}')
+        self.assertEqual(response.status_code, expected.status_code, response.content)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    async def test_book_list(self):
+        for query in [
+            '', '?language=en', '?search=biếc', '?fields=id,title', '?ordering=-price',
+            '?facets=language,category', '?pagination=cursor', '?page=2',
+        ]:
+            with self.subTest(query=query):
+                await self.assert_same(query)
+
+    async def test_invalid_filter_returns_400(self):
+        response = await self.assert_same('?category=abc')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_search(self):
+        await self.assert_same('?q=mắt&facets=language', '/api/search/', '/api/async/search/')
+
+    async def test_detail_and_actions(self):
+        for path in ['mat-biec/', 'mat-biec/?expand=reviews', 'khong-co/', 'available/', 'new_releases/']:
+            with self.subTest(path=path):
+                await self.assert_same('', f'/api/books/{path}', f'/api/async/books/{path}')
+
+    async def test_conditional_get(self):
+        response = await AsyncClient().get('/api/async/books/')
+        self.assertEqual(response.status_code, 200)
+        response = await AsyncClient().get('/api/async/books/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+class BookExportTests(TestCase):
+    """Export stream lọc theo language/category, tham số sai trả về 400"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        cls.category = Category.objects.create(name='Văn học')
+        other = Category.objects.create(name='Thiếu nhi')
+        make_book('Mắt biếc', author, cls.category)
+        make_book('Kính vạn hoa', author, other, language='en')
+
+    def export(self, query=''):
+        return APIClient().get(f'/api/export/books/{query}')
+
+    def test_filters(self):
+        response = self.export(f'?category={self.category.pk}')
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Mắt biếc', content)
+        self.assertNotIn('Kính vạn hoa', content)
+
+        response = self.export('?type=ndjson&language=en&category=')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Kính vạn hoa'])
+
+    def test_invalid_filters_return_400(self):
+        for query in ['?category=abc', '?category=0', '?language=xx', '?type=xml']:
+            with self.subTest(query=query):
+                self.assertEqual(self.export(query).status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag của trang chi tiết đổi khi dữ liệu được expand thay đổi"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        category = Category.objects.create(name='Văn học')
+        cls.book = make_book('Mắt biếc', author, category)
+        cls.user = get_user_model().objects.create_user(username='reader', password='Mat-khau-123')
+        cls.review = Review.objects.create(book=cls.book, user=cls.user, rating=4, comment='Hay')
+
+    def get(self, etag=None, query='?expand=reviews'):
+        headers = {'If-None-Match': etag} if etag else {}
+        return APIClient().get(f'/api/books/{self.book.slug}/{query}', headers=headers)
+
+    def assert_changed(self, etag, query='?expand=reviews'):
+        response = self.get(etag, query)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_book_counts_validator(self):
+        etag = self.get(query='')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(etag, query='').status_code, 304)
+
+        other = make_book('Kính vạn hoa', self.book.author, Category.objects.create(name='Thiếu nhi'))
+        etag = self.assert_changed(etag, query='')
+        other.category = self.book.category
+        other.save()
+        etag = self.assert_changed(etag, query='')
+        other.delete()
+        self.assert_changed(etag, query='')
+
+    def test_expand_reviews_validator(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+
+        self.review.comment = 'Rất hay'
+        self.review.save()
+        etag = self.assert_changed(etag)
+
+        self.user.username = 'ban-doc'
+        self.user.save()
+        etag = self.assert_changed(etag)
+
+        other = get_user_model().objects.create_user(username='other', password='Mat-khau-123')
+        Review.objects.create(book=self.book, user=other, rating=5)
+        etag = self.assert_changed(etag)
+
+        self.review.delete()
+        self.assert_changed(etag)
+
+
+class RatingAggregateTests(TestCase):
+    """rating_sum/rating_count/average_rating của sách khớp với bảng Review"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        cls.category = Category.objects.create(name='Văn học')
+        cls.book = make_book('Mắt biếc', cls.author, cls.category)
+        cls.other = make_book('Kính vạn hoa', cls.author, cls.category)
+        cls.user = get_user_model().objects.create_user(username='reader', password='Mat-khau-123')
+        Review.objects.create(book=cls.book, user=cls.user, rating=4, comment='Hay')
+
+    def assert_aggregates(self, book, rating_sum, rating_count):
+        book.refresh_from_db()
+        self.assertEqual((book.rating_sum, book.rating_count), (rating_sum, rating_count))
+        self.assertAlmostEqual(book.average_rating, rating_sum / rating_count if rating_count else 0)
+
+    def test_review_api_keeps_aggregates(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='critic', password='x'))
+        response = client.post(
+            f'/api/books/{self.book.slug}/add_review/',
+            {'book': self.book.pk, 'rating': 2, 'comment': 'Tạm'}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        review_id = response.json()['id']
+        self.assert_aggregates(self.book, 6, 2)
+
+        response = client.patch(f'/api/reviews/{review_id}/', {'rating': 5}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assert_aggregates(self.book, 9, 2)
+
+        response = client.patch(f'/api/reviews/{review_id}/', {'book': self.other.pk}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assert_aggregates(self.book, 4, 1)
+        self.assert_aggregates(self.other, 5, 1)
+
+        self.assertEqual(client.delete(f'/api/reviews/{review_id}/').status_code, 204)
+        self.assert_aggregates(self.other, 0, 0)
+
+    def test_ordering_by_average_rating(self):
+        Review.objects.create(book=self.other, user=self.user, rating=5, comment='Rất hay')
+        for ordering, expected in [('average_rating', ['Mắt biếc', 'Kính vạn hoa']),
+                                   ('-average_rating', ['Kính vạn hoa', 'Mắt biếc'])]:
+            with self.subTest(ordering=ordering):
+                response = APIClient().get(f'/api/books/?ordering={ordering}')
+                self.assertEqual([book['title'] for book in response.json()['results']], expected)
+
+    def test_rebuild_ratings_command(self):
+        Review.objects.create(book=self.other, user=self.user, rating=3, comment='Được')
+        Book.objects.update(rating_sum=0, rating_count=0, average_rating=0)
+        out = StringIO()
+        call_command('rebuild_ratings', batch_size=1, stdout=out)
+        self.assertIn('2 sách', out.getvalue())
+        self.assert_aggregates(self.book, 4, 1)
+        self.assert_aggregates(self.other, 3, 1)
+
+    def test_rebuild_only_touches_changed_rows(self):
+        Book.objects.filter(pk=self.book.pk).update(rating_sum=9, rating_count=3, average_rating=3)
+        stamps = dict(Book.objects.values_list('pk', 'updated_at'))
+        self.assertEqual(Book.rebuild_rating_aggregates(), 1)
+        self.assert_aggregates(self.book, 4, 1)
+        self.assertGreater(self.book.updated_at, stamps[self.book.pk])
+        self.assertEqual(Book.objects.get(pk=self.other.pk).updated_at, stamps[self.other.pk])
+        self.assertEqual(Book.rebuild_rating_aggregates(), 0)
+
+
+class SuggestIndexTests(TestCase):
+    """Index gợi ý: fold không dấu, xếp theo độ phổ biến, cập nhật/xóa tăng dần và sync giữa process"""
+
+    entries = [
+        ('author', 1, 'nguyen-nhat-anh', 'Nguyễn Nhật Ánh', 50),
+        ('book', 1, 'mat-biec', 'Mắt biếc', 30),
+        ('book', 2, 'nguoi-ve', 'Người về', 40),
+        ('category', 1, 'van-hoc', 'Văn học Việt Nam', 10),
+        ('book', 3, 'truyen-ngan-nguyen-huy-thiep', 'Truyện ngắn Nguyễn Huy Thiệp', 20),
+    ]
+
+    def labels(self, index, prefix, limit=10):
+        return [entry[3] for entry in index.suggest(prefix, limit)]
+
+    def test_fold(self):
+        self.assertEqual(suggest.fold('Nguyễn Đình-Chiểu'), 'nguyen dinh chieu')
+        self.assertEqual(suggest.fold('  MẮT   Biếc!'), 'mat biec')
+
+    def test_ranking(self):
+        index = suggest.SuggestIndex(self.entries)
+        self.assertEqual(
+            self.labels(index, 'ngu'),
+            ['Nguyễn Nhật Ánh', 'Người về', 'Truyện ngắn Nguyễn Huy Thiệp'],
+        )
+        # Khớp cả từ giữa nhãn, không phân biệt dấu
+        self.assertEqual(self.labels(index, 'VIỆT'), ['Văn học Việt Nam'])
+        self.assertEqual(self.labels(index, 'ngu', limit=2), ['Nguyễn Nhật Ánh', 'Người về'])
+        self.assertEqual(self.labels(index, '!!'), [])
+
+    def test_incremental_update_and_remove(self):
+        for compact_after in (1000, 1):
+            with self.subTest(compact_after=compact_after), \
+                    self.settings(BOOK_SUGGEST_COMPACT_AFTER=compact_after):
+                index = suggest.SuggestIndex(self.entries)
+                index.update('book', 1, 'mat-biec', 'Ngày xưa có một chuyện tình', 60)
+                self.assertEqual(self.labels(index, 'mat'), [])
+                self.assertEqual(self.labels(index, 'ngay')[0], 'Ngày xưa có một chuyện tình')
+                self.assertEqual(self.labels(index, 'ngu')[0], 'Nguyễn Nhật Ánh')
+                # Không truyền độ phổ biến: giữ giá trị cũ
+                index.update('book', 2, 'nguoi-ve', 'Người về muộn')
+                self.assertEqual(index.get('book', 2)[4], 40)
+                index.remove('author', 1)
+                self.assertEqual(self.labels(index, 'ngu'), ['Người về muộn', 'Truyện ngắn Nguyễn Huy Thiệp'])
+                self.assertIsNone(index.get('author', 1))
+                self.assertEqual(index.stats()['entries'], 4)
+
+    def test_sync_applies_changes_from_other_process(self):
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        category = Category.objects.create(name='Văn học')
+        book = make_book('Mắt biếc', author, category)
+        index = suggest.SuggestIndex(suggest.load_entries())
+        self.assertEqual(self.labels(index, 'mat'), ['Mắt biếc'])
+        # Process khác (index của process này không được cập nhật trực tiếp)
+        with mock.patch('books.suggest._index', None), self.captureOnCommitCallbacks(execute=True):
+            make_book('Mặt trời', author, category)
+            book.delete()
+            category.name = 'Thiếu nhi'
+            category.save()
+        index.sync()
+        self.assertEqual(self.labels(index, 'mat'), ['Mặt trời'])
+        self.assertEqual(self.labels(index, 'thieu'), ['Thiếu nhi'])
+        self.assertEqual(self.labels(index, 'van'), [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 của SQLite')
+class SearchIndexTests(TestCase):
+    """Index FTS5 theo kịp thay đổi của sách/tác giả/danh mục, xếp hạng BM25 và fallback icontains"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        cls.category = Category.objects.create(name='Văn học')
+        cls.book = make_book('Mắt biếc', cls.author, cls.category, description='Truyện dài')
+
+    def search(self, query):
+        response = APIClient().get('/api/search/', {'q': query})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [book['title'] for book in response.json()['results']]
+
+    def test_index_follows_model_changes(self):
+        # Không phân biệt dấu, từ cuối khớp theo prefix
+        self.assertEqual(self.search('mat bie'), ['Mắt biếc'])
+        other = make_book('Kính vạn hoa', Author.objects.create(name='Tô Hoài'), self.category)
+        self.assertEqual(self.search('kinh van'), ['Kính vạn hoa'])
+
+        self.book.title = 'Ngày xưa có một chuyện tình'
+        self.book.save()
+        self.assertEqual(self.search('biếc'), [])
+        self.assertEqual(self.search('chuyện tình'), ['Ngày xưa có một chuyện tình'])
+
+        self.author.name = 'Nguyễn Du'
+        self.author.save()
+        self.assertEqual(self.search('Nguyễn Du'), ['Ngày xưa có một chuyện tình'])
+        self.assertEqual(self.search('nhật ánh'), [])
+
+        self.category.name = 'Thiếu nhi'
+        self.category.save()
+        self.assertEqual(sorted(self.search('thiếu nhi')), ['Kính vạn hoa', 'Ngày xưa có một chuyện tình'])
+
+        other.delete()
+        self.assertEqual(self.search('kinh van'), [])
+        self.book.category.delete()
+        self.assertEqual(self.search('chuyện tình'), [])
+
+    def test_bm25_ordering(self):
+        # Trùng ở tên sách (trọng số 10) xếp trước trùng ở mô tả (trọng số 1)
+        make_book('Chuyện nhà', self.author, self.category, description='Hoa nở muộn')
+        make_book('Hoa vàng', self.author, self.category, description='Truyện ngắn')
+        self.assertEqual(self.search('hoa'), ['Hoa vàng', 'Chuyện nhà'])
+        # Trùng tên tác giả (5) xếp trước trùng danh mục (3) và mô tả (1)
+        make_book('Đêm', self.author, self.category, description='Trời cao')
+        make_book('Tình ca', self.author, Category.objects.create(name='Cao nguyên'))
+        make_book('Sách khác', Author.objects.create(name='Văn Cao'), self.category)
+        self.assertEqual(self.search('cao'), ['Sách khác', 'Tình ca', 'Đêm'])
+
+    def test_icontains_fallback(self):
+        with self.settings(BOOK_SEARCH_BACKEND='books.search.BaseSearchBackend'):
+            # Không có index: khớp chuỗi con (kể cả giữa từ) trong tên, mô tả, tác giả, danh mục, ISBN
+            self.assertEqual(self.search('biế'), ['Mắt biếc'])
+            self.assertEqual(self.search('dài'), ['Mắt biếc'])
+            self.assertEqual(self.search(self.book.isbn[-6:]), ['Mắt biếc'])
+            self.assertEqual(self.search('không có'), [])
+        # FTS5 chỉ khớp theo đầu từ
+        self.assertEqual(self.search('iếc'), [])
+
+
+class KeysetPaginationTests(TestCase):
+    """Keyset: giá trị trùng không bị bỏ sót/lặp, cursor sai trả 400, ordering không hỗ trợ về số trang"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        category = Category.objects.create(name='Văn học')
+        # Nhiều sách cùng giá: khóa phụ id quyết định thứ tự
+        cls.ids = [
+            make_book(f'Sách {index:02d}', author, category, price=Decimal(50000 + 10000 * (index % 3))).pk
+            for index in range(25)
+        ]
+
+    def walk(self, path, direction='next'):
+        pages = []
+        while path:
+            response = APIClient().get(path)
+            self.assertEqual(response.status_code, 200, response.content)
+            data = response.json()
+            self.assertNotIn('count', data)
+            pages.append([book['id'] for book in data['results']])
+            path = data[direction]
+        return pages, data
+
+    def test_ties_neither_skip_nor_duplicate(self):
+        for ordering in ['price', '-price']:
+            with self.subTest(ordering=ordering):
+                expected = list(
+                    Book.objects.order_by(ordering, 'id' if ordering == 'price' else '-id')
+                    .values_list('id', flat=True)
+                )
+                pages, last = self.walk(f'/api/books/?pagination=cursor&ordering={ordering}')
+                self.assertEqual([len(page) for page in pages], [10, 10, 5])
+                self.assertEqual([pk for page in pages for pk in page], expected)
+
+                # Đi lùi từ trang cuối cũng ra đúng các trang đó
+                back, _ = self.walk(last['previous'], direction='previous')
+                self.assertEqual(back, pages[-2::-1])
+
+    def test_invalid_cursor_returns_400(self):
+        valid = KeysetPagination().encode_cursor(['50000.00', 1])
+        for cursor in ['abc', '!!!', valid[:-3], KeysetPagination().encode_cursor(['x', 'y'])]:
+            with self.subTest(cursor=cursor):
+                response = APIClient().get(f'/api/books/?ordering=price&cursor={cursor}')
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn('cursor', response.json())
+
+    def test_unsupported_ordering_falls_back_to_page_numbers(self):
+        paginator = KeysetPagination()
+        self.assertIsNone(paginator.get_ordering(Book.objects.order_by('author__name')))
+        self.assertIsNone(paginator.get_ordering(Book.objects.order_by('category')))
+        self.assertIsNone(paginator.get_ordering(StatisticsSnapshot.objects.order_by('computed_at')))
+        self.assertEqual(
+            [field.name for field, _ in paginator.get_ordering(Book.objects.order_by('-price'))],
+            ['price', 'id'],
+        )
+
+        response = APIClient().get('/api/search/?q=sách&ordering=author__name&pagination=cursor')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['count'], 25)
+
+
+class FacetCountTests(TestCase):
+    """Số đếm của mỗi facet bỏ qua filter của chính nó và tôn trọng filter của các facet khác"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        cls.literature = Category.objects.create(name='Văn học')
+        cls.children = Category.objects.create(name='Thiếu nhi')
+        for index, (category, language, price) in enumerate([
+            (cls.literature, 'vi', 100000),
+            (cls.literature, 'vi', 300000),
+            (cls.literature, 'en', 250000),
+            (cls.literature, 'en', 120000),
+            (cls.literature, 'en', 50000),
+            (cls.children, 'en', 400000),
+            (cls.children, 'en', 180000),
+            (cls.children, 'vi', 600000),
+        ]):
+            make_book(f'Sách {index}', author, category, language=language, price=Decimal(price))
+
+    @override_settings(BOOK_PRICE_FACET_BOUNDARIES=[100000, 200000, 300000, 500000])
+    def test_overlapping_filters(self):
+        params = {'language': 'en', 'category': str(self.literature.pk), 'min_price': '150000'}
+        facets = count_facets(
+            Book.objects.all(), ['language', 'category', 'price'], params,
+            filtered=['language', 'category', 'price'],
+        )
+        # Văn học, giá >= 150000: một sách en (250000), một sách vi (300000)
+        self.assertEqual(
+            [(entry['value'], entry['count']) for entry in facets['language']],
+            [('en', 1), ('vi', 1)],
+        )
+        # Tiếng Anh, giá >= 150000: Thiếu nhi 400000 và 180000, Văn học 250000
+        self.assertEqual(
+            [(entry['label'], entry['count']) for entry in facets['category']],
+            [('Thiếu nhi', 2), ('Văn học', 1)],
+        )
+        # Văn học tiếng Anh, mọi mức giá: 50000, 120000, 250000
+        self.assertEqual(
+            [(entry['value'], entry['count']) for entry in facets['price']],
+            [('0-100000', 1), ('100000-200000', 1), ('200000-300000', 1),
+             ('300000-500000', 0), ('500000-', 0)],
+        )
+
+    def test_without_filters(self):
+        facets = count_facets(Book.objects.all(), ['language', 'category'], {}, filtered=['language', 'category'])
+        self.assertEqual([(entry['value'], entry['count']) for entry in facets['language']], [('en', 5), ('vi', 3)])
+        self.assertEqual([(entry['label'], entry['count']) for entry in facets['category']],
+                         [('Văn học', 5), ('Thiếu nhi', 3)])
+
+
+@skipUnless(recommendations.np is not None, 'cần numpy và scipy')
+class SimilarBooksTests(TestCase):
+    """build_similarities: dựng toàn bộ, dựng tăng dần, lọc min_common và endpoint /similar/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name='Nguyễn Nhật Ánh')
+        category = Category.objects.create(name='Văn học')
+        cls.books = {title: make_book(title, author, category) for title in 'ABCDE'}
+        cls.users = [
+            get_user_model().objects.create_user(username=f'reader{index}', password='x')
+            for index in range(5)
+        ]
+        # A và B được cùng ba người chấm giống nhau (cosine 1); A/B và C có hai
+        # người đánh giá chung; D và E chỉ có một người chung với sách khác
+        for user, ratings in zip(cls.users, [
+            {'A': 5, 'B': 5, 'C': 1},
+            {'A': 4, 'B': 4, 'C': 2},
+            {'A': 3, 'B': 3, 'D': 5},
+            {'D': 4, 'E': 4},
+        ]):
+            for title, rating in ratings.items():
+                Review.objects.create(book=cls.books[title], user=user, rating=rating, comment='')
+
+    def similar(self, title):
+        return [book.title for book in recommendations.similar_books(self.books[title])]
+
+    def test_full_build(self):
+        result = recommendations.build_similarities(min_common=2)
+        self.assertEqual((result['books'], result['pairs']), (5, 6))
+        self.assertEqual(self.similar('A'), ['B', 'C'])
+        self.assertEqual(self.similar('B'), ['A', 'C'])
+        # Điểm bằng nhau: sách có id nhỏ hơn trước
+        self.assertEqual(self.similar('C'), ['A', 'B'])
+        self.assertEqual(self.similar('D'), [])
+        score = BookSimilarity.objects.get(book=self.books['A'], similar=self.books['B']).score
+        self.assertAlmostEqual(score, 1.0, places=5)
+
+    def test_min_common(self):
+        recommendations.build_similarities(min_common=1)
+        # Cosine D-E (0.625) lớn hơn D-A = D-B (0.33)
+        self.assertEqual(self.similar('D'), ['E', 'A', 'B'])
+        self.assertEqual(self.similar('E'), ['D'])
+        recommendations.build_similarities(min_common=3)
+        self.assertEqual(self.similar('A'), ['B'])
+        self.assertEqual(self.similar('C'), [])
+
+    def test_incremental_build(self):
+        recommendations.build_similarities(min_common=2)
+        untouched = set(BookSimilarity.objects.values_list('pk', flat=True))
+        # Người thứ năm đánh giá D và E: chỉ hai sách này cần tính lại
+        for title in 'DE':
+            Review.objects.create(book=self.books[title], user=self.users[4], rating=3, comment='')
+        result = recommendations.build_similarities(incremental=True, min_common=2)
+        self.assertTrue(result['incremental'])
+        self.assertEqual(result['books'], 2)
+        self.assertEqual(self.similar('D'), ['E'])
+        self.assertEqual(self.similar('E'), ['D'])
+        self.assertEqual(set(BookSimilarity.objects.values_list('pk', flat=True)) & untouched, untouched)
+
+    def test_similar_endpoint(self):
+        recommendations.build_similarities(min_common=2)
+        slug = self.books['A'].slug
+        for query, expected in [('', ['B', 'C']), ('?limit=1', ['B']), ('?limit=abc', ['B', 'C'])]:
+            with self.subTest(query=query):
+                response = APIClient().get(f'/api/books/{slug}/similar/{query}')
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual([book['title'] for book in response.json()], expected)
@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     CategoryViewSet, AuthorViewSet, BookViewSet, ReviewViewSet,
-    BookSearchView, BookStatisticsView
+    BookSearchView, BookStatisticsView, BookExportView
 )
 
 # Tạo router cho ViewSets
@@ -21,4 +22,13 @@ urlpatterns = [
     # Custom API endpoints
     path('search/', BookSearchView.as_view(), name='book-search'),
     path('statistics/', BookStatisticsView.as_view(), name='book-statistics'),
+    path('export/books/', BookExportView.as_view(), name='book-export'),
+    
+    # Async (ASGI) endpoints cho các API chỉ đọc
+    path('async/books/', async_views.book_list, name='async-book-list'),
+    path('async/books/available/', async_views.book_available, name='async-book-available'),
+    path('async/books/new_releases/', async_views.book_new_releases, name='async-book-new-releases'),
+    path('async/books/<slug:slug>/', async_views.book_detail, name='async-book-detail'),
+    path('async/search/', async_views.book_search, name='async-book-search'),
+    path('async/statistics/', async_views.book_statistics, name='async-book-statistics'),
 ] 
\ No newline at end of file
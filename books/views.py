@@ -1,21 +1,103 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Avg, Count
+from django.db.models import Count, OuterRef, Subquery
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
+from .bulk import bulk_delete_books, bulk_write_books
+from .conditional import ConditionalGetMixin
+from .export import EXPORT_FORMATS, stream_export
+from .facets import FacetMixin
+from .fastpath import FastBookListSerializer
+from .fieldsets import SparseFieldsetMixin, parse_list_param
+from .inventory import StockError, checkout_books, return_books
 from .models import Category, Author, Book, Review
+from .recommendations import get_top as get_similar_top, similar_books
 from .serializers import (
     CategorySerializer, AuthorSerializer, BookListSerializer,
-    BookDetailSerializer, BookCreateUpdateSerializer, ReviewSerializer
+    BookDetailSerializer, BookBulkDeleteSerializer, BookExportQuerySerializer, BookCreateUpdateSerializer, ReviewSerializer,
+    CheckoutBatchSerializer, CheckoutSerializer, StockBatchSerializer, StockChangeSerializer
 )
+from .search import get_search_backend
+from .statistics import get_snapshot, render_snapshot
+from .suggest import get_limit as get_suggest_limit, suggest as find_suggestions
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+def with_related_books_counts(queryset, relations=('author', 'category')):
+    """Annotate số sách của tác giả và/hoặc danh mục cho queryset Book (tránh N+1 COUNT)"""
+    def books_count(relation):
+        books = Book.objects.filter(**{relation: OuterRef(relation)}).order_by()
+        return Subquery(books.values(relation).annotate(total=Count('pk')).values('total'))
+
+    if not relations:
+        return queryset
+    return queryset.annotate(**{
+        f'{relation}_books_count': books_count(relation) for relation in relations
+    })
+
+
+def optimize_book_queryset(queryset, serializer, extra_columns=()):
+    """Cắt bớt cột/join theo các field sẽ xuất ra, annotate số sách cho author/category lồng bên trong"""
+    queryset = serializer.optimize_queryset(queryset, extra_columns)
+    nested = serializer.nested_fields()
+    return with_related_books_counts(
+        queryset, [relation for relation in ('author', 'category') if relation in nested]
+    )
+
+
+def use_fast_serializer():
+    """Bật/tắt FastBookListSerializer bằng setting BOOK_FAST_LIST_SERIALIZER"""
+    return getattr(settings, 'BOOK_FAST_LIST_SERIALIZER', True)
+
+
+def serialize_book_list(request, queryset):
+    """Serialize danh sách sách rút gọn, hỗ trợ `?fields=` và `?expand=`"""
+    kwargs = {
+        'fields': parse_list_param(request, 'fields'),
+        'expand': parse_list_param(request, 'expand'),
+        'context': {'request': request},
+    }
+    if not kwargs['expand'] and use_fast_serializer():
+        fast = FastBookListSerializer(request, fields=kwargs['fields'])
+        return fast.render(fast.prepare(queryset))
+    queryset = optimize_book_queryset(queryset, BookListSerializer(**kwargs))
+    return BookListSerializer(queryset, many=True, **kwargs).data
+
+
+class BookFieldsetMixin(SparseFieldsetMixin):
+    """Sparse fieldsets cho các view trả về sách"""
+
+    def optimize_queryset(self, queryset, serializer):
+        return optimize_book_queryset(queryset, serializer, self.get_sparse_extra_columns())
+
+    def get_fast_serializer(self):
+        """FastBookListSerializer cho danh sách dùng BookListSerializer và không có ?expand="""
+        if self.get_serializer_class() is not BookListSerializer or not use_fast_serializer():
+            return None
+        kwargs = self.get_fieldset_kwargs()
+        if kwargs['expand']:
+            return None
+        return FastBookListSerializer(self.request, fields=kwargs['fields'])
+
+    def list(self, request, *args, **kwargs):
+        fast = self.get_fast_serializer()
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+        queryset = fast.prepare(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.render(page))
+        return Response(fast.render(queryset))
+
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet cho Category model"""
-    queryset = Category.objects.all()
+    queryset = Category.objects.annotate(books_count=Count('books'))
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -23,19 +105,18 @@ class CategoryViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
     lookup_field = 'slug'
+    conditional_related = ['books']
 
     @action(detail=True, methods=['get'])
     def books(self, request, slug=None):
         """Lấy danh sách sách trong danh mục"""
         category = self.get_object()
-        books = category.books.all()
-        serializer = BookListSerializer(books, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(serialize_book_list(request, Book.objects.filter(category=category)))
 
 
-class AuthorViewSet(viewsets.ModelViewSet):
+class AuthorViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet cho Author model"""
-    queryset = Author.objects.all()
+    queryset = Author.objects.annotate(books_count=Count('books'))
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -43,17 +124,16 @@ class AuthorViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
     lookup_field = 'slug'
+    conditional_related = ['books']
 
     @action(detail=True, methods=['get'])
     def books(self, request, slug=None):
         """Lấy danh sách sách của tác giả"""
         author = self.get_object()
-        books = author.books.all()
-        serializer = BookListSerializer(books, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(serialize_book_list(request, Book.objects.filter(author=author)))
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(FacetMixin, ConditionalGetMixin, BookFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet cho Book model"""
     queryset = Book.objects.select_related('author', 'category').all()
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -63,6 +143,8 @@ class BookViewSet(viewsets.ModelViewSet):
     ordering_fields = ['title', 'price', 'publication_date', 'created_at', 'average_rating']
     ordering = ['-created_at']
     lookup_field = 'slug'
+    conditional_related = ['author', 'category']
+    facet_filtered = ['category', 'language', 'status']
 
     def get_serializer_class(self):
         """Chọn serializer phù hợp dựa trên action"""
@@ -72,9 +154,16 @@ class BookViewSet(viewsets.ModelViewSet):
             return BookCreateUpdateSerializer
         return BookDetailSerializer
 
-    def get_queryset(self):
-        """Tối ưu queryset với prefetch_related cho reviews"""
-        return super().get_queryset().prefetch_related('reviews')
+    def get_conditional_related(self):
+        """
+        `?expand=reviews` hiển thị đánh giá và tên người đánh giá nên chúng cũng
+        vào validator. Số sách của tác giả/danh mục trên trang chi tiết không cần:
+        updated_at của chúng đổi theo (Book.touch_owners).
+        """
+        related = super().get_conditional_related()
+        if 'reviews' in (self.get_fieldset_kwargs().get('expand') or []):
+            related = related + ['reviews', 'reviews__user']
+        return related
 
     @action(detail=False, methods=['get'])
     def available(self, request):
@@ -101,6 +190,122 @@ class BookViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(books, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny], authentication_classes=[])
+    def suggest(self, request):
+        """
+        Gợi ý khi gõ: ?prefix=nguyen&limit=10. Tìm trong index trên bộ nhớ (tên sách,
+        tác giả, danh mục, không dấu), không query database và không cần xác thực.
+        """
+        prefix = request.query_params.get('prefix', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', get_suggest_limit())), 1), 50)
+        except ValueError:
+            limit = get_suggest_limit()
+        results = [
+            {'type': kind, 'id': pk, 'slug': slug, 'label': label}
+            for kind, pk, slug, label, _ in find_suggestions(prefix, limit)
+        ]
+        return Response({'results': results})
+
+    @action(detail=False, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """
+        Tạo/cập nhật/xóa nhiều sách trong một request.
+
+        POST nhận một danh sách sách (thêm `?mode=upsert` để cập nhật sách đã có
+        theo ISBN), DELETE nhận `{"isbns": [...]}`.
+        """
+        max_items = getattr(settings, 'BOOK_BULK_MAX_ITEMS', 1000)
+        if request.method == 'DELETE':
+            serializer = BookBulkDeleteSerializer(data=request.data, context={'max_items': max_items})
+            serializer.is_valid(raise_exception=True)
+            return Response({'deleted': bulk_delete_books(serializer.validated_data['isbns'])})
+
+        items = request.data
+        if not isinstance(items, list) or not items or len(items) > max_items:
+            return Response(
+                {'error': f'Dữ liệu phải là danh sách từ 1 đến {max_items} sách'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        results = bulk_write_books(items, upsert=request.query_params.get('mode') == 'upsert')
+        errors = sum(1 for result in results if result['status'] == 'error')
+        if errors == len(results):
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_200_OK
+        return Response({
+            'created': sum(1 for result in results if result['status'] == 'created'),
+            'updated': sum(1 for result in results if result['status'] == 'updated'),
+            'errors': errors,
+            'results': results,
+        }, status=response_status)
+
+    def change_stock(self, request, serializer_class, operation, batch):
+        """Validate dữ liệu rồi chạy checkout/return; 409 nếu có sách không đủ tồn kho"""
+        serializer = serializer_class(
+            data=request.data,
+            context={'max_items': getattr(settings, 'BOOK_BULK_MAX_ITEMS', 1000)},
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if batch:
+            items = [(item['book'], item['quantity']) for item in data['items']]
+        else:
+            book_id = get_object_or_404(
+                Book.objects.values_list('pk', flat=True), slug=self.kwargs['slug']
+            )
+            items = [(book_id, data['quantity'])]
+        kwargs = {'kind': data['type']} if 'type' in data else {}
+        try:
+            results = operation(items, **kwargs)
+        except StockError as exc:
+            return Response({'errors': exc.failures}, status=status.HTTP_409_CONFLICT)
+        return Response({'books': results} if batch else results[0])
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def checkout(self, request, slug=None):
+        """Mượn/đặt trước sách: {"quantity": 1, "type": "borrow" | "reserve"}"""
+        return self.change_stock(request, CheckoutSerializer, checkout_books, batch=False)
+
+    @action(
+        detail=True, methods=['post'], permission_classes=[IsAuthenticated],
+        url_path='return', url_name='return',
+    )
+    def return_book(self, request, slug=None):
+        """Trả sách: {"quantity": 1}"""
+        return self.change_stock(request, StockChangeSerializer, return_books, batch=False)
+
+    @action(
+        detail=False, methods=['post'], permission_classes=[IsAuthenticated],
+        url_path='checkout', url_name='checkout-batch',
+    )
+    def checkout_batch(self, request):
+        """Checkout nhiều sách, tất cả hoặc không: {"items": [{"book": 1, "quantity": 2}], "type": "borrow"}"""
+        return self.change_stock(request, CheckoutBatchSerializer, checkout_books, batch=True)
+
+    @action(
+        detail=False, methods=['post'], permission_classes=[IsAuthenticated],
+        url_path='return', url_name='return-batch',
+    )
+    def return_batch(self, request):
+        """Trả nhiều sách trong một transaction: {"items": [{"book": 1, "quantity": 2}]}"""
+        return self.change_stock(request, StockBatchSerializer, return_books, batch=True)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, slug=None):
+        """
+        Sách tương tự ("người đọc cũng thích"): ?limit=10. Đọc từ bảng do lệnh
+        build_similar_books dựng sẵn; trả về danh sách rỗng nếu chưa có.
+        """
+        book = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), get_similar_top())
+        except ValueError:
+            limit = min(10, get_similar_top())
+        return Response(serialize_book_list(request, similar_books(book)[:limit]))
+
     @action(detail=True, methods=['get'])
     def reviews(self, request, slug=None):
         """Lấy danh sách đánh giá của sách"""
@@ -168,83 +373,107 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 
 
-class BookSearchView(ListAPIView):
+def build_search_queryset(params):
+    """Xây dựng queryset tìm kiếm sách từ query params (dùng chung cho bản sync và async)"""
+    queryset = Book.objects.select_related('author', 'category').all()
+    
+    # Tìm kiếm theo từ khóa (dùng index toàn văn, xếp hạng theo độ liên quan)
+    q = params.get('q', None)
+    if q:
+        queryset = get_search_backend().search(queryset, q)
+    
+    # Lọc theo giá
+    min_price = params.get('min_price', None)
+    max_price = params.get('max_price', None)
+    
+    if min_price:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price:
+        queryset = queryset.filter(price__lte=max_price)
+    
+    # Lọc theo ngôn ngữ
+    language = params.get('language', None)
+    if language:
+        queryset = queryset.filter(language=language)
+    
+    # Sắp xếp (mặc định theo độ liên quan khi có từ khóa)
+    ordering = params.get('ordering', None if q else '-created_at')
+    if ordering:
+        queryset = queryset.order_by(ordering)
+    
+    return queryset
+
+
+class BookSearchView(FacetMixin, BookFieldsetMixin, ListAPIView):
     """API view cho tìm kiếm sách nâng cao"""
     serializer_class = BookListSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    facet_filtered = ['language', 'price']
 
     def get_queryset(self):
-        queryset = Book.objects.select_related('author', 'category').all()
-        
-        # Tìm kiếm theo từ khóa
-        q = self.request.query_params.get('q', None)
-        if q:
-            queryset = queryset.filter(
-                Q(title__icontains=q) |
-                Q(description__icontains=q) |
-                Q(author__name__icontains=q) |
-                Q(category__name__icontains=q) |
-                Q(isbn__icontains=q)
-            )
-        
-        # Lọc theo giá
-        min_price = self.request.query_params.get('min_price', None)
-        max_price = self.request.query_params.get('max_price', None)
-        
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-        
-        # Lọc theo ngôn ngữ
-        language = self.request.query_params.get('language', None)
-        if language:
-            queryset = queryset.filter(language=language)
-        
-        # Sắp xếp
-        ordering = self.request.query_params.get('ordering', '-created_at')
-        if ordering:
-            queryset = queryset.order_by(ordering)
-        
-        return queryset
+        return self.sparse_queryset(build_search_queryset(self.request.query_params))
+
+
+def get_top_rated_books(limit=5):
+    """Sách có đánh giá trung bình cao nhất (dùng cột average_rating đã được index)"""
+    return Book.objects.select_related('author', 'category').filter(
+        rating_count__gt=0
+    ).order_by('-average_rating')[:limit]
 
 
 class BookStatisticsView(APIView):
-    """API view cho thống kê sách"""
+    """API view cho thống kê sách (đọc từ bộ đếm, tính lại toàn bộ khi bị invalidate hoặc quá TTL)"""
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get(self, request):
         """Lấy thống kê tổng quan về sách"""
-        total_books = Book.objects.count()
-        available_books = Book.objects.filter(status='available', stock_quantity__gt=0).count()
-        total_authors = Author.objects.count()
-        total_categories = Category.objects.count()
-        
-        # Thống kê theo danh mục
-        category_stats = Category.objects.annotate(
-            book_count=Count('books')
-        ).values('name', 'book_count')
-        
-        # Thống kê theo ngôn ngữ
-        language_stats = Book.objects.values('language').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        snapshot = get_snapshot()
+        data = render_snapshot(snapshot)
         
         # Sách có đánh giá cao nhất
-        top_rated_books = Book.objects.annotate(
-            avg_rating=Avg('reviews__rating')
-        ).filter(avg_rating__isnull=False).order_by('-avg_rating')[:5]
-        
-        top_rated_data = BookListSerializer(
+        top_rated_books = get_top_rated_books()
+        data['top_rated_books'] = BookListSerializer(
             top_rated_books, many=True, context={'request': request}
         ).data
         
-        return Response({
-            'total_books': total_books,
-            'available_books': available_books,
-            'total_authors': total_authors,
-            'total_categories': total_categories,
-            'category_stats': list(category_stats),
-            'language_stats': list(language_stats),
-            'top_rated_books': top_rated_data
+        data['snapshot_computed_at'] = snapshot.computed_at
+        data['snapshot_updated_at'] = snapshot.updated_at
+        data['snapshot_age'] = (timezone.now() - snapshot.computed_at).total_seconds()
+        return Response(data)
+
+
+class BookExportView(APIView):
+    """API view export toàn bộ catalog dạng stream (CSV hoặc NDJSON)"""
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        """Stream catalog, lọc tùy chọn theo `language` và `category`"""
+        export_format = request.query_params.get('type', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f'type phải là một trong: {", ".join(sorted(EXPORT_FORMATS))}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Bỏ qua tham số rỗng như trước; giá trị sai kiểu trả về 400 thay vì lỗi khi lọc
+        filters_serializer = BookExportQuerySerializer(data={
+            key: request.query_params[key]
+            for key in ('language', 'category') if request.query_params.get(key)
         })
+        if not filters_serializer.is_valid():
+            return Response(filters_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Book.objects.all()
+        language = filters_serializer.validated_data.get('language')
+        if language:
+            queryset = queryset.filter(language=language)
+        category = filters_serializer.validated_data.get('category')
+        if category:
+            queryset = queryset.filter(category_id=category)
+        
+        response = StreamingHttpResponse(
+            stream_export(export_format, queryset),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="books.{export_format}"'
+        return response
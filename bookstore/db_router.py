@@ -0,0 +1,68 @@
+import itertools
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Định tuyến của request hiện tại (đặt bởi ReplicaRoutingMiddleware).
+# Ngoài request (management command, shell...) luôn dùng primary.
+current_route = ContextVar('current_route', default=None)
+
+_counter = itertools.count()
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def choose_replica():
+    """Chọn replica theo vòng tròn, None nếu chưa cấu hình replica"""
+    replicas = get_replicas()
+    if not replicas:
+        return None
+    return replicas[next(_counter) % len(replicas)]
+
+
+class Route:
+    """Replica dùng cho cả request (để các query thấy cùng một trạng thái dữ liệu)"""
+    __slots__ = ('replica',)
+
+    def __init__(self, replica=None):
+        self.replica = replica
+
+
+class ReplicaRouter:
+    """
+    Đọc của các app trong `route_app_labels` đi tới read replica nếu request
+    hiện tại được phép; ghi và migrate chỉ trên primary.
+
+    Một khi request đã ghi, các lần đọc sau trong request đó quay về primary.
+    """
+    route_app_labels = {'books', 'users'}
+
+    def db_for_read(self, model, **hints):
+        route = current_route.get()
+        if (
+            route is not None and route.replica is not None
+            and model._meta.app_label in self.route_app_labels
+        ):
+            return route.replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        route = current_route.get()
+        if route is not None:
+            route.replica = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replica là bản sao của primary, không migrate riêng
+        if db in get_replicas():
+            return False
+        return None
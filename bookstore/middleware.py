@@ -0,0 +1,325 @@
+import base64
+import hashlib
+import json
+import logging
+import re
+import time
+import threading
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+
+from users.tokens import load_token
+
+from .db_router import Route, choose_replica, current_route, get_replicas
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+logger = logging.getLogger('bookstore.sql')
+slow_logger = logging.getLogger('bookstore.sql.slow')
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\((?:%s|\?)(?:,\s*(?:%s|\?))+\)')
+
+# Recorder của request hiện tại; asgiref chép context sang thread của sync_to_async
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Bỏ giá trị cụ thể (chuỗi, số, độ dài danh sách IN) để gom các query cùng dạng"""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return IN_LIST_RE.sub('(...)', sql)
+
+
+class QueryRecorder:
+    """
+    Execute wrapper ghi lại số query, tổng thời gian SQL và số lần lặp của
+    từng câu SQL trong một request.
+
+    Chi phí mỗi query chỉ là hai lần đọc đồng hồ và vài thao tác dict;
+    việc chuẩn hóa SQL để gom nhóm chỉ làm một lần cho mỗi câu khác nhau.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.duplicates = 0
+        self.statements = {}
+        self.seen = set()
+        # View async có thể chạy nhiều query song song trên các thread khác nhau
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.record(sql, params, many, time.perf_counter() - started)
+
+    def record(self, sql, params, many, elapsed):
+        self.count += 1
+        self.duration += elapsed
+        stats = self.statements.get(sql)
+        if stats is None:
+            self.statements[sql] = [1, elapsed]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+        if not many:
+            # Cùng SQL lẫn tham số: query thừa hoàn toàn
+            key = (sql, repr(params))
+            if key in self.seen:
+                self.duplicates += 1
+            else:
+                self.seen.add(key)
+
+    def groups(self):
+        """fingerprint -> [số lần chạy, tổng thời gian], nhiều nhất trước"""
+        groups = {}
+        for sql, (count, duration) in self.statements.items():
+            group = groups.setdefault(fingerprint(sql), [0, 0.0])
+            group[0] += count
+            group[1] += duration
+        return sorted(groups.items(), key=lambda item: (-item[1][0], -item[1][1]))
+
+
+@contextmanager
+def record_queries():
+    """
+    Gắn recorder của request hiện tại (nếu có) vào các connection của thread
+    đang chạy. Code tự chạy query trên thread khác (ví dụ
+    `sync_to_async(thread_sensitive=False)`) cần bọc trong context manager này.
+    """
+    recorder = current_recorder.get()
+    with ExitStack() as stack:
+        if recorder is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Đo SQL của từng request trên mọi database alias.
+
+    - Header `Server-Timing` (db/app) để xem ngay trong DevTools hoặc load test.
+    - Log JSON mỗi request vào logger `bookstore.sql` ở mức DEBUG.
+    - Cảnh báo nghi N+1 khi một dạng query chạy từ `SQL_N_PLUS_ONE_THRESHOLD`
+      lần trở lên, và log vào `bookstore.sql.slow` khi request chậm hơn
+      `SQL_SLOW_REQUEST_MS`.
+
+    Query chạy trong lúc stream response (export) không được tính.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'SQL_SLOW_REQUEST_MS', 500)
+        self.threshold = getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 5)
+        self.server_timing = getattr(settings, 'SQL_SERVER_TIMING', True)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            with record_queries():
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.report(request, response, recorder, (time.perf_counter() - started) * 1000)
+        return response
+
+    async def __acall__(self, request):
+        # Connection là thread-local: gắn wrapper trong thread "thread_sensitive"
+        # của request, nơi middleware/view sync và sync_to_async mặc định chạy query.
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        recording = record_queries()
+        await sync_to_async(recording.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.__exit__)(None, None, None)
+            current_recorder.reset(token)
+        self.report(request, response, recorder, (time.perf_counter() - started) * 1000)
+        return response
+
+    def report(self, request, response, recorder, total_ms):
+        sql_ms = recorder.duration * 1000
+        if self.server_timing:
+            timing = (
+                f'db;dur={sql_ms:.2f};desc="{recorder.count} queries, '
+                f'{recorder.duplicates} duplicate", app;dur={total_ms:.2f}'
+            )
+            existing = response.headers.get('Server-Timing')
+            response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        slow = total_ms >= self.slow_ms
+        suspects = []
+        if recorder.count >= self.threshold:
+            suspects = [
+                (sql, count, duration) for sql, (count, duration) in recorder.groups()
+                if count >= self.threshold
+            ]
+        if not (suspects or slow or logger.isEnabledFor(logging.DEBUG)):
+            return
+
+        payload = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'queries': recorder.count,
+            'sql_ms': round(sql_ms, 2),
+            'duplicates': recorder.duplicates,
+        }
+        if suspects:
+            payload['n_plus_one'] = [
+                {'sql': sql[:500], 'count': count, 'sql_ms': round(duration * 1000, 2)}
+                for sql, count, duration in suspects
+            ]
+            logger.warning(json.dumps(payload, ensure_ascii=False))
+        elif not slow:
+            logger.debug(json.dumps(payload, ensure_ascii=False))
+
+        if slow:
+            payload['top_queries'] = [
+                {'sql': sql[:500], 'count': count, 'sql_ms': round(duration * 1000, 2)}
+                for sql, (count, duration) in sorted(
+                    recorder.groups(), key=lambda item: -item[1][1]
+                )[:5]
+            ]
+            slow_logger.warning(json.dumps(payload, ensure_ascii=False))
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Cho phép request đọc (GET/HEAD/OPTIONS) dùng read replica (xem ReplicaRouter).
+
+    Request ghi luôn dùng primary, đặt cookie và ghim user đã xác thực (khóa
+    cache theo id và username) để các request tiếp theo của cùng client hoặc
+    cùng user trong `DATABASE_REPLICA_STICKY_SECONDS` giây cũng đọc từ primary,
+    tránh đọc phải dữ liệu cũ khi replica còn trễ. User của request đọc được
+    nhận ra từ session, Bearer token hoặc Basic auth mà không query database,
+    nên middleware phải đứng sau AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'bookstore_primary'
+    cache_prefix = 'bookstore:primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 10)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        route = self.get_route(request)
+        if route.replica is not None:
+            keys = self.get_pin_keys(request, self.get_session_user_id(request))
+            if keys and cache.get_many(keys):
+                route = Route()
+        token = current_route.set(route)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_route.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        route = self.get_route(request)
+        if route.replica is not None:
+            keys = self.get_pin_keys(request, await self.aget_session_user_id(request))
+            if keys and await cache.aget_many(keys):
+                route = Route()
+        token = current_route.set(route)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_route.reset(token)
+        if request.method in SAFE_METHODS:
+            return self.process_response(request, response)
+        # request.user có thể là lazy object của AuthenticationMiddleware (query database)
+        return await sync_to_async(self.process_response)(request, response)
+
+    def get_route(self, request):
+        if request.method in SAFE_METHODS and not self.is_pinned(request):
+            return Route(choose_replica())
+        return Route()
+
+    def is_pinned(self, request):
+        try:
+            return int(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def get_session_user_id(self, request):
+        session = getattr(request, 'session', None)
+        return session.get(SESSION_KEY) if session is not None else None
+
+    async def aget_session_user_id(self, request):
+        session = getattr(request, 'session', None)
+        return await session.aget(SESSION_KEY) if session is not None else None
+
+    def pin_key(self, kind, value):
+        return f'{self.cache_prefix}:{kind}:{hashlib.md5(str(value).encode()).hexdigest()}'
+
+    def get_pin_keys(self, request, session_user_id=None):
+        """Khóa cache có thể ghim request này về primary (chưa xác thực, chỉ để chọn database)"""
+        keys = []
+        if session_user_id is not None:
+            keys.append(self.pin_key('user', session_user_id))
+        auth = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(auth) == 2 and auth[0].lower() == 'bearer':
+            try:
+                keys.append(self.pin_key('user', load_token(auth[1])[0]))
+            except signing.BadSignature:
+                pass
+        elif len(auth) == 2 and auth[0].lower() == 'basic':
+            try:
+                username = base64.b64decode(auth[1]).decode().partition(':')[0]
+            except (ValueError, UnicodeError):
+                pass
+            else:
+                keys.append(self.pin_key('username', username))
+        return keys
+
+    def pin_user(self, user):
+        """Ghim user vừa ghi (theo id cho session/Bearer, theo username cho Basic auth)"""
+        keys = {self.pin_key('user', user.pk): 1}
+        # User từ Bearer token chỉ có id: không nạp thêm field chỉ để lấy username
+        if 'username' not in user.get_deferred_fields():
+            keys[self.pin_key('username', user.get_username())] = 1
+        cache.set_many(keys, self.sticky_seconds)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and self.sticky_seconds and get_replicas():
+            response.set_cookie(
+                self.cookie_name, str(int(time.time() + self.sticky_seconds)),
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+            )
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                self.pin_user(user)
+        return response
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -19,13 +23,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
+# Các giá trị cấu hình đọc từ biến môi trường hoặc file .env (xem .env.example)
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-i76b2)f#-o_+5@oem3o%(l^jsrivqq**&3#a(tti$-c4ei#27m'
+SECRET_KEY = config(
+    'SECRET_KEY', default='django-insecure-i76b2)f#-o_+5@oem3o%(l^jsrivqq**&3#a(tti$-c4ei#27m'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = config('DEBUG', default=True, cast=bool)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='', cast=Csv())
 
 
 # Application definition
@@ -49,12 +57,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bookstore.middleware.QueryInstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Sau AuthenticationMiddleware: ghim primary theo user đọc từ session
+    'bookstore.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,12 +93,84 @@ WSGI_APPLICATION = 'bookstore.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='bookstore'),
+            'USER': config('DB_USER', default='bookstore'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if config('DB_POOL', default=False, cast=bool):
+        # Connection pool có sẵn của Django (cần psycopg[pool]), không dùng chung với CONN_MAX_AGE
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    # BEGIN IMMEDIATE lấy khóa ghi ngay đầu transaction để busy_timeout có tác dụng
+    # (tránh lỗi "database is locked" khi nâng khóa đọc thành khóa ghi). Các PRAGMA
+    # này chỉ áp dụng cho từng connection, không ghi gì vào file database.
+    sqlite_pragmas = [
+        f"PRAGMA mmap_size={config('DB_SQLITE_MMAP_SIZE', default=268435456, cast=int)}",
+        f"PRAGMA busy_timeout={config('DB_SQLITE_BUSY_TIMEOUT', default=5000, cast=int)}",
+        'PRAGMA cache_size=-20000',
+        'PRAGMA temp_store=MEMORY',
+    ]
+    if config('DB_SQLITE_WAL', default=False, cast=bool):
+        # WAL: đọc không chặn ghi; synchronous=NORMAL đủ an toàn với WAL và ít fsync hơn.
+        # journal_mode được lưu trong file database nên chỉ bật khi chạy thật,
+        # không để lệnh manage.py nào cũng sửa db.sqlite3 trong repo.
+        sqlite_pragmas = ['PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL'] + sqlite_pragmas
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': ';'.join(sqlite_pragmas),
+        'transaction_mode': 'IMMEDIATE',
+    }
+else:
+    raise ImproperlyConfigured(f'DB_ENGINE không hợp lệ: {DB_ENGINE!r} (sqlite hoặc postgresql)')
+
+# Read replica: alias trong DATABASES chỉ dùng để đọc (bookstore/db_router.py).
+# PostgreSQL: DB_REPLICA_HOSTS=host1,host2. Thử nghiệm local với SQLite: đặt
+# SQLITE_REPLICAS > 0 rồi chép dữ liệu bằng `python manage.py sync_replicas`.
+DATABASE_REPLICAS = []
+if DB_ENGINE == 'postgresql':
+    replica_settings = [
+        {'HOST': host} for host in config('DB_REPLICA_HOSTS', default='', cast=Csv())
+    ]
+else:
+    replica_settings = [
+        {'NAME': str(BASE_DIR / f'db_replica{index}.sqlite3')}
+        for index in range(1, config('SQLITE_REPLICAS', default=0, cast=int) + 1)
+    ]
+for index, replica in enumerate(replica_settings, start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'], **replica, 'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['bookstore.db_router.ReplicaRouter']
+
+# Sau khi client ghi, các request đọc trong ngần này giây vẫn dùng primary
+DATABASE_REPLICA_STICKY_SECONDS = 10
 
 
 # Password validation
@@ -134,22 +217,36 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'users.authentication.CachedBasicAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'books.pagination.BookstorePagination',
     'PAGE_SIZE': 10,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'books.renderers.ORJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'books.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# MessagePack (Accept: application/msgpack) khi đã cài msgpack
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('books.renderers.MessagePackRenderer')
+
+# Browsable API chỉ bật khi phát triển (render HTML tốn kém cho mọi Accept kiểu trình duyệt)
+if DEBUG:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('rest_framework.renderers.BrowsableAPIRenderer')
+
 # CORS settings
-CORS_ALLOW_ALL_ORIGINS = True  # Chỉ dùng cho development
+CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=DEBUG, cast=bool)
+CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='', cast=Csv())
 CORS_ALLOW_CREDENTIALS = True
 
 # Media files
@@ -161,3 +258,66 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # Custom User Model
 AUTH_USER_MODEL = 'users.CustomUser'
+
+# Thống kê sách: snapshot được tính lại toàn bộ sau BOOK_STATISTICS_TTL giây
+BOOK_STATISTICS_TTL = 300
+
+# Biến thể ảnh (bìa sách, ảnh tác giả, avatar) được tạo sau khi upload
+IMAGE_VARIANT_SIZES = [64, 256, 800]
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+IMAGE_VARIANT_WORKERS = 2
+# Trạng thái "đã có biến thể" của mỗi ảnh được nhớ trong cache; "chưa có" chỉ nhớ ngần này giây
+IMAGE_VARIANT_MISSING_TTL = 60
+
+# Danh sách sách (/api/books/, /api/search/) serialize bằng values_list() thay vì ModelSerializer
+BOOK_FAST_LIST_SERIALIZER = True
+
+# Token ký HMAC (users.tokens): thời gian sống (giây) và thời gian cache version
+# token. Revoke ở process khác có hiệu lực sau tối đa AUTH_TOKEN_VERSION_CACHE_TTL
+# giây nếu CACHES không dùng chung (LocMemCache mặc định)
+AUTH_TOKEN_TTL = config('AUTH_TOKEN_TTL', default=15 * 60, cast=int)
+AUTH_REFRESH_TOKEN_TTL = config('AUTH_REFRESH_TOKEN_TTL', default=14 * 24 * 3600, cast=int)
+AUTH_TOKEN_VERSION_CACHE_TTL = 60
+
+# Basic auth (users.authentication.CachedBasicAuthentication): nhớ lần xác thực
+# thành công BASIC_AUTH_CACHE_TTL giây; sai BASIC_AUTH_MAX_FAILURES lần trong
+# BASIC_AUTH_FAILURE_WINDOW giây (theo username hoặc IP) thì trả 429
+BASIC_AUTH_CACHE_TTL = 300
+BASIC_AUTH_MAX_FAILURES = 10
+BASIC_AUTH_FAILURE_WINDOW = 300
+
+# Biên các khoảng giá cho ?facets=price (VND)
+BOOK_PRICE_FACET_BOUNDARIES = [100000, 200000, 300000, 500000]
+
+# Gợi ý khi gõ (books.suggest): số kết quả mặc định, chu kỳ lấy thay đổi từ
+# process khác, số thay đổi tích lũy trước khi dựng lại index trong bộ nhớ và
+# số giây giữ tombstone của entry đã xóa (process chưa sync lâu hơn thế sẽ dựng
+# lại toàn bộ index)
+BOOK_SUGGEST_LIMIT = 10
+BOOK_SUGGEST_SYNC_SECONDS = 30
+BOOK_SUGGEST_COMPACT_AFTER = 1000
+BOOK_SUGGEST_TOMBSTONE_TTL = 86400
+
+# Sách tương tự (books.recommendations, lệnh build_similar_books): số sách lưu
+# cho mỗi sách, số người đánh giá chung tối thiểu và số dòng mỗi lần nhân ma trận
+BOOK_SIMILAR_TOP = 20
+BOOK_SIMILAR_MIN_COMMON = 2
+BOOK_SIMILAR_BLOCK_SIZE = 2000
+
+# Đo SQL theo request (bookstore.middleware.QueryInstrumentationMiddleware).
+# Dòng log của mọi request ở mức DEBUG; mặc định chỉ log N+1 và request chậm
+SQL_SLOW_REQUEST_MS = 500
+SQL_N_PLUS_ONE_THRESHOLD = 5
+SQL_SERVER_TIMING = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'bookstore.sql': {'handlers': ['console'], 'level': config('SQL_LOG_LEVEL', default='WARNING')},
+        'books.suggest': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
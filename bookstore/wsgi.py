@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookstore.settings')
 
 application = get_wsgi_application()
+
+# Dựng index gợi ý (/api/books/suggest/) ở nền ngay khi server khởi động
+from books.suggest import warm_up  # noqa: E402
+
+warm_up()
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
+from books.images import variant_url
 from .models import CustomUser
 
 
@@ -59,7 +60,7 @@ class CustomUserAdmin(BaseUserAdmin):
         if obj.avatar:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px;" />',
-                obj.avatar.url
+                variant_url(obj.avatar, 64)
             )
         return "Không có ảnh"
     avatar_preview.short_description = 'Ảnh đại diện'
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework import authentication, exceptions
+
+from .models import CustomUser
+from .tokens import get_token_version, load_token
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Xác thực bằng header `Authorization: Bearer <token>` (token từ /api/auth/login/).
+
+    Token tự chứa id và version nên không cần đọc bảng session hay bảng user:
+    request.user là CustomUser chỉ có sẵn id, mọi field khác (kể cả user_type)
+    được nạp từ database trong một query khi view cần tới. Không lấy field nào
+    từ token để save() không ghi đè dữ liệu cũ trong token lên database.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Header Authorization không hợp lệ')
+        try:
+            token = auth[1].decode()
+            user_id, _, version = load_token(token)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed('Token đã hết hạn')
+        except (signing.BadSignature, UnicodeError):
+            raise exceptions.AuthenticationFailed('Token không hợp lệ')
+        if get_token_version(user_id) != version:
+            raise exceptions.AuthenticationFailed('Token đã bị thu hồi')
+        # from_db nhận values theo thứ tự _meta.concrete_fields; chỉ có id nên
+        # các field còn lại là deferred, được đọc từ database khi cần
+        user = CustomUser.from_db(DEFAULT_DB_ALIAS, ['id'], [user_id])
+        return user, token
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class CachedBasicAuthentication(authentication.BasicAuthentication):
+    """
+    BasicAuthentication nhớ các lần xác thực thành công để không phải băm lại
+    mật khẩu (PBKDF2) ở mỗi request.
+
+    Khóa cache là HMAC (SECRET_KEY) của username + mật khẩu, giá trị là id user
+    và HMAC của password hash đang lưu. Mỗi lần dùng lại vẫn đọc user từ database
+    như BasicAuthentication: đổi mật khẩu bằng bất kỳ cách nào (set_password,
+    change_password, admin) hay khóa tài khoản đều làm mục cache mất hiệu lực.
+    Sau quá nhiều lần sai theo username hoặc IP, request bị từ chối (429) trước
+    khi băm mật khẩu.
+    """
+    local_size = 1024
+    _local = OrderedDict()
+    _lock = threading.Lock()
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = 'users:basic:' + salted_hmac('users.basic.credentials', f'{userid}\0{password}').hexdigest()
+        user = self.get_cached_user(key, userid)
+        if user is not None:
+            return user, None
+
+        counters = self.failure_keys(userid, request)
+        limit = getattr(settings, 'BASIC_AUTH_MAX_FAILURES', 10)
+        window = getattr(settings, 'BASIC_AUTH_FAILURE_WINDOW', 300)
+        if any(count >= limit for count in cache.get_many(counters).values()):
+            raise exceptions.Throttled(wait=window, detail='Sai thông tin đăng nhập quá nhiều lần')
+        try:
+            user, auth = super().authenticate_credentials(userid, password, request)
+        except exceptions.AuthenticationFailed:
+            for counter in counters:
+                cache.add(counter, 0, window)
+                try:
+                    cache.incr(counter)
+                except ValueError:
+                    # Bộ đếm vừa hết hạn giữa add() và incr()
+                    cache.set(counter, 1, window)
+            raise
+        cache.delete(counters[0])
+        entry = (user.pk, self.password_digest(user))
+        cache.set(key, entry, getattr(settings, 'BASIC_AUTH_CACHE_TTL', 300))
+        self.remember(key, entry)
+        return user, auth
+
+    def get_cached_user(self, key, userid):
+        """User của lần xác thực đã cache, None nếu không có hoặc không còn hợp lệ"""
+        with self._lock:
+            item = self._local.get(key)
+        if item is not None and item[1] > time.monotonic():
+            entry = item[0]
+        else:
+            entry = cache.get(key)
+            if entry is None:
+                return None
+            self.remember(key, entry)
+        user = CustomUser._default_manager.filter(pk=entry[0]).first()
+        if (
+            user is None or not user.is_active or user.get_username() != userid
+            or not constant_time_compare(self.password_digest(user), entry[1])
+        ):
+            self.forget(key)
+            return None
+        return user
+
+    def remember(self, key, entry):
+        """Giữ thêm trong bộ nhớ process (LRU) để bỏ qua cả lượt đọc cache chung"""
+        expires = time.monotonic() + getattr(settings, 'BASIC_AUTH_CACHE_TTL', 300)
+        with self._lock:
+            self._local[key] = (entry, expires)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def forget(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+        cache.delete(key)
+
+    @staticmethod
+    def password_digest(user):
+        # Không đưa password hash vào cache chung, chỉ HMAC của nó
+        return salted_hmac('users.basic.password', user.password).hexdigest()
+
+    @staticmethod
+    def failure_keys(userid, request):
+        """Bộ đếm lần sai theo username và theo IP (username ngẫu nhiên cũng bị chặn)"""
+        keys = ['users:basic_failures:user:' + salted_hmac('users.basic.user', userid).hexdigest()]
+        if request is not None and request.META.get('REMOTE_ADDR'):
+            keys.append('users:basic_failures:ip:' + request.META['REMOTE_ADDR'])
+        return keys
@@ -2,6 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from books.images import remember_images
+
 
 class CustomUser(AbstractUser):
     """Custom User model mở rộng từ AbstractUser"""
@@ -55,6 +57,12 @@ class CustomUser(AbstractUser):
         verbose_name="Email đã xác thực"
     )
     
+    # Tăng lên để thu hồi mọi token đã cấp (users.tokens.revoke_tokens)
+    token_version = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Phiên bản token"
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(
         auto_now_add=True, 
@@ -73,6 +81,25 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """
+        User tạo từ token chỉ có vài field: lần đầu truy cập field bị defer thì
+        nạp mọi field còn thiếu trong một query thay vì mỗi field một query
+        """
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or 'avatar' in fields:
+            remember_images(self, 'avatar')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Ghi nhớ avatar đã load để chỉ tạo lại biến thể khi avatar đổi"""
+        instance = super().from_db(db, field_names, values)
+        remember_images(instance, 'avatar')
+        return instance
+
     @property
     def full_name(self):
         """Lấy tên đầy đủ của user"""
@@ -1,19 +1,21 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from books.images import image_url, variant_urls
 from .models import CustomUser
 
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer cho User model"""
     avatar_url = serializers.SerializerMethodField()
+    avatar_urls = serializers.SerializerMethodField()
     full_name = serializers.CharField(read_only=True)
     
     class Meta:
         model = CustomUser
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name', 'full_name',
-            'phone_number', 'address', 'date_of_birth', 'avatar', 'avatar_url',
+            'phone_number', 'address', 'date_of_birth', 'avatar', 'avatar_url', 'avatar_urls',
             'bio', 'user_type', 'is_verified', 'email_verified',
             'date_joined', 'created_at', 'updated_at'
         ]
@@ -26,13 +28,12 @@ class UserSerializer(serializers.ModelSerializer):
         }
     
     def get_avatar_url(self, obj):
-        """Lấy URL avatar"""
-        if obj.avatar:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
-        return None
+        """Lấy URL avatar (hoặc biến thể theo ?avatar_size=)"""
+        return image_url(obj.avatar, self.context.get('request'), param='avatar')
+    
+    def get_avatar_urls(self, obj):
+        """URL các biến thể đã resize của avatar"""
+        return variant_urls(obj.avatar, self.context.get('request'))
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -115,9 +116,15 @@ class LoginSerializer(serializers.Serializer):
         return attrs
 
 
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer cho đổi refresh token"""
+    refresh = serializers.CharField()
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """Serializer cho profile user (thông tin công khai)"""
     avatar_url = serializers.SerializerMethodField()
+    avatar_urls = serializers.SerializerMethodField()
     full_name = serializers.CharField(read_only=True)
     reviews_count = serializers.SerializerMethodField()
     
@@ -125,20 +132,22 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = [
             'id', 'username', 'first_name', 'last_name', 'full_name',
-            'avatar_url', 'bio', 'user_type', 'is_verified',
+            'avatar_url', 'avatar_urls', 'bio', 'user_type', 'is_verified',
             'date_joined', 'reviews_count'
         ]
         read_only_fields = ['id', 'username', 'date_joined', 'is_verified']
     
     def get_avatar_url(self, obj):
-        """Lấy URL avatar"""
-        if obj.avatar:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
-        return None
+        """Lấy URL avatar (hoặc biến thể theo ?avatar_size=)"""
+        return image_url(obj.avatar, self.context.get('request'), param='avatar')
+    
+    def get_avatar_urls(self, obj):
+        """URL các biến thể đã resize của avatar"""
+        return variant_urls(obj.avatar, self.context.get('request'))
     
     def get_reviews_count(self, obj):
-        """Đếm số đánh giá của user"""
-        return obj.review_set.count() 
\ No newline at end of file
+        """Đếm số đánh giá của user (ưu tiên giá trị đã annotate sẵn)"""
+        count = getattr(obj, 'reviews_count', None)
+        if count is None:
+            count = obj.review_set.count()
+        return count 
\ No newline at end of file
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from books.images import schedule_changed_variants
+
+from .models import CustomUser
+from .tokens import revoke_tokens
+
+
+@receiver(post_save, sender=CustomUser)
+def generate_avatar_variants(sender, instance, created, update_fields=None, **kwargs):
+    """Tạo các biến thể avatar sau khi upload (không chạy lại khi chỉ cập nhật last_login...)"""
+    schedule_changed_variants(instance, 'avatar', created, update_fields)
+
+
+@receiver(post_save, sender=CustomUser)
+def revoke_tokens_of_inactive_user(sender, instance, created, **kwargs):
+    """Khóa tài khoản thì thu hồi luôn các token đã cấp"""
+    if not created and not instance.is_active:
+        revoke_tokens(instance)
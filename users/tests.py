@@ -1,3 +1,180 @@
-from django.test import TestCase
+import base64
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from rest_framework.test import APIClient, APITestCase
+
+from bookstore.db_router import current_route
+from bookstore.middleware import ReplicaRoutingMiddleware
+
+from .models import CustomUser
+
+
+class SignedTokenAuthenticationTests(APITestCase):
+    """Luồng login → Bearer token → cập nhật/đổi mật khẩu → logout"""
+    password = 'Mat-khau-cu-123'
+
+    def setUp(self):
+        # Version token được cache theo id user, id có thể lặp lại giữa các test
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='reader', password=self.password, email='reader@example.com', user_type='staff',
+        )
+
+    def login(self, password=None):
+        response = self.client.post(
+            '/api/auth/login/', {'username': 'reader', 'password': password or self.password}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['tokens']
+
+    def bearer(self, token):
+        # Client mới, không có cookie session của lần login
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def test_me_reads_user_from_database(self):
+        client = self.bearer(self.login()['access'])
+        response = client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['username'], 'reader')
+        self.assertEqual(data['user_type'], 'staff')
+
+    def test_update_profile_keeps_other_fields(self):
+        client = self.bearer(self.login()['access'])
+        # user_type đổi sau khi token được cấp: save() không được ghi lại giá trị trong token
+        CustomUser.objects.filter(pk=self.user.pk).update(user_type='admin')
+        response = client.patch('/api/users/update_profile/', {'bio': 'Thích đọc sách'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.bio, 'Thích đọc sách')
+        self.assertEqual(self.user.user_type, 'admin')
+        self.assertTrue(self.user.is_active)
+
+    def test_change_password_revokes_old_tokens(self):
+        old = self.login()['access']
+        response = self.bearer(old).post('/api/users/change_password/', {
+            'old_password': self.password,
+            'new_password': 'Mat-khau-moi-456',
+            'new_password_confirm': 'Mat-khau-moi-456',
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        new = response.json()['tokens']['access']
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Mat-khau-moi-456'))
+        self.assertEqual(self.user.user_type, 'staff')
+        self.assertEqual(self.bearer(old).get('/api/users/me/').status_code, 401)
+        self.assertEqual(self.bearer(new).get('/api/users/me/').status_code, 200)
+
+    def test_logout_revokes_tokens(self):
+        tokens = self.login()
+        client = self.bearer(tokens['access'])
+        self.assertEqual(client.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+        response = self.client.post('/api/auth/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_issues_working_token(self):
+        refresh = self.login()['refresh']
+        response = APIClient().post('/api/auth/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        access = response.json()['tokens']['access']
+        self.assertEqual(self.bearer(access).get('/api/users/me/').status_code, 200)
+
+    def test_invalid_token_rejected(self):
+        self.assertEqual(self.bearer('khong-hop-le').get('/api/users/me/').status_code, 401)
+
+
+class AvatarVariantTests(APITestCase):
+    """Biến thể avatar chỉ được tạo khi avatar đổi, không phải mỗi lần login"""
+    password = 'Mat-khau-cu-123'
+
+    def setUp(self):
+        cache.clear()
+        with mock.patch('books.images.schedule_variants'):
+            self.user = CustomUser.objects.create_user(
+                username='reader', password=self.password, avatar='users/avatars/reader.jpg',
+            )
+
+    def test_login_and_profile_update_do_not_schedule(self):
+        with mock.patch('books.images.schedule_variants') as schedule:
+            response = self.client.post(
+                '/api/auth/login/', {'username': 'reader', 'password': self.password}, format='json'
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['tokens']['access']}")
+            response = client.patch('/api/users/update_profile/', {'bio': 'Thích đọc sách'}, format='json')
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(schedule.call_count, 0)
+
+    def test_avatar_change_schedules(self):
+        with mock.patch('books.images.schedule_variants') as schedule:
+            user = CustomUser.objects.get(pk=self.user.pk)
+            user.avatar = 'users/avatars/reader-2.jpg'
+            user.save()
+            self.assertEqual(schedule.call_count, 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_REPLICA_STICKY_SECONDS=10)
+class ReplicaPinningTests(APITestCase):
+    """Sau khi ghi, user đọc từ primary dù client không gửi lại cookie"""
+    password = 'Mat-khau-cu-123'
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='reader', password=self.password)
+        self.basic = 'Basic ' + base64.b64encode(f'reader:{self.password}'.encode()).decode()
+
+    def read_database(self, headers=None, session=None):
+        """Replica được chọn cho một request GET không có cookie (None là primary)"""
+        routes = []
+
+        def view(request):
+            routes.append(current_route.get().replica)
+            return HttpResponse()
+
+        request = RequestFactory().get('/api/books/', headers=headers)
+        if session is not None:
+            request.session = session
+        ReplicaRoutingMiddleware(view)(request)
+        return routes[0]
+
+    def write(self, client):
+        response = client.patch('/api/users/update_profile/', {'bio': 'Thích đọc sách'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_bearer_user_pinned(self):
+        response = APIClient().post(
+            '/api/auth/login/', {'username': 'reader', 'password': self.password}, format='json'
+        )
+        token = response.json()['tokens']['access']
+        cache.clear()
+        headers = {'Authorization': f'Bearer {token}'}
+        self.assertEqual(self.read_database(headers), 'replica1')
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.write(client)
+        self.assertIsNone(self.read_database(headers))
+        self.assertEqual(self.read_database(), 'replica1')
+
+    def test_session_user_pinned(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.read_database(session=self.client.session), 'replica1')
+        self.write(self.client)
+        self.assertIsNone(self.read_database(session=self.client.session))
+
+    def test_basic_user_pinned(self):
+        headers = {'Authorization': self.basic}
+        self.assertEqual(self.read_database(headers), 'replica1')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=self.basic)
+        self.write(client)
+        self.assertIsNone(self.read_database(headers))
+        self.assertEqual(self.read_database({'Authorization': 'Bearer khong-hop-le'}), 'replica1')
@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from .models import CustomUser
+
+ACCESS_SALT = 'users.tokens.access'
+REFRESH_SALT = 'users.tokens.refresh'
+
+
+def get_access_ttl():
+    """Thời gian sống của access token (giây), cấu hình bằng AUTH_TOKEN_TTL"""
+    return getattr(settings, 'AUTH_TOKEN_TTL', 15 * 60)
+
+
+def get_refresh_ttl():
+    """Thời gian sống của refresh token (giây), cấu hình bằng AUTH_REFRESH_TOKEN_TTL"""
+    return getattr(settings, 'AUTH_REFRESH_TOKEN_TTL', 14 * 24 * 3600)
+
+
+def _version_key(user_id):
+    return f'users:token_version:{user_id}'
+
+
+def _sign(user, salt):
+    # Payload gọn [id, user_type, version]; TimestampSigner thêm thời điểm ký và HMAC
+    return signing.dumps([user.pk, user.user_type, user.token_version], salt=salt, compress=True)
+
+
+def issue_tokens(user):
+    """Cặp access/refresh token cho user (trả về trong login/register/refresh)"""
+    return {
+        'access': _sign(user, ACCESS_SALT),
+        'refresh': _sign(user, REFRESH_SALT),
+        'token_type': 'Bearer',
+        'expires_in': get_access_ttl(),
+    }
+
+
+def load_token(token, refresh=False):
+    """
+    Kiểm tra chữ ký và hạn của token, trả về (user_id, user_type, version).
+    Không đụng tới database; raise signing.BadSignature (hoặc SignatureExpired).
+    """
+    payload = signing.loads(
+        token,
+        salt=REFRESH_SALT if refresh else ACCESS_SALT,
+        max_age=get_refresh_ttl() if refresh else get_access_ttl(),
+    )
+    try:
+        user_id, user_type, version = payload
+    except (TypeError, ValueError):
+        raise signing.BadSignature('Payload không hợp lệ')
+    return user_id, user_type, version
+
+
+def get_token_version(user_id):
+    """
+    Version token hiện tại của user, đọc từ cache. Chỉ query database khi cache
+    chưa có hoặc đã hết AUTH_TOKEN_VERSION_CACHE_TTL giây (để revoke ở process
+    khác có hiệu lực khi cache không dùng chung). None nếu user không còn active.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Đọc từ database chính: replica trễ có thể cache lại version trước khi thu hồi
+        row = (
+            CustomUser.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id)
+            .values_list('token_version', 'is_active').first()
+        )
+        # -1: user đã bị xóa/khóa, cũng được cache để không query lại mỗi request
+        version = row[0] if row and row[1] else -1
+        cache.set(key, version, getattr(settings, 'AUTH_TOKEN_VERSION_CACHE_TTL', 60))
+    return None if version < 0 else version
+
+
+def revoke_tokens(user):
+    """Tăng version để mọi token đã cấp cho user hết hiệu lực"""
+    CustomUser.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+    cache.delete(_version_key(user.pk))
+
+
+def refresh_tokens(token):
+    """Đổi refresh token lấy cặp token mới; version được kiểm tra trực tiếp trong database"""
+    user_id, _, version = load_token(token, refresh=True)
+    user = CustomUser.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id, is_active=True).first()
+    if user is None or user.token_version != version:
+        raise signing.BadSignature('Token đã bị thu hồi')
+    return user, issue_tokens(user)
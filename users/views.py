@@ -4,13 +4,19 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from rest_framework.views import APIView
 from django.contrib.auth import login, logout
+from django.core import signing
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
 
+from books.models import Review
+
+from .authentication import SignedTokenAuthentication
 from .models import CustomUser
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
-    ChangePasswordSerializer, LoginSerializer, UserProfileSerializer
+    ChangePasswordSerializer, LoginSerializer, RefreshTokenSerializer, UserProfileSerializer
 )
+from .tokens import issue_tokens, refresh_tokens, revoke_tokens
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -65,7 +71,12 @@ class UserViewSet(viewsets.ModelViewSet):
             user = request.user
             user.set_password(serializer.validated_data['new_password'])
             user.save()
-            return Response({'message': 'Mật khẩu đã được thay đổi thành công'})
+            # Token cũ hết hiệu lực, client dùng token mới trả về
+            revoke_tokens(user)
+            return Response({
+                'message': 'Mật khẩu đã được thay đổi thành công',
+                'tokens': issue_tokens(user),
+            })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -83,16 +94,33 @@ class AuthViewSet(viewsets.ViewSet):
             user_serializer = UserSerializer(user, context={'request': request})
             return Response({
                 'message': 'Đăng nhập thành công',
-                'user': user_serializer.data
+                'user': user_serializer.data,
+                'tokens': issue_tokens(user),
             })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['post'])
     def logout(self, request):
-        """Đăng xuất"""
+        """Đăng xuất; nếu xác thực bằng token thì thu hồi mọi token của user"""
+        if isinstance(request.successful_authenticator, SignedTokenAuthentication):
+            revoke_tokens(request.user)
         logout(request)
         return Response({'message': 'Đăng xuất thành công'})
     
+    @action(detail=False, methods=['post'])
+    def refresh(self, request):
+        """Đổi refresh token lấy access token mới"""
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            _, tokens = refresh_tokens(serializer.validated_data['refresh'])
+        except signing.BadSignature:
+            return Response(
+                {'detail': 'Refresh token không hợp lệ hoặc đã hết hạn'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        return Response({'tokens': tokens})
+    
     @action(detail=False, methods=['post'])
     def register(self, request):
         """Đăng ký tài khoản mới"""
@@ -103,7 +131,8 @@ class AuthViewSet(viewsets.ViewSet):
             user_serializer = UserSerializer(user, context={'request': request})
             return Response({
                 'message': 'Đăng ký thành công',
-                'user': user_serializer.data
+                'user': user_serializer.data,
+                'tokens': issue_tokens(user),
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -116,14 +145,15 @@ class UserProfileView(generics.RetrieveAPIView):
     lookup_field = 'username'
     
     def get_queryset(self):
-        """Chỉ lấy thông tin công khai"""
-        return CustomUser.objects.filter(is_active=True)
+        """Chỉ lấy thông tin công khai, kèm số đánh giá"""
+        return CustomUser.objects.filter(is_active=True).annotate(
+            reviews_count=Count('review')
+        )
 
 
 class UserReviewsView(generics.ListAPIView):
     """API view cho danh sách reviews của user"""
     from books.serializers import ReviewSerializer
-    from books.models import Review
     
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]